@@ -5,6 +5,7 @@ from app.models import TicketCreateData
 from app.ocr.ocr_engine import process_image_with_gemini
 from app.ocr.ocr_timeout import run_blocking_with_timeout
 from app.services.dbconfig import authorised_user, save_ticket_details,supabase
+from app.services.ticket_checker import check_ticket
 
 router = APIRouter(prefix="/tickets", tags=["tickets"])
 
@@ -107,3 +108,36 @@ async def delete_ticket(ticket_id: UUID, user_id: UUID = Depends(authorised_user
     except Exception as e:
         print(f"Error deleting ticket {ticket_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete ticket")
+
+
+
+@router.post("/{ticket_id}/check")
+def check_saved_ticket(ticket_id: UUID, user_id: UUID = Depends(authorised_user)):
+    """
+    Check a freshly saved ticket right away if its draw result is already available.
+    A plain def: the lookups and the check are blocking calls, so FastAPI runs it in its threadpool.
+    """
+    try:
+        response = (
+            supabase
+            .table("tickets")
+            .select("id")
+            .eq("id", str(ticket_id))
+            .eq("user_id", str(user_id))
+            .execute()
+        )
+
+        if not getattr(response, "data", None):
+            raise HTTPException(status_code=404, detail="Ticket not found")
+
+        result = check_ticket(str(ticket_id))
+
+        return {
+            "status": "success",
+            "result": result,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error checking ticket {ticket_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to check ticket")
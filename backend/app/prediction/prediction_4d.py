@@ -1,35 +1,28 @@
-import os
 import numpy as np
 import pandas as pd
 from collections import Counter
-from supabase import create_client
 from dotenv import load_dotenv
+from app.repositories import get_repository
 import xgboost as xgb
 from sklearn.preprocessing import MinMaxScaler
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense
 
 load_dotenv()
-url = os.environ.get("SUPABASE_URL")
-key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-supabase = create_client(url, key)
+repo = get_repository()
 
 # ==========================================
 # 1. DATA LOADING
 # ==========================================
 def fetch_4d_data():
     """
-    Fetches 4D data from the Supabase SQL View 'view_4d_ml_data'.
+    Fetches the flattened 4D history (the 'view_4d_ml_data' view on Supabase) through the repository.
     """
-    print("[INFO] I am fetching 4D data from Supabase...")
+    print("[INFO] I am fetching 4D data...")
     # Fetch enough history for training (last 500 draws)
-    response = supabase.table("view_4d_ml_data")\
-        .select("*")\
-        .order("draw_no", desc=True)\
-        .limit(500)\
-        .execute()
-    
-    df = pd.DataFrame(response.data)
+    df = pd.DataFrame(repo.draw_history("4d", 500))
+    if df.empty:
+        return df
     # Sort ascending for time-series training
     df = df.sort_values(by="draw_no", ascending=True).reset_index(drop=True)
     return df
@@ -200,7 +193,7 @@ def save_prediction_to_db(result, latest_draw_no, game_type="4d"):
         }
 
         # Saving to Supabase
-        supabase.table("prediction_logs").insert(payload).execute()
+        repo.insert_prediction_logs([payload])
         print(f"[DB] Saved {result['model_name']} prediction for Draw {target_draw}.")
         
     except Exception as e:
@@ -209,6 +202,7 @@ def save_prediction_to_db(result, latest_draw_no, game_type="4d"):
 # ==========================================
 # MAIN EXECUTION
 # ==========================================
+# Run from backend/ as a module: python -m app.prediction.prediction_4d
 if __name__ == "__main__":
     try:
         # 1. Fetch Data
@@ -1,9 +1,8 @@
-import os
 import numpy as np
 import pandas as pd
 from collections import Counter
-from supabase import create_client
 from dotenv import load_dotenv
+from app.repositories import get_repository
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import MinMaxScaler
@@ -11,28 +10,22 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense
 
 load_dotenv()
-url = os.environ.get("SUPABASE_URL")
-key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-supabase = create_client(url, key)
+repo = get_repository()
 
 # ==========================================
 # 1. DATA LOADING
 # ==========================================
 def fetch_toto_data():
     """
-    Fetching the flattened TOTO data from my SQL View 'view_toto_ml_data'.
-    This view gives me the 'winning_numbers' as a clean array of integers.
+    Fetching the flattened TOTO data (my SQL View 'view_toto_ml_data' on Supabase) through the repository.
+    This gives me the 'winning_numbers' as a clean array of integers.
     """
-    print("[INFO] I am fetching TOTO history from Supabase...")
+    print("[INFO] I am fetching TOTO history...")
     
     # I fetch the last 200 draws to ensure I have enough history for the LSTM to learn sequences
-    response = supabase.table("view_toto_ml_data")\
-        .select("*")\
-        .order("draw_no", desc=True)\
-        .limit(200)\
-        .execute()
-    
-    df = pd.DataFrame(response.data)
+    df = pd.DataFrame(repo.draw_history("toto", 200))
+    if df.empty:
+        return df
     
     # I sort the data chronologically because Time Series models (LSTM) need order
     df = df.sort_values(by="draw_no", ascending=True).reset_index(drop=True)
@@ -227,7 +220,7 @@ def save_prediction_to_db(result, game_type="toto"):
         }
 
         # Saving to Supabase
-        data = supabase.table("prediction_logs").insert(payload).execute()
+        data = repo.insert_prediction_logs([payload])
         print(f"[DB] I successfully saved the {result['model_name']} prediction.")
         
     except Exception as e:
@@ -236,6 +229,7 @@ def save_prediction_to_db(result, game_type="toto"):
 # ==========================================
 # MAIN EXECUTION
 # ==========================================
+# Run from backend/ as a module: python -m app.prediction.prediction_toto
 if __name__ == "__main__":
     try:
         # 1. Fetch Data
@@ -0,0 +1,27 @@
+"""
+Data access for the lottery tables, behind one interface with a Supabase and an SQLite backend.
+"""
+
+import os
+
+from app.repositories.base import Repository
+from app.repositories.sqlite_repository import SQLiteRepository
+from app.repositories.supabase_repository import SupabaseRepository
+
+__all__ = ["Repository", "SQLiteRepository", "SupabaseRepository", "get_repository"]
+
+
+def get_repository() -> Repository:
+    """
+    Repository selected by DATA_BACKEND: "supabase" (default, the dbconfig client) or
+    "sqlite" (SQLITE_PATH, in-memory when unset).
+    """
+    backend = os.getenv("DATA_BACKEND", "supabase").lower()
+    if backend == "sqlite":
+        return SQLiteRepository(os.getenv("SQLITE_PATH", ":memory:"))
+    if backend != "supabase":
+        raise ValueError(f"Unknown DATA_BACKEND: {backend}")
+
+    # imported here so the SQLite backend needs no Supabase credentials
+    from app.services.dbconfig import supabase
+    return SupabaseRepository(supabase)
@@ -0,0 +1,237 @@
+"""
+Repository interface for the tables the checker, notifier, scrapers and predictors share:
+tickets, draw_results, ticket_checks, notifications and prediction_logs.
+Bulk reads and writes are part of the interface, so callers never loop over single-row calls.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.services.write_buffer import DEFAULT_CHUNK_SIZE, DEFAULT_RETRIES, UpsertBuffer
+
+Row = Dict[str, Any]
+Bounds = Tuple[Optional[str], Optional[str]]
+
+# First retry delay of a dead-lettered ticket; doubles with every failed attempt
+DEAD_LETTER_BACKOFF_SECONDS = 900
+# How far a draw's watermark (as_of) lags the query time, so tickets committed late with an
+# earlier created_at are still discovered
+WATERMARK_MARGIN_SECONDS = 600
+
+
+class Repository(ABC):
+    """
+    Storage backend for the lottery tables.
+
+    Methods taking or returning lists are bulk operations: one call per batch, however
+    the backend splits it internally. Single-row writes raise on failure, so write
+    buffers can split and retry.
+    """
+
+    # ---------- draw_results ----------
+
+    @abstractmethod
+    def get_draw(self, draw_id: str) -> Optional[Row]:
+        """Draw by uid, or None."""
+
+    @abstractmethod
+    def find_draw(self, game: str, draw_date: Any) -> Optional[Row]:
+        """Draw of a game ("toto" / "4d") on a date, or None."""
+
+    @abstractmethod
+    def get_draws(self, draw_ids: Iterable[str]) -> List[Row]:
+        """Draws by uid, in any order; unknown ids are left out."""
+
+    @abstractmethod
+    def latest_draw_no(self, game: str) -> Optional[int]:
+        """Highest stored draw_no of a game, or None if there is none."""
+
+    @abstractmethod
+    def draw_exists(self, game: str, draw_no: int) -> bool:
+        """Whether a game's draw_no is already stored."""
+
+    @abstractmethod
+    def insert_draw_results(self, rows: List[Row]) -> List[Row]:
+        """Insert draws and return the stored rows."""
+
+    @abstractmethod
+    def draws_with_unchecked_tickets(self) -> List[Row]:
+        """
+        Draws with tickets newer than their watermark and without a check ({uid, game, draw_date,
+        unchecked_tickets, as_of}). as_of is WATERMARK_MARGIN_SECONDS before the query time.
+        """
+
+    @abstractmethod
+    def draws_with_stale_watermark(self) -> List[Row]:
+        """
+        Draws whose tickets between the watermark and as_of are all checked or dead-lettered
+        ({uid, game, draw_date, as_of}), e.g. by sharded runs, so the watermark can advance to as_of.
+        """
+
+    @abstractmethod
+    def upsert_draw_check_status(self, row: Row) -> None:
+        """Set a draw's check watermark (keyed by draw_id)."""
+
+    # ---------- tickets ----------
+
+    @abstractmethod
+    def get_ticket(self, ticket_id: Any) -> Optional[Row]:
+        """Ticket by id, or None."""
+
+    @abstractmethod
+    def get_tickets(self, ticket_ids: Iterable[Any]) -> List[Row]:
+        """Tickets by id, in any order; unknown ids are left out."""
+
+    @abstractmethod
+    def insert_tickets(self, rows: List[Row]) -> List[Row]:
+        """Insert tickets and return the stored rows."""
+
+    @abstractmethod
+    def ticket_page(
+        self,
+        game_type: str,
+        draw_date: Any,
+        last_id: Optional[Any],
+        page_size: int,
+        bounds: Bounds = (None, None)
+    ) -> List[Row]:
+        """Next keyset page ({id, user_id, details}, by id) of a draw's tickets within the id bounds [lo, hi)."""
+
+    @abstractmethod
+    def unchecked_ticket_page(
+        self,
+        draw_id: str,
+        last_id: Optional[Any],
+        page_size: int,
+        bounds: Bounds = (None, None)
+    ) -> List[Row]:
+        """Like ticket_page, but only tickets without a ticket_checks row for the draw."""
+
+    # ---------- ticket_checks ----------
+
+    @abstractmethod
+    def upsert_ticket_checks(self, rows: List[Row]) -> List[Row]:
+        """Upsert check rows on (ticket_id, draw_id) as one write and return the stored rows (with ids); raises if it fails."""
+
+    @abstractmethod
+    def get_result_hashes(self, draw_id: str, ticket_ids: Iterable[Any]) -> Dict[Any, Optional[str]]:
+        """Stored result_hash per ticket id for a draw; tickets without a check are left out."""
+
+    @abstractmethod
+    def get_ticket_checks(self, draw_id: Optional[str] = None) -> List[Row]:
+        """Check rows of one draw, or of every draw."""
+
+    @abstractmethod
+    def unnotified_check_page(self, last_id: Optional[Any], page_size: int) -> List[Row]:
+        """Next keyset page (by id) of check rows not yet consumed by the notifier (notified_at is null)."""
+
+    @abstractmethod
+    def mark_checks_notified(self, check_ids: Iterable[Any], skipped: bool = False) -> None:
+        """Stamp notified_at on checks the notifier has consumed; `skipped` ones got no notification."""
+
+    @abstractmethod
+    def record_notify_failures(self, check_ids: Iterable[Any], max_attempts: int) -> None:
+        """Count a failed notification attempt per check; checks reaching max_attempts are consumed."""
+
+    # ---------- check_checkpoints ----------
+
+    @abstractmethod
+    def get_checkpoint(self, draw_id: str, shard: str) -> Optional[Row]:
+        """
+        Saved progress of a draw check ("full:" or "unchecked:" + "all" or "i/N"), or None,
+        also when it was saved before the draw's watermark last advanced (a stale checkpoint).
+        """
+
+    @abstractmethod
+    def save_checkpoint(self, row: Row) -> None:
+        """Upsert a checkpoint (keyed by draw_id, shard)."""
+
+    @abstractmethod
+    def delete_checkpoint(self, draw_id: str, shard: str) -> None:
+        """Drop a finished shard's checkpoint."""
+
+    # ---------- check_dead_letters ----------
+
+    @abstractmethod
+    def record_dead_letters(
+        self,
+        draw_id: str,
+        errors: List[Row],
+        backoff_seconds: int = DEAD_LETTER_BACKOFF_SECONDS,
+        retry: bool = False
+    ) -> None:
+        """
+        Dead-letter a draw's failed tickets ({ticket_id, error_type, error}). With `retry` (a
+        dead-letter retry failed again), a ticket already dead-lettered counts another attempt
+        and its next retry backs off exponentially; otherwise (a check run failing on it again)
+        only its error is refreshed.
+        """
+
+    @abstractmethod
+    def due_dead_letters(self, max_attempts: int, limit: int) -> List[Row]:
+        """Dead letters due for a retry with fewer than max_attempts attempts, earliest due first."""
+
+    @abstractmethod
+    def delete_dead_letters(self, draw_id: str, ticket_ids: Iterable[Any]) -> None:
+        """Drop a draw's dead letters for tickets that were checked after all."""
+
+    # ---------- notifications ----------
+
+    @abstractmethod
+    def upsert_notifications(self, rows: List[Row]) -> List[Row]:
+        """
+        Insert notifications as one write, ignoring rows whose ticket_check_id already has a
+        notification; returns only the rows inserted. Raises if the write fails.
+        """
+
+    # ---------- prediction_logs ----------
+
+    @abstractmethod
+    def draw_history(self, game: str, limit: int) -> List[Row]:
+        """
+        A game's latest `limit` draws, flattened for the predictors (newest first):
+        4D {draw_no, draw_date, first_prize, second_prize, third_prize},
+        TOTO {draw_no, draw_date, winning_numbers (ints)}.
+        """
+
+    @abstractmethod
+    def insert_prediction_logs(self, rows: List[Row]) -> List[Row]:
+        """Insert prediction log rows and return the stored rows."""
+
+    # ---------- helpers ----------
+
+    def ticket_check_buffer(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        on_written: Optional[Callable[[List[Row]], None]] = None,
+        retries: int = DEFAULT_RETRIES,
+        retry_delay: float = 0.5
+    ) -> UpsertBuffer:
+        """
+        Chunked write buffer over upsert_ticket_checks. Chunks failing on row errors are split
+        down to the bad rows (errors, to be dead-lettered); other failures (connection, 5xx)
+        are retried `retries` times, then raised, so an outage never dead-letters a draw.
+        """
+        return UpsertBuffer(
+            None, "ticket_checks", on_conflict="ticket_id,draw_id",
+            chunk_size=chunk_size, on_written=on_written, write=self.upsert_ticket_checks,
+            retries=retries, retry_delay=retry_delay,
+        )
+
+    def notification_buffer(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        on_written: Optional[Callable[[List[Row]], None]] = None,
+        retries: int = 0,
+        retry_delay: float = 0.5
+    ) -> UpsertBuffer:
+        """
+        Chunked write buffer over upsert_notifications: failing chunks are retried, then split.
+        on_written gets the rows actually inserted (already-notified checks are left out).
+        """
+        return UpsertBuffer(
+            None, "notifications", on_conflict="ticket_check_id",
+            chunk_size=chunk_size, error_key="ticket_check_id",
+            on_written=on_written, write=self.upsert_notifications,
+            retries=retries, retry_delay=retry_delay,
+        )
@@ -0,0 +1,480 @@
+"""
+SQLite repository: a local stand-in for Supabase (in-memory by default).
+Runs the checker, notifier and benchmarks without a live project. JSON columns are stored
+as text, and the watermark / anti-join RPCs are plain SQL.
+"""
+
+import json
+import sqlite3
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.repositories.base import DEAD_LETTER_BACKOFF_SECONDS, WATERMARK_MARGIN_SECONDS, Bounds, Repository, Row
+
+# host parameters per IN (...) lookup, well under SQLite's limit
+_IN_CHUNK = 500
+
+_SCHEMA = """
+create table if not exists draw_results (
+    uid        text primary key,
+    game       text not null,
+    draw_no    integer,
+    draw_date  text,
+    result     text,
+    created_at text,
+    unique (game, draw_no)
+);
+create table if not exists tickets (
+    id         text primary key,
+    user_id    text,
+    game_type  text,
+    draw_date  text,
+    details    text,
+    created_at text
+);
+create index if not exists tickets_game_date_idx on tickets (game_type, draw_date, id);
+create table if not exists ticket_checks (
+    id                  text primary key,
+    ticket_id           text not null,
+    draw_id             text not null,
+    is_win              integer,
+    highest_prize_group integer,
+    details             text,
+    result_hash         text,
+    checked_at          text,
+    notified_at         text,
+    notify_skipped      integer default 0,
+    notify_attempts     integer default 0,
+    unique (ticket_id, draw_id)
+);
+create table if not exists draw_check_status (
+    draw_id         text primary key,
+    game            text,
+    draw_date       text,
+    checked_through text,
+    tickets_checked integer default 0,
+    updated_at      text
+);
+create table if not exists check_checkpoints (
+    draw_id         text not null,
+    shard           text not null,
+    last_ticket_id  text not null,
+    tickets_checked integer default 0,
+    wins            integer default 0,
+    losses          integer default 0,
+    writes_skipped  integer default 0,
+    errors          text,
+    updated_at      text,
+    primary key (draw_id, shard)
+);
+create table if not exists check_dead_letters (
+    ticket_id       text not null,
+    draw_id         text not null,
+    error_type      text not null,
+    error           text,
+    attempts        integer not null default 1,
+    first_failed_at text,
+    last_failed_at  text,
+    next_retry_at   text,
+    primary key (ticket_id, draw_id)
+);
+create table if not exists notifications (
+    id         text primary key,
+    user_id    text,
+    ticket_check_id text unique,
+    type       text,
+    title      text,
+    message    text,
+    data       text,
+    is_read    integer default 0,
+    created_at text
+);
+create table if not exists prediction_logs (
+    id               integer primary key autoincrement,
+    game_type        text,
+    draw_no          integer,
+    model_name       text,
+    predicted_numbers text,
+    confidence_score real,
+    is_correct       integer,
+    created_at       text
+);
+"""
+
+_JSON_COLUMNS = {
+    "draw_results": {"result"},
+    "tickets": {"details"},
+    "ticket_checks": {"details"},
+    "check_checkpoints": {"errors"},
+    "notifications": {"data"},
+    "prediction_logs": {"predicted_numbers"},
+}
+_BOOL_COLUMNS = {
+    "ticket_checks": {"is_win", "notify_skipped"},
+    "notifications": {"is_read"},
+    "prediction_logs": {"is_correct"},
+}
+# primary keys filled in with a uuid when a row has none
+_UUID_KEYS = {"draw_results": "uid", "tickets": "id", "ticket_checks": "id", "notifications": "id"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _chunks(values: Iterable[Any], size: int = _IN_CHUNK) -> Iterable[List[Any]]:
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SQLiteRepository(Repository):
+    """Repository backed by sqlite3; `path` defaults to a private in-memory database."""
+
+    def __init__(self, path: str = ":memory:"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+
+    # ---------- row encoding ----------
+
+    def _encode(self, table: str, row: Row) -> Row:
+        encoded = dict(row)
+        key = _UUID_KEYS.get(table)
+        if key and encoded.get(key) is None:
+            encoded[key] = str(uuid.uuid4())
+        for column in _JSON_COLUMNS.get(table, ()):
+            if column in encoded and encoded[column] is not None:
+                encoded[column] = json.dumps(encoded[column])
+        for column in ("id", "uid", "ticket_id", "draw_id", "user_id", "last_ticket_id"):
+            if encoded.get(column) is not None and not isinstance(encoded[column], int):
+                encoded[column] = str(encoded[column])
+        return encoded
+
+    def _decode(self, table: str, row: sqlite3.Row) -> Row:
+        decoded = dict(row)
+        for column in _JSON_COLUMNS.get(table, ()):
+            if decoded.get(column) is not None:
+                decoded[column] = json.loads(decoded[column])
+        for column in _BOOL_COLUMNS.get(table, ()):
+            if decoded.get(column) is not None:
+                decoded[column] = bool(decoded[column])
+        return decoded
+
+    def _select(self, table: str, sql: str, params: Iterable[Any] = ()) -> List[Row]:
+        return [self._decode(table, r) for r in self.conn.execute(sql, list(params))]
+
+    def _select_in(self, table: str, column: str, values: Iterable[Any], where: str = "", params: Iterable[Any] = ()) -> List[Row]:
+        rows = []
+        for chunk in _chunks({str(v) for v in values}):
+            marks = ",".join("?" * len(chunk))
+            sql = f"select * from {table} where {column} in ({marks}){where}"
+            rows.extend(self._select(table, sql, [*chunk, *params]))
+        return rows
+
+    def _write(
+        self,
+        table: str,
+        rows: List[Row],
+        conflict: Optional[List[str]] = None,
+        ignore_duplicates: bool = False
+    ) -> List[Row]:
+        """
+        Insert rows in one transaction; with `conflict` columns, upsert on them, or with
+        ignore_duplicates skip conflicting rows and return only the inserted ones.
+        """
+        if not rows:
+            return []
+        rows = [self._encode(table, row) for row in rows]
+        columns = sorted({c for row in rows for c in row})
+        sql = f"insert into {table} ({', '.join(columns)}) values ({', '.join('?' * len(columns))})"
+        if ignore_duplicates:
+            sql += f" on conflict ({', '.join(conflict)}) do nothing"
+            with self.conn:
+                inserted = [row for row in rows if self.conn.execute(sql, [row.get(c) for c in columns]).rowcount]
+            return [self._decode(table, row) for row in inserted]
+        if conflict:
+            updates = [c for c in columns if c not in conflict and c not in ("id", "uid")]
+            action = "do update set " + ", ".join(f"{c} = excluded.{c}" for c in updates) if updates else "do nothing"
+            sql += f" on conflict ({', '.join(conflict)}) {action}"
+        with self.conn:
+            self.conn.executemany(sql, [[row.get(c) for c in columns] for row in rows])
+        return [self._decode(table, row) for row in rows]
+
+    # ---------- draw_results ----------
+
+    def get_draw(self, draw_id: str) -> Optional[Row]:
+        rows = self._select("draw_results", "select * from draw_results where uid = ?", [str(draw_id)])
+        return rows[0] if rows else None
+
+    def find_draw(self, game: str, draw_date: Any) -> Optional[Row]:
+        rows = self._select(
+            "draw_results", "select * from draw_results where game = ? and draw_date = ? limit 1", [game, str(draw_date)]
+        )
+        return rows[0] if rows else None
+
+    def get_draws(self, draw_ids: Iterable[str]) -> List[Row]:
+        return self._select_in("draw_results", "uid", draw_ids)
+
+    def latest_draw_no(self, game: str) -> Optional[int]:
+        row = self.conn.execute("select max(draw_no) from draw_results where game = ?", [game]).fetchone()
+        return row[0]
+
+    def draw_exists(self, game: str, draw_no: int) -> bool:
+        return self.conn.execute("select 1 from draw_results where game = ? and draw_no = ?", [game, draw_no]).fetchone() is not None
+
+    def insert_draw_results(self, rows: List[Row]) -> List[Row]:
+        return self._write("draw_results", [{"created_at": _now(), **row} for row in rows])
+
+    def draws_with_unchecked_tickets(self) -> List[Row]:
+        as_of = (datetime.now(timezone.utc) - timedelta(seconds=WATERMARK_MARGIN_SECONDS)).isoformat()
+        rows = self.conn.execute(
+            """
+            select d.uid, d.game, d.draw_date, count(t.id) as unchecked_tickets
+            from draw_results d
+            left join draw_check_status s on s.draw_id = d.uid
+            join tickets t
+              on t.game_type = upper(d.game)
+             and t.draw_date = d.draw_date
+             and (s.checked_through is null or t.created_at > s.checked_through)
+            where not exists (
+                select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid
+            )
+              and not exists (
+                select 1 from check_dead_letters x where x.ticket_id = t.id and x.draw_id = d.uid
+            )
+            group by d.uid, d.game, d.draw_date
+            order by d.draw_date, d.uid
+            """
+        )
+        return [{**dict(r), "as_of": as_of} for r in rows]
+
+    def draws_with_stale_watermark(self) -> List[Row]:
+        as_of = (datetime.now(timezone.utc) - timedelta(seconds=WATERMARK_MARGIN_SECONDS)).isoformat()
+        rows = self.conn.execute(
+            """
+            select d.uid, d.game, d.draw_date
+            from draw_results d
+            left join draw_check_status s on s.draw_id = d.uid
+            join tickets t
+              on t.game_type = upper(d.game)
+             and t.draw_date = d.draw_date
+             and (s.checked_through is null or t.created_at > s.checked_through)
+            where t.created_at <= ?
+            group by d.uid, d.game, d.draw_date
+            having min(
+                exists (select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid)
+                or exists (select 1 from check_dead_letters x where x.ticket_id = t.id and x.draw_id = d.uid)
+            ) = 1
+            order by d.draw_date, d.uid
+            """,
+            [as_of],
+        )
+        return [{**dict(r), "as_of": as_of} for r in rows]
+
+    def upsert_draw_check_status(self, row: Row) -> None:
+        self._write("draw_check_status", [{**row, "updated_at": _now()}], conflict=["draw_id"])
+
+    # ---------- tickets ----------
+
+    def get_ticket(self, ticket_id: Any) -> Optional[Row]:
+        rows = self._select("tickets", "select * from tickets where id = ?", [str(ticket_id)])
+        return rows[0] if rows else None
+
+    def get_tickets(self, ticket_ids: Iterable[Any]) -> List[Row]:
+        return self._select_in("tickets", "id", ticket_ids)
+
+    def insert_tickets(self, rows: List[Row]) -> List[Row]:
+        return self._write("tickets", [{"created_at": _now(), **row} for row in rows])
+
+    @staticmethod
+    def _id_range(last_id: Optional[Any], bounds: Bounds) -> tuple:
+        lo, hi = bounds
+        clauses, params = [], []
+        if last_id is not None:
+            clauses.append("t.id > ?")
+            params.append(str(last_id))
+        elif lo is not None:
+            clauses.append("t.id >= ?")
+            params.append(lo)
+        if hi is not None:
+            clauses.append("t.id < ?")
+            params.append(hi)
+        return "".join(f" and {c}" for c in clauses), params
+
+    def ticket_page(self, game_type, draw_date, last_id, page_size, bounds=(None, None)) -> List[Row]:
+        where, params = self._id_range(last_id, bounds)
+        return self._select(
+            "tickets",
+            f"select t.id, t.user_id, t.details from tickets t where t.game_type = ? and t.draw_date = ?{where} order by t.id limit ?",
+            [game_type, str(draw_date), *params, page_size],
+        )
+
+    def unchecked_ticket_page(self, draw_id, last_id, page_size, bounds=(None, None)) -> List[Row]:
+        where, params = self._id_range(last_id, bounds)
+        return self._select(
+            "tickets",
+            f"""
+            select t.id, t.user_id, t.details
+            from draw_results d
+            join tickets t on t.game_type = upper(d.game) and t.draw_date = d.draw_date
+            where d.uid = ?{where}
+              and not exists (select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid)
+              and not exists (select 1 from check_dead_letters x where x.ticket_id = t.id and x.draw_id = d.uid)
+            order by t.id
+            limit ?
+            """,
+            [str(draw_id), *params, page_size],
+        )
+
+    # ---------- ticket_checks ----------
+
+    def upsert_ticket_checks(self, rows: List[Row]) -> List[Row]:
+        self._write("ticket_checks", [{"checked_at": _now(), **row} for row in rows], conflict=["ticket_id", "draw_id"])
+        # read back: rows that updated an existing check keep its id
+        stored = []
+        for draw_id in {str(row["draw_id"]) for row in rows}:
+            ticket_ids = [row["ticket_id"] for row in rows if str(row["draw_id"]) == draw_id]
+            stored.extend(self._select_in("ticket_checks", "ticket_id", ticket_ids, " and draw_id = ?", [draw_id]))
+        return stored
+
+    def get_result_hashes(self, draw_id: str, ticket_ids: Iterable[Any]) -> Dict[Any, Optional[str]]:
+        wanted = {str(i): i for i in ticket_ids}
+        rows = self._select_in("ticket_checks", "ticket_id", wanted, " and draw_id = ?", [str(draw_id)])
+        return {wanted[r["ticket_id"]]: r.get("result_hash") for r in rows}
+
+    def get_ticket_checks(self, draw_id: Optional[str] = None) -> List[Row]:
+        if draw_id is None:
+            return self._select("ticket_checks", "select * from ticket_checks order by id")
+        return self._select("ticket_checks", "select * from ticket_checks where draw_id = ? order by id", [str(draw_id)])
+
+    def unnotified_check_page(self, last_id: Optional[Any], page_size: int) -> List[Row]:
+        where, params = ("", []) if last_id is None else (" and id > ?", [str(last_id)])
+        return self._select(
+            "ticket_checks",
+            f"select * from ticket_checks where notified_at is null{where} order by id limit ?",
+            [*params, page_size],
+        )
+
+    def mark_checks_notified(self, check_ids: Iterable[Any], skipped: bool = False) -> None:
+        now = _now()
+        with self.conn:
+            for chunk in _chunks({str(i) for i in check_ids}):
+                marks = ",".join("?" * len(chunk))
+                self.conn.execute(
+                    f"update ticket_checks set notified_at = ?, notify_skipped = ? where id in ({marks})",
+                    [now, int(skipped), *chunk],
+                )
+
+    def record_notify_failures(self, check_ids: Iterable[Any], max_attempts: int) -> None:
+        now = _now()
+        with self.conn:
+            for chunk in _chunks({str(i) for i in check_ids}):
+                marks = ",".join("?" * len(chunk))
+                self.conn.execute(
+                    f"""
+                    update ticket_checks
+                    set notify_attempts = coalesce(notify_attempts, 0) + 1,
+                        notified_at = case when coalesce(notify_attempts, 0) + 1 >= ? then ? else notified_at end
+                    where id in ({marks})
+                    """,
+                    [max_attempts, now, *chunk],
+                )
+
+    # ---------- check_checkpoints ----------
+
+    def get_checkpoint(self, draw_id: str, shard: str) -> Optional[Row]:
+        rows = self._select(
+            "check_checkpoints",
+            """
+            select c.* from check_checkpoints c
+            left join draw_check_status s on s.draw_id = c.draw_id
+            where c.draw_id = ? and c.shard = ? and (s.updated_at is null or c.updated_at >= s.updated_at)
+            """,
+            [str(draw_id), shard],
+        )
+        return rows[0] if rows else None
+
+    def save_checkpoint(self, row: Row) -> None:
+        self._write("check_checkpoints", [{**row, "updated_at": _now()}], conflict=["draw_id", "shard"])
+
+    def delete_checkpoint(self, draw_id: str, shard: str) -> None:
+        with self.conn:
+            self.conn.execute("delete from check_checkpoints where draw_id = ? and shard = ?", [str(draw_id), shard])
+
+    # ---------- check_dead_letters ----------
+
+    def record_dead_letters(
+        self,
+        draw_id: str,
+        errors: List[Row],
+        backoff_seconds: int = DEAD_LETTER_BACKOFF_SECONDS,
+        retry: bool = False
+    ) -> None:
+        by_ticket = {str(e["ticket_id"]): e for e in errors if e.get("ticket_id") is not None}
+        now = datetime.now(timezone.utc)
+        with self.conn:
+            for ticket_id, e in by_ticket.items():
+                row = self.conn.execute(
+                    "select attempts, next_retry_at from check_dead_letters where ticket_id = ? and draw_id = ?",
+                    [ticket_id, str(draw_id)],
+                ).fetchone()
+                if row and not retry:
+                    attempts, next_retry_at = row
+                else:
+                    attempts = row[0] + 1 if row else 1
+                    next_retry_at = (now + timedelta(seconds=backoff_seconds * 2 ** (attempts - 1))).isoformat()
+                self.conn.execute(
+                    """
+                    insert into check_dead_letters
+                        (ticket_id, draw_id, error_type, error, attempts, first_failed_at, last_failed_at, next_retry_at)
+                    values (?, ?, ?, ?, ?, ?, ?, ?)
+                    on conflict (ticket_id, draw_id) do update set
+                        error_type = excluded.error_type, error = excluded.error, attempts = excluded.attempts,
+                        last_failed_at = excluded.last_failed_at, next_retry_at = excluded.next_retry_at
+                    """,
+                    [ticket_id, str(draw_id), e.get("error_type") or "Exception", e.get("error"), attempts,
+                     now.isoformat(), now.isoformat(), next_retry_at],
+                )
+
+    def due_dead_letters(self, max_attempts: int, limit: int) -> List[Row]:
+        return self._select(
+            "check_dead_letters",
+            "select * from check_dead_letters where attempts < ? and next_retry_at <= ? order by next_retry_at limit ?",
+            [max_attempts, _now(), limit],
+        )
+
+    def delete_dead_letters(self, draw_id: str, ticket_ids: Iterable[Any]) -> None:
+        with self.conn:
+            for chunk in _chunks({str(i) for i in ticket_ids}):
+                marks = ",".join("?" * len(chunk))
+                self.conn.execute(f"delete from check_dead_letters where draw_id = ? and ticket_id in ({marks})", [str(draw_id), *chunk])
+
+    # ---------- notifications ----------
+
+    def upsert_notifications(self, rows: List[Row]) -> List[Row]:
+        rows = [{"is_read": False, "created_at": _now(), **row} for row in rows]
+        return self._write("notifications", rows, conflict=["ticket_check_id"], ignore_duplicates=True)
+
+    # ---------- prediction_logs ----------
+
+    def draw_history(self, game: str, limit: int) -> List[Row]:
+        draws = self._select(
+            "draw_results",
+            "select draw_no, draw_date, result from draw_results where game = ? order by draw_no desc limit ?",
+            [game, limit],
+        )
+        history = []
+        for draw in draws:
+            result = draw.pop("result") or {}
+            if game == "4d":
+                prizes = result.get("top_prizes") or {}
+                draw.update(first_prize=prizes.get("first"), second_prize=prizes.get("second"), third_prize=prizes.get("third"))
+            else:
+                draw["winning_numbers"] = [int(n) for n in result.get("winning_numbers") or []]
+            history.append(draw)
+        return history
+
+    def insert_prediction_logs(self, rows: List[Row]) -> List[Row]:
+        return self._write("prediction_logs", [{"created_at": _now(), **row} for row in rows])
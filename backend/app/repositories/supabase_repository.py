@@ -0,0 +1,304 @@
+"""
+Repository over a Supabase (PostgREST) client.
+The query builders are shared with the async pipeline, which runs them on an AsyncClient.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.repositories.base import DEAD_LETTER_BACKOFF_SECONDS, Bounds, Repository, Row
+
+# ids per in_() lookup (they travel in the query string)
+IN_LOOKUP_CHUNK = 200
+# rows per keyset page of unbounded reads, within PostgREST's default max-rows cap
+READ_PAGE_SIZE = 1000
+
+
+def ticket_page_query(
+    client: Any,
+    game_type: str,
+    draw_date: str,
+    last_id: Optional[str],
+    page_size: int,
+    bounds: Bounds = (None, None)
+) -> Any:
+    """Unexecuted query for the next keyset page of a draw's tickets (sync or async client)."""
+    lo, hi = bounds
+    query = (
+        client.table("tickets")
+        .select("id, user_id, details")
+        .eq("game_type", game_type)
+        .eq("draw_date", draw_date)
+    )
+    if last_id is not None:
+        query = query.gt("id", last_id)
+    elif lo is not None:
+        query = query.gte("id", lo)
+    if hi is not None:
+        query = query.lt("id", hi)
+    return query.order("id").limit(page_size)
+
+
+def unchecked_page_query(
+    client: Any,
+    draw_id: str,
+    last_id: Optional[str],
+    page_size: int,
+    bounds: Bounds = (None, None)
+) -> Any:
+    """Unexecuted unchecked_tickets_for_draw() call for the next keyset page (sync or async client)."""
+    lo, hi = bounds
+    params = {"p_draw_id": draw_id, "p_after": last_id, "p_limit": page_size, "p_from": lo, "p_to": hi}
+    return client.rpc("unchecked_tickets_for_draw", params)
+
+
+def existing_hashes_query(client: Any, draw_id: str, ticket_ids: List[Any]) -> Any:
+    """Unexecuted lookup of stored result hashes for some of a draw's tickets (sync or async client)."""
+    return (
+        client.table("ticket_checks")
+        .select("ticket_id, result_hash")
+        .eq("draw_id", draw_id)
+        .in_("ticket_id", ticket_ids)
+    )
+
+
+def record_dead_letters_query(
+    client: Any,
+    draw_id: str,
+    errors: List[Row],
+    backoff_seconds: int = DEAD_LETTER_BACKOFF_SECONDS,
+    retry: bool = False
+) -> Optional[Any]:
+    """Unexecuted record_dead_letters() call for per-ticket errors, or None if there are none (sync or async client)."""
+    by_ticket = {
+        str(e["ticket_id"]): {"ticket_id": str(e["ticket_id"]), "error_type": e.get("error_type") or "Exception", "error": e.get("error")}
+        for e in errors if e.get("ticket_id") is not None
+    }
+    if not by_ticket:
+        return None
+    params = {"p_draw_id": draw_id, "p_errors": list(by_ticket.values()), "p_backoff_seconds": backoff_seconds, "p_retry": retry}
+    return client.rpc("record_dead_letters", params)
+
+
+def _chunks(values: Iterable[Any], size: int = IN_LOOKUP_CHUNK) -> Iterable[List[Any]]:
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _older(stamp: Optional[str], than: Optional[str]) -> bool:
+    """Whether timestamptz string `stamp` is before `than` (False if either is missing)."""
+    if not stamp or not than:
+        return False
+    return datetime.fromisoformat(stamp) < datetime.fromisoformat(than)
+
+
+class SupabaseRepository(Repository):
+    """Repository backed by a supabase-py Client."""
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    # ---------- draw_results ----------
+
+    def get_draw(self, draw_id: str) -> Optional[Row]:
+        response = self.client.table("draw_results").select("*").eq("uid", draw_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def find_draw(self, game: str, draw_date: Any) -> Optional[Row]:
+        response = (
+            self.client.table("draw_results")
+            .select("*")
+            .eq("game", game)
+            .eq("draw_date", draw_date)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    def get_draws(self, draw_ids: Iterable[str]) -> List[Row]:
+        draws = []
+        for ids in _chunks(set(draw_ids)):
+            draws.extend(self.client.table("draw_results").select("*").in_("uid", ids).execute().data or [])
+        return draws
+
+    def latest_draw_no(self, game: str) -> Optional[int]:
+        response = (
+            self.client.table("draw_results")
+            .select("draw_no")
+            .eq("game", game)
+            .order("draw_no", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0]["draw_no"] if response.data else None
+
+    def draw_exists(self, game: str, draw_no: int) -> bool:
+        response = (
+            self.client.table("draw_results")
+            .select("uid")
+            .eq("game", game)
+            .eq("draw_no", draw_no)
+            .limit(1)
+            .execute()
+        )
+        return bool(response.data)
+
+    def insert_draw_results(self, rows: List[Row]) -> List[Row]:
+        return self.client.table("draw_results").insert(rows).execute().data or []
+
+    def draws_with_unchecked_tickets(self) -> List[Row]:
+        return self.client.rpc("draws_with_unchecked_tickets").execute().data or []
+
+    def draws_with_stale_watermark(self) -> List[Row]:
+        return self.client.rpc("draws_with_stale_watermark").execute().data or []
+
+    def upsert_draw_check_status(self, row: Row) -> None:
+        row = {**row, "updated_at": datetime.now(timezone.utc).isoformat()}
+        self.client.table("draw_check_status").upsert(row, on_conflict="draw_id").execute()
+
+    # ---------- tickets ----------
+
+    def get_ticket(self, ticket_id: Any) -> Optional[Row]:
+        response = self.client.table("tickets").select("*").eq("id", ticket_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def get_tickets(self, ticket_ids: Iterable[Any]) -> List[Row]:
+        tickets = []
+        for ids in _chunks(set(ticket_ids)):
+            tickets.extend(self.client.table("tickets").select("*").in_("id", ids).execute().data or [])
+        return tickets
+
+    def insert_tickets(self, rows: List[Row]) -> List[Row]:
+        return self.client.table("tickets").insert(rows).execute().data or []
+
+    def ticket_page(self, game_type, draw_date, last_id, page_size, bounds=(None, None)) -> List[Row]:
+        return ticket_page_query(self.client, game_type, draw_date, last_id, page_size, bounds).execute().data or []
+
+    def unchecked_ticket_page(self, draw_id, last_id, page_size, bounds=(None, None)) -> List[Row]:
+        return unchecked_page_query(self.client, draw_id, last_id, page_size, bounds).execute().data or []
+
+    # ---------- ticket_checks ----------
+
+    def upsert_ticket_checks(self, rows: List[Row]) -> List[Row]:
+        response = self.client.table("ticket_checks").upsert(rows, on_conflict="ticket_id,draw_id").execute()
+        return response.data or []
+
+    def get_result_hashes(self, draw_id: str, ticket_ids: Iterable[Any]) -> Dict[Any, Optional[str]]:
+        existing = {}
+        for ids in _chunks(ticket_ids):
+            for stored in existing_hashes_query(self.client, draw_id, ids).execute().data or []:
+                existing[stored["ticket_id"]] = stored.get("result_hash")
+        return existing
+
+    def get_ticket_checks(self, draw_id: Optional[str] = None) -> List[Row]:
+        # keyset pages by id, so PostgREST's row cap can't silently truncate the result
+        checks: List[Row] = []
+        last_id = None
+        while True:
+            query = self.client.table("ticket_checks").select("*")
+            if draw_id is not None:
+                query = query.eq("draw_id", draw_id)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = query.order("id").limit(READ_PAGE_SIZE).execute().data or []
+            checks.extend(page)
+            if len(page) < READ_PAGE_SIZE:
+                return checks
+            last_id = page[-1]["id"]
+
+    def unnotified_check_page(self, last_id: Optional[Any], page_size: int) -> List[Row]:
+        query = self.client.table("ticket_checks").select("*").is_("notified_at", "null")
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        return query.order("id").limit(page_size).execute().data or []
+
+    def mark_checks_notified(self, check_ids: Iterable[Any], skipped: bool = False) -> None:
+        stamp = {"notified_at": datetime.now(timezone.utc).isoformat(), "notify_skipped": skipped}
+        for ids in _chunks({str(i) for i in check_ids}):
+            self.client.table("ticket_checks").update(stamp).in_("id", ids).execute()
+
+    def record_notify_failures(self, check_ids: Iterable[Any], max_attempts: int) -> None:
+        for ids in _chunks({str(i) for i in check_ids}):
+            self.client.rpc("record_notify_failures", {"p_check_ids": ids, "p_max_attempts": max_attempts}).execute()
+
+    # ---------- check_checkpoints ----------
+
+    def get_checkpoint(self, draw_id: str, shard: str) -> Optional[Row]:
+        response = (
+            self.client.table("check_checkpoints")
+            .select("*")
+            .eq("draw_id", draw_id)
+            .eq("shard", shard)
+            .limit(1)
+            .execute()
+        )
+        if not response.data:
+            return None
+        checkpoint = response.data[0]
+        status = (
+            self.client.table("draw_check_status")
+            .select("updated_at")
+            .eq("draw_id", draw_id)
+            .limit(1)
+            .execute()
+        ).data
+        if status and _older(checkpoint.get("updated_at"), status[0].get("updated_at")):
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, row: Row) -> None:
+        row = {**row, "updated_at": datetime.now(timezone.utc).isoformat()}
+        self.client.table("check_checkpoints").upsert(row, on_conflict="draw_id,shard").execute()
+
+    def delete_checkpoint(self, draw_id: str, shard: str) -> None:
+        self.client.table("check_checkpoints").delete().eq("draw_id", draw_id).eq("shard", shard).execute()
+
+    # ---------- check_dead_letters ----------
+
+    def record_dead_letters(
+        self,
+        draw_id: str,
+        errors: List[Row],
+        backoff_seconds: int = DEAD_LETTER_BACKOFF_SECONDS,
+        retry: bool = False
+    ) -> None:
+        query = record_dead_letters_query(self.client, draw_id, errors, backoff_seconds, retry)
+        if query is not None:
+            query.execute()
+
+    def due_dead_letters(self, max_attempts: int, limit: int) -> List[Row]:
+        response = (
+            self.client.table("check_dead_letters")
+            .select("*")
+            .lt("attempts", max_attempts)
+            .lte("next_retry_at", datetime.now(timezone.utc).isoformat())
+            .order("next_retry_at")
+            .limit(limit)
+            .execute()
+        )
+        return response.data or []
+
+    def delete_dead_letters(self, draw_id: str, ticket_ids: Iterable[Any]) -> None:
+        for ids in _chunks({str(i) for i in ticket_ids}):
+            self.client.table("check_dead_letters").delete().eq("draw_id", draw_id).in_("ticket_id", ids).execute()
+
+    # ---------- notifications ----------
+
+    def upsert_notifications(self, rows: List[Row]) -> List[Row]:
+        # ON CONFLICT DO NOTHING on the unique ticket_check_id index: only inserted rows come back
+        response = (
+            self.client.table("notifications")
+            .upsert(rows, on_conflict="ticket_check_id", ignore_duplicates=True)
+            .execute()
+        )
+        return response.data or []
+
+    # ---------- prediction_logs ----------
+
+    def draw_history(self, game: str, limit: int) -> List[Row]:
+        view = {"4d": "view_4d_ml_data", "toto": "view_toto_ml_data"}[game]
+        return self.client.table(view).select("*").order("draw_no", desc=True).limit(limit).execute().data or []
+
+    def insert_prediction_logs(self, rows: List[Row]) -> List[Row]:
+        return self.client.table("prediction_logs").insert(rows).execute().data or []
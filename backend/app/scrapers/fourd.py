@@ -7,6 +7,8 @@ from dotenv import load_dotenv
 from bs4 import BeautifulSoup
 from supabase import create_client
 
+from app.repositories import SupabaseRepository
+
 
 UA = (
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
@@ -17,7 +19,7 @@ BASE_4D_URL = "https://www.singaporepools.com.sg/en/product/pages/4d_results.asp
 load_dotenv()
 url = os.environ["SUPABASE_URL"]
 key = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-supabase = create_client(url, key)
+repo = SupabaseRepository(create_client(url, key))
 
 
 def make_sppl(draw_no: int) -> str:
@@ -180,17 +182,9 @@ def get_latest_draw_no() -> int:
     Raises:
         RuntimeError if Supabase query fails.
     """
-    result = (
-        supabase.table("draw_results")
-        .select("draw_no")
-        .eq("game", "4d")
-        .order("draw_no", desc=True)
-        .limit(1)
-        .execute()
-    )
+    latest_draw = repo.latest_draw_no("4d")
 
-    if result.data and len(result.data) > 0:
-        latest_draw = result.data[0]["draw_no"]
+    if latest_draw is not None:
         print(f"[INFO] Latest draw in DB: {latest_draw}")
         return latest_draw +1
     else:
@@ -220,15 +214,7 @@ def upsert_draw_result(payload: dict) -> bool:
     game = payload["game"]
     draw_no = payload["draw_no"]
 
-    existing = (
-        supabase.table("draw_results")
-        .select("uid")
-        .eq("game", game)
-        .eq("draw_no", draw_no)
-        .limit(1)
-        .execute()
-    )
-    if existing.data:
+    if repo.draw_exists(game, draw_no):
         print(f"[OK] {game} draw {draw_no} already exists.")
         return False
 
@@ -244,8 +230,7 @@ def upsert_draw_result(payload: dict) -> bool:
         
     }
 
-    res = supabase.table("draw_results").insert(row).execute()
-    if not res.data:
+    if not repo.insert_draw_results([row]):
         raise RuntimeError("Insert failed (no data returned).")
 
     print(f"[NEW] Inserted {game} draw {draw_no}.")
@@ -277,5 +262,6 @@ def main():
     upsert_draw_result(parsed)
 
 
+# Run from backend/ as a module: python -m app.scrapers.fourd
 if __name__ == "__main__":
     main()
@@ -7,6 +7,8 @@ from bs4 import BeautifulSoup
 from supabase import create_client
 from dotenv import load_dotenv
 
+from app.repositories import SupabaseRepository
+
 
 UA = (
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
@@ -18,7 +20,7 @@ BASE_TOTO_URL = "https://www.singaporepools.com.sg/en/product/pages/toto_results
 load_dotenv()
 url = os.environ["SUPABASE_URL"]
 key = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-supabase = create_client(url, key)
+repo = SupabaseRepository(create_client(url, key))
 
 def make_sppl(draw_no: int) -> str:
     """
@@ -201,17 +203,9 @@ def get_latest_draw_no() -> int:
     Returns:
         Latest draw_no + 1, or a default starting number if no draws exist.
     """
-    result = (
-        supabase.table("draw_results")
-        .select("draw_no")
-        .eq("game", "toto")
-        .order("draw_no", desc=True)
-        .limit(1)
-        .execute()
-    )
+    latest_draw = repo.latest_draw_no("toto")
 
-    if result.data and len(result.data) > 0:
-        latest_draw = result.data[0]["draw_no"]
+    if latest_draw is not None:
         print(f"[INFO] Latest TOTO draw in DB: {latest_draw}")
         return latest_draw + 1
     else:
@@ -232,15 +226,7 @@ def upsert_draw_result(payload: dict) -> bool:
     game = payload["game"]
     draw_no = payload["draw_no"]
 
-    existing = (
-        supabase.table("draw_results")
-        .select("uid")
-        .eq("game", game)
-        .eq("draw_no", draw_no)
-        .limit(1)
-        .execute()
-    )
-    if existing.data:
+    if repo.draw_exists(game, draw_no):
         print(f"[OK] {game} draw {draw_no} already exists.")
         return False
 
@@ -255,8 +241,7 @@ def upsert_draw_result(payload: dict) -> bool:
         }
     }
 
-    res = supabase.table("draw_results").insert(row).execute()
-    if not res.data:
+    if not repo.insert_draw_results([row]):
         raise RuntimeError("Insert failed (no data returned).")
 
     print(f"[NEW] Inserted {game} draw {draw_no}.")
@@ -280,5 +265,6 @@ def main():
     upsert_draw_result(parsed)
 
 
+# Run from backend/ as a module: python -m app.scrapers.toto
 if __name__ == "__main__":
     main()
\ No newline at end of file
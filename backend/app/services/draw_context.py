@@ -0,0 +1,44 @@
+"""
+Per-draw evaluation context.
+Holds what the checkers derive from a draw's result payload, so batch runs prepare it once per draw
+instead of once per ticket or entry.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class DrawContext:
+    """
+    Prepared draw, built by toto_checker.prepare_toto_draw or fourd_checker.prepare_4d_draw.
+    - TOTO: win_mask / additional_mask (49-bit masks) and prize_amounts (group -> parsed $ amount)
+    - 4D:   draw_index (number -> prize rank), digit_index (sorted digits -> [(number, rank)])
+            and rank_by_number (10,000 prize ranks indexed by the integer number)
+    """
+
+    __slots__ = (
+        "game", "payload", "win_mask", "additional_mask", "prize_amounts",
+        "draw_index", "digit_index", "rank_by_number",
+    )
+
+    def __init__(
+        self,
+        game: str,
+        payload: Dict[str, Any],
+        win_mask: int = 0,
+        additional_mask: int = 0,
+        prize_amounts: Optional[Dict[int, int]] = None,
+        draw_index: Optional[Dict[str, int]] = None,
+        digit_index: Optional[Dict[str, List[Tuple[str, int]]]] = None,
+        rank_by_number: bytes = b"",
+    ):
+        self.game = game
+        self.payload = payload
+        self.win_mask = win_mask
+        self.additional_mask = additional_mask
+        self.prize_amounts = prize_amounts or {}
+        self.draw_index = draw_index or {}
+        self.digit_index = digit_index or {}
+        self.rank_by_number = rank_by_number
+
+    def __repr__(self) -> str:
+        return f"DrawContext(game={self.game!r})"
@@ -0,0 +1,220 @@
+"""
+Batch 4D evaluation.
+Expands every bet of a draw into flat NumPy arrays of covered numbers and scores them
+against a 10,000-entry prize-rank lookup per draw (one draw, or several as a tickets x draws
+matrix), instead of one ticket at a time.
+"""
+
+from functools import lru_cache
+from itertools import permutations
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.draw_context import DrawContext
+from app.services.fourd_checker import (
+    CATEGORY_BY_RANK,
+    NO_RANK,
+    PAYOUT_TABLE,
+    STAKE_BIG,
+    STAKE_SMALL,
+    _PATTERN_STRIDE,
+    _RANK_STRIDE,
+    CompiledFourDBet,
+    compile_4d_ticket,
+    prepare_4d_draw,
+)
+
+# PAYOUT_TABLE as arrays: multiplier (0 where unpaid) and whether the slot pays at all
+_MULT = np.array([m or 0 for m in PAYOUT_TABLE], dtype=np.float64)
+_PAYS = np.array([m is not None for m in PAYOUT_TABLE], dtype=bool)
+
+
+@lru_cache(maxsize=None)
+def _permutation_numbers(digit_key: str) -> np.ndarray:
+    """Distinct permutations of a System/iBet number as ascending uint16."""
+    return np.array(sorted({int("".join(p)) for p in permutations(digit_key, 4)}), dtype=np.uint16)
+
+
+def _covered_array(bet: CompiledFourDBet) -> np.ndarray:
+    if bet.digit_key is not None:
+        return _permutation_numbers(bet.digit_key)
+    return np.frombuffer(bet.covered, dtype=np.uint16) if len(bet.covered) else np.empty(0, dtype=np.uint16)
+
+
+def _bet_result(bet: CompiledFourDBet, best_rank: int, payout: float, wins: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "label": bet.label,
+        "entry_type": bet.entry_type,
+        "base": bet.base,
+        "covered_count": bet.covered_count,
+        "best_category": CATEGORY_BY_RANK[best_rank],
+        "payout": payout,
+        "wins": wins,
+    }
+
+
+def evaluate_4d_tickets_batch(
+    tickets_details: List[Dict[str, Any]],
+    draw_payload: Dict[str, Any],
+    ctx: Optional[DrawContext] = None
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Evaluate many 4D tickets against one draw.
+
+    Returns one item per ticket, in order, with the same structure as
+    evaluate_4d_ticket. A ticket that cannot be parsed yields the exception
+    instead, so callers can record it per ticket. An invalid draw raises.
+    """
+    if ctx is None:
+        ctx = prepare_4d_draw(draw_payload)
+
+    compiled: List[Union[Tuple[CompiledFourDBet, ...], Exception]] = []
+    for ticket_details in tickets_details:
+        try:
+            compiled.append(compile_4d_ticket(ticket_details or {}))
+        except Exception as e:
+            compiled.append(e)
+
+    return evaluate_compiled_4d_batch(compiled, ctx)
+
+
+def evaluate_compiled_4d_batch(
+    compiled_tickets: List[Union[Tuple[CompiledFourDBet, ...], Exception]],
+    ctx: DrawContext
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Batch-evaluate tickets compiled by compile_4d_ticket against a prepared draw.
+    Exception items (tickets that failed to compile) are passed through unchanged.
+    """
+    matrix = evaluate_compiled_4d_matrix(compiled_tickets, [ctx])
+    return [row if isinstance(row, Exception) else row[0] for row in matrix]
+
+
+def evaluate_4d_ticket_over_draws(
+    details: Dict[str, Any],
+    draw_payloads: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate one 4D ticket against many draws (multi-draw tickets, "what-if" checks).
+    Returns one evaluate_4d_ticket-style result per draw, in order. Invalid tickets or draws raise.
+    """
+    bets = compile_4d_ticket(details or {})
+    ctxs = [prepare_4d_draw(payload) for payload in draw_payloads]
+    return evaluate_compiled_4d_matrix([bets], ctxs)[0]
+
+
+def evaluate_compiled_4d_matrix(
+    compiled_tickets: List[Union[Tuple[CompiledFourDBet, ...], Exception]],
+    ctxs: List[DrawContext]
+) -> List[Union[List[Dict[str, Any]], Exception]]:
+    """
+    Evaluate compiled tickets against several prepared draws as one tickets x draws pass.
+    Returns, per ticket, a list of results (one per draw, in ctxs order), or the ticket's
+    compile exception unchanged.
+    """
+    num_draws = len(ctxs)
+    results: List[Union[List[Dict[str, Any]], Exception, None]] = [None] * len(compiled_tickets)
+
+    # Flatten every bet of every compiled ticket; each ticket owns a contiguous slice.
+    bets: List[CompiledFourDBet] = []
+    ticket_slices = []
+    for i, parts in enumerate(compiled_tickets):
+        if isinstance(parts, Exception):
+            results[i] = parts
+            continue
+        ticket_slices.append((i, len(bets), len(bets) + len(parts)))
+        bets.extend(parts)
+
+    if not bets:
+        return results
+    if not num_draws:
+        for i, _, _ in ticket_slices:
+            results[i] = []
+        return results
+
+    num_bets = len(bets)
+
+    # One column per covered number, in the same order the single-ticket path visits them
+    covered_chunks = [_covered_array(bet) for bet in bets]
+    lengths = np.fromiter((len(c) for c in covered_chunks), dtype=np.intp, count=num_bets)
+    covered = np.concatenate(covered_chunks)
+    bet_ids = np.repeat(np.arange(num_bets, dtype=np.intp), lengths)
+
+    # draws x 10,000 prize ranks; hits come out ordered by draw, then bet, then number
+    ranks = np.stack([np.frombuffer(c.rank_by_number, dtype=np.uint8) for c in ctxs])
+    covered_ranks = ranks[:, covered]
+    hit_draws, hit_cols = np.nonzero(covered_ranks)
+    hit_bets = bet_ids[hit_cols]
+    hit_ranks = covered_ranks[hit_draws, hit_cols].astype(np.intp)
+    hit_cells = hit_draws * num_bets + hit_bets
+
+    pattern_codes = np.fromiter((b.pattern_code for b in bets), dtype=np.intp, count=num_bets)
+    big = np.fromiter((b.big for b in bets), dtype=np.float64, count=num_bets)
+    small = np.fromiter((b.small for b in bets), dtype=np.float64, count=num_bets)
+
+    slots = pattern_codes[hit_bets] * _PATTERN_STRIDE + hit_ranks * _RANK_STRIDE
+    hit_big, hit_small = big[hit_bets], small[hit_bets]
+    big_amt = np.where(_PAYS[slots + STAKE_BIG] & (hit_big > 0), hit_big * _MULT[slots + STAKE_BIG], 0.0)
+    small_amt = np.where(_PAYS[slots + STAKE_SMALL] & (hit_small > 0), hit_small * _MULT[slots + STAKE_SMALL], 0.0)
+
+    # Interleave big/small per hit so sums accumulate in the single-ticket order
+    cell_totals = np.zeros(num_draws * num_bets, dtype=np.float64)
+    np.add.at(cell_totals, np.repeat(hit_cells, 2), np.column_stack((big_amt, small_amt)).ravel())
+
+    cell_best = np.full(num_draws * num_bets, NO_RANK, dtype=np.intp)
+    np.minimum.at(cell_best, hit_cells, hit_ranks)
+
+    cell_payouts = np.zeros(num_draws * num_bets, dtype=np.float64)
+    for cell in np.unique(hit_cells).tolist():
+        cell_payouts[cell] = round(float(cell_totals[cell]), 2)
+    cell_payouts = cell_payouts.reshape(num_draws, num_bets)
+    cell_best = cell_best.reshape(num_draws, num_bets)
+
+    owner = np.empty(num_bets, dtype=np.intp)
+    for slot, (_, start, stop) in enumerate(ticket_slices):
+        owner[start:stop] = slot
+    draw_rows = np.arange(num_draws)[:, None]
+    ticket_totals = np.zeros((num_draws, len(ticket_slices)), dtype=np.float64)
+    np.add.at(ticket_totals, (draw_rows, owner[None, :]), cell_payouts)
+    ticket_best = np.full((num_draws, len(ticket_slices)), NO_RANK, dtype=np.intp)
+    np.minimum.at(ticket_best, (draw_rows, owner[None, :]), cell_best)
+
+    # Hits are sorted by (draw, bet) cell, so each cell's wins are one contiguous run
+    all_cells = np.arange(num_draws * num_bets)
+    hit_start = np.searchsorted(hit_cells, all_cells, side="left").tolist()
+    hit_stop = np.searchsorted(hit_cells, all_cells, side="right").tolist()
+    hit_numbers = covered[hit_cols].tolist()
+    hit_ranks = hit_ranks.tolist()
+    cell_best = cell_best.tolist()
+    cell_payouts = cell_payouts.tolist()
+    ticket_totals = ticket_totals.tolist()
+    ticket_best = ticket_best.tolist()
+
+    for slot, (i, start, stop) in enumerate(ticket_slices):
+        row = []
+        for d in range(num_draws):
+            bet_results = []
+            for b in range(start, stop):
+                bet = bets[b]
+                cell = d * num_bets + b
+                wins: List[Dict[str, Any]] = []
+                for h in range(hit_start[cell], hit_stop[cell]):
+                    n, rank = f"{hit_numbers[h]:04d}", hit_ranks[h]
+                    table_slot = bet.pattern_code * _PATTERN_STRIDE + rank * _RANK_STRIDE
+                    for stake_type, stake, side in (("big", bet.big, STAKE_BIG), ("small", bet.small, STAKE_SMALL)):
+                        mult = PAYOUT_TABLE[table_slot + side]
+                        if stake > 0 and mult is not None:
+                            wins.append({"matched": n, "category": CATEGORY_BY_RANK[rank], "stake_type": stake_type, "stake": stake, "mult": mult, "payout": stake * mult})
+                bet_results.append(_bet_result(bet, cell_best[d][b], cell_payouts[d][b], wins))
+
+            total = ticket_totals[d][slot]
+            row.append({
+                "is_win": total > 0,
+                "highest_prize_category": CATEGORY_BY_RANK[ticket_best[d][slot]],
+                "total_payout": round(total, 2),
+                "details": bet_results,
+            })
+        results[i] = row
+
+    return results
@@ -1,5 +1,9 @@
+from array import array
+from functools import lru_cache
 from itertools import permutations
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.services.draw_context import DrawContext
 
 # ---------- Payout tables (per $1 stake) ----------
 PAYOUT_STD_BIG = {"first": 2000, "second": 1000, "third": 490, "starter": 250, "consolation": 60}
@@ -20,6 +24,42 @@ PAYOUT_IBET_SMALL = {
 
 PRIZE_RANK = {"first": 1, "second": 2, "third": 3, "starter": 4, "consolation": 5}
 
+# Distinct permutations covered by a System/iBet number, per digit pattern
+PERMUTATION_COUNT = {"4diff": 24, "2same": 12, "2pairs": 6, "3same": 4, "allsame": 1}
+
+# ---------- Compiled tables ----------
+# Categories are integer-coded by prize rank (1 = first ... 5 = consolation).
+# CATEGORY_BY_RANK[NO_RANK] is None, so "no prize yet" decodes without a branch.
+NO_RANK = 6
+CATEGORY_BY_RANK = (None, "first", "second", "third", "starter", "consolation", None)
+
+# Pattern code 0 covers Ordinary/System/Roll (standard tables); 1..5 are iBet digit patterns.
+PATTERN_CODE = {"std": 0, "4diff": 1, "2same": 2, "2pairs": 3, "3same": 4, "allsame": 5}
+STAKE_BIG, STAKE_SMALL = 0, 1
+
+_RANK_STRIDE = 2
+_PATTERN_STRIDE = NO_RANK * _RANK_STRIDE
+
+
+def _compile_payout_table() -> Tuple[Optional[int], ...]:
+    """
+    Flatten the payout dicts into one tuple indexed by
+    pattern_code * _PATTERN_STRIDE + rank * _RANK_STRIDE + stake side.
+    None marks category/stake combinations that pay nothing.
+    """
+    table: List[Optional[int]] = [None] * (len(PATTERN_CODE) * _PATTERN_STRIDE)
+    for pattern, code in PATTERN_CODE.items():
+        big_table = PAYOUT_STD_BIG if pattern == "std" else PAYOUT_IBET_BIG.get(pattern, {})
+        small_table = PAYOUT_STD_SMALL if pattern == "std" else PAYOUT_IBET_SMALL.get(pattern, {})
+        for cat, rank in PRIZE_RANK.items():
+            slot = code * _PATTERN_STRIDE + rank * _RANK_STRIDE
+            table[slot + STAKE_BIG] = big_table.get(cat)
+            table[slot + STAKE_SMALL] = small_table.get(cat)
+    return tuple(table)
+
+
+PAYOUT_TABLE = _compile_payout_table()
+
 
 # ---------- Helpers ----------
 def _is_4d(num: str) -> bool:
@@ -35,15 +75,25 @@ def _classify_pattern(num4: str) -> str:
     return "allsame"  # e.g. "1111" (edge case)
 
 
+def _digit_key(num4: str) -> str:
+    # permutations of a number share the same sorted digits
+    return "".join(sorted(num4))
+
+
+def _require_number(bet: Dict[str, Any], et: str) -> str:
+    base = bet.get("number")
+    if not _is_4d(base):
+        raise ValueError(f"{et} requires a 4-digit string number")
+    return base
+
+
 def _expand_covered_numbers(bet: Dict[str, Any]) -> List[str]:
     # Support both 'entry_type' and 'bet_type' field names
     # Default to 'Ordinary' if neither is specified
     et = bet.get("entry_type") or bet.get("bet_type") or "Ordinary"
 
     if et in ("Ordinary", "System", "iBet"):
-        base = bet.get("number")
-        if not _is_4d(base):
-            raise ValueError(f"{et} requires a 4-digit string number")
+        base = _require_number(bet, et)
         if et == "Ordinary":
             return [base]
         return sorted({ "".join(p) for p in permutations(base, 4) })
@@ -60,7 +110,15 @@ def _expand_covered_numbers(bet: Dict[str, Any]) -> List[str]:
     raise ValueError(f"Unknown entry_type: {et}")
 
 
-def _build_draw_index(draw_payload: Dict[str, Any]) -> Dict[str, str]:
+def _build_digit_index(draw_index: Dict[str, int]) -> Dict[str, List[Tuple[str, int]]]:
+    """Sorted digits -> [(winning number, category rank), ...] ordered by winning number."""
+    digit_index: Dict[str, List[Tuple[str, int]]] = {}
+    for n in sorted(draw_index):
+        digit_index.setdefault(_digit_key(n), []).append((n, draw_index[n]))
+    return digit_index
+
+
+def _build_draw_index(draw_payload: Dict[str, Any]) -> Tuple[Dict[str, int], Dict[str, List[Tuple[str, int]]]]:
     """
     Parse 4D draw results from scraper format:
     {
@@ -68,6 +126,9 @@ def _build_draw_index(draw_payload: Dict[str, Any]) -> Dict[str, str]:
       "starter_prizes": ["....10...."],
       "consolation_prizes": ["....10...."]
     }
+    Returns (draw_index, digit_index):
+      - draw_index: winning number -> category rank (exact matches)
+      - digit_index: sorted digits -> winning numbers/category ranks (System/iBet matches)
     """
     top_prizes = draw_payload.get("top_prizes") or {}
     first = top_prizes.get("first")
@@ -81,84 +142,191 @@ def _build_draw_index(draw_payload: Dict[str, Any]) -> Dict[str, str]:
     if any(not _is_4d(x) for x in starter) or any(not _is_4d(x) for x in consolation):
         raise ValueError("Invalid 4D draw: starter/consolation must be lists of 4-digit strings")
 
-    idx: Dict[str, str] = {first: "first", second: "second", third: "third"}
-    for x in starter: idx[x] = "starter"
-    for x in consolation: idx[x] = "consolation"
-    return idx
+    idx: Dict[str, int] = {first: PRIZE_RANK["first"], second: PRIZE_RANK["second"], third: PRIZE_RANK["third"]}
+    for x in starter: idx[x] = PRIZE_RANK["starter"]
+    for x in consolation: idx[x] = PRIZE_RANK["consolation"]
+    return idx, _build_digit_index(idx)
 
 
-# ---------- Core evaluation ----------
-def evaluate_4d_bet(bet: Dict[str, Any], draw_index: Dict[str, str]) -> Dict[str, Any]:
-    covered = _expand_covered_numbers(bet)
+def _rank_table(draw_index: Dict[str, int]) -> bytes:
+    """Prize rank for every number 0000..9999 (0 = no prize), indexable by the integer number."""
+    ranks = bytearray(10000)
+    for n, rank in draw_index.items():
+        ranks[int(n)] = rank
+    return bytes(ranks)
+
+
+@lru_cache(maxsize=32)
+def _cached_tables(draw_key: Tuple[Tuple[str, int], ...]) -> Tuple[bytes, Dict[str, List[Tuple[str, int]]]]:
+    """(rank table, digit index) of a draw index, built once per draw for direct evaluate_4d_bet callers."""
+    draw_index = dict(draw_key)
+    return _rank_table(draw_index), _build_digit_index(draw_index)
+
+
+def prepare_4d_draw(draw_payload: Dict[str, Any]) -> DrawContext:
+    """Validate a 4D draw once and keep its indexes for reuse across tickets."""
+    draw_index, digit_index = _build_draw_index(draw_payload)
+    return DrawContext(
+        "4d",
+        draw_payload,
+        draw_index=draw_index,
+        digit_index=digit_index,
+        rank_by_number=_rank_table(draw_index),
+    )
+
+
+# ---------- Compiled bets ----------
+class CompiledFourDBet:
+    """
+    One 4D bet parsed once by compile_4d_bet.
+    - Ordinary/Roll: `covered` holds the covered numbers as uint16
+    - System/iBet: `digit_key` holds the sorted digits shared by every permutation
+    """
+
+    __slots__ = ("label", "entry_type", "base", "covered", "digit_key", "covered_count", "pattern_code", "big", "small")
+
+    def __init__(self, label, entry_type, base, covered, digit_key, covered_count, pattern_code, big, small):
+        self.label = label
+        self.entry_type = entry_type
+        self.base = base
+        self.covered = covered
+        self.digit_key = digit_key
+        self.covered_count = covered_count
+        self.pattern_code = pattern_code
+        self.big = big
+        self.small = small
 
-    big = float(bet.get("big_amount") or 0.0)
-    small = float(bet.get("small_amount") or 0.0)
 
+def compile_4d_bet(bet: Dict[str, Any]) -> CompiledFourDBet:
     # Support both 'entry_type' and 'bet_type' field names, default to 'Ordinary'
     et = bet.get("entry_type") or bet.get("bet_type") or "Ordinary"
-    pattern_key = _classify_pattern(bet["number"]) if et == "iBet" else None
+
+    if et in ("System", "iBet"):
+        base = _require_number(bet, et)
+        covered = array("H")
+        digit_key = _digit_key(base)
+        covered_count = PERMUTATION_COUNT[_classify_pattern(base)]
+    else:
+        numbers = _expand_covered_numbers(bet)
+        covered = array("H", (int(n) for n in numbers))
+        digit_key = None
+        covered_count = len(numbers)
+
+    big = float(bet.get("big_amount") or 0.0)
+    small = float(bet.get("small_amount") or 0.0)
+
+    pattern_key = _classify_pattern(bet["number"]) if et == "iBet" else "std"
+
+    return CompiledFourDBet(
+        label=bet.get("label") or bet.get("number", "?"),  # fallback to number if no label
+        entry_type=et,
+        base=bet.get("number") or bet.get("roll_pattern"),
+        covered=covered,
+        digit_key=digit_key,
+        covered_count=covered_count,
+        pattern_code=PATTERN_CODE[pattern_key],
+        big=big,
+        small=small,
+    )
+
+
+def compile_4d_ticket(ticket_details: Dict[str, Any]) -> Tuple[CompiledFourDBet, ...]:
+    bets = ticket_details.get("fourd_bets") or []
+    if not bets:
+        raise ValueError("Invalid 4D ticket: missing fourd_bets")
+    return tuple(compile_4d_bet(bet) for bet in bets)
+
+
+# ---------- Core evaluation ----------
+def _evaluate_compiled_bet(
+    bet: CompiledFourDBet,
+    rank_by_number: bytes,
+    digit_index: Dict[str, List[Tuple[str, int]]]
+) -> Dict[str, Any]:
+    if bet.digit_key is not None:
+        # every permutation shares the sorted-digit key, so one lookup finds all hits
+        hits = digit_index.get(bet.digit_key, [])
+    else:
+        hits = [(f"{n:04d}", rank_by_number[n]) for n in bet.covered if rank_by_number[n]]
+
+    big, small = bet.big, bet.small
+    table_base = bet.pattern_code * _PATTERN_STRIDE
 
     wins: List[Dict[str, Any]] = []
     total = 0.0
-    best_rank: Optional[int] = None
-
-    for n in covered:
-        cat = draw_index.get(n)
-        if not cat:
-            continue
+    best_rank = NO_RANK
 
-        best_rank = min(best_rank or 999, PRIZE_RANK[cat])
+    for n, rank in hits:
+        if rank < best_rank:
+            best_rank = rank
+        slot = table_base + rank * _RANK_STRIDE
 
         if big > 0:
-            mult = (PAYOUT_IBET_BIG.get(pattern_key, {}).get(cat) if et == "iBet" else PAYOUT_STD_BIG.get(cat))
+            mult = PAYOUT_TABLE[slot + STAKE_BIG]
             if mult is not None:
                 amt = big * mult
                 total += amt
-                wins.append({"matched": n, "category": cat, "stake_type": "big", "stake": big, "mult": mult, "payout": amt})
+                wins.append({"matched": n, "category": CATEGORY_BY_RANK[rank], "stake_type": "big", "stake": big, "mult": mult, "payout": amt})
 
         if small > 0:
-            mult = (PAYOUT_IBET_SMALL.get(pattern_key, {}).get(cat) if et == "iBet" else PAYOUT_STD_SMALL.get(cat))
+            mult = PAYOUT_TABLE[slot + STAKE_SMALL]
             if mult is not None:
                 amt = small * mult
                 total += amt
-                wins.append({"matched": n, "category": cat, "stake_type": "small", "stake": small, "mult": mult, "payout": amt})
-
-    best_category = None
-    if best_rank is not None:
-        best_category = min(PRIZE_RANK.keys(), key=lambda k: PRIZE_RANK[k] if PRIZE_RANK[k] == best_rank else 999)
+                wins.append({"matched": n, "category": CATEGORY_BY_RANK[rank], "stake_type": "small", "stake": small, "mult": mult, "payout": amt})
 
     return {
-        "label": bet.get("label") or bet.get("number", "?"),  # fallback to number if no label
-        "entry_type": et,
-        "base": bet.get("number") or bet.get("roll_pattern"),
-        "covered_count": len(covered),
-        "best_category": best_category,
+        "label": bet.label,
+        "entry_type": bet.entry_type,
+        "base": bet.base,
+        "covered_count": bet.covered_count,
+        "best_category": CATEGORY_BY_RANK[best_rank],
         "payout": round(total, 2),
         "wins": wins,  # keep for debugging/notifications detail
     }
 
 
-def evaluate_4d_ticket(ticket_details: Dict[str, Any], draw_payload: Dict[str, Any]) -> Dict[str, Any]:
-    bets = ticket_details.get("fourd_bets") or []
-    if not bets:
-        raise ValueError("Invalid 4D ticket: missing fourd_bets")
+def evaluate_4d_bet(
+    bet: Dict[str, Any],
+    draw_index: Dict[str, int],
+    digit_index: Optional[Dict[str, List[Tuple[str, int]]]] = None,
+    ctx: Optional[DrawContext] = None
+) -> Dict[str, Any]:
+    # pass a ctx from prepare_4d_draw to reuse its tables; otherwise they are cached per draw index
+    compiled = compile_4d_bet(bet)
+    if ctx is not None:
+        return _evaluate_compiled_bet(compiled, ctx.rank_by_number, ctx.digit_index)
+    rank_by_number, cached_digit_index = _cached_tables(tuple(sorted(draw_index.items())))
+    return _evaluate_compiled_bet(compiled, rank_by_number, digit_index if digit_index is not None else cached_digit_index)
+
+
+def evaluate_4d_ticket(
+    ticket_details: Dict[str, Any],
+    draw_payload: Dict[str, Any],
+    ctx: Optional[DrawContext] = None
+) -> Dict[str, Any]:
+    # pass a ctx from prepare_4d_draw to skip rebuilding the draw index per ticket
+    bets = compile_4d_ticket(ticket_details)
+    if ctx is None:
+        ctx = prepare_4d_draw(draw_payload)
+    return evaluate_compiled_4d_ticket(bets, ctx)
+
 
-    draw_index = _build_draw_index(draw_payload)
+def evaluate_compiled_4d_ticket(bets: Tuple[CompiledFourDBet, ...], ctx: DrawContext) -> Dict[str, Any]:
+    rank_by_number, digit_index = ctx.rank_by_number, ctx.digit_index
 
     bet_results = []
     total = 0.0
-    best_rank: Optional[int] = None
+    best_rank = NO_RANK
 
     for bet in bets:
-        r = evaluate_4d_bet(bet, draw_index)
+        r = _evaluate_compiled_bet(bet, rank_by_number, digit_index)
         bet_results.append(r)
         total += r["payout"]
         if r["best_category"]:
-            best_rank = min(best_rank or 999, PRIZE_RANK[r["best_category"]])
+            best_rank = min(best_rank, PRIZE_RANK[r["best_category"]])
 
-    highest_category = None
-    if best_rank is not None:
-        highest_category = min(PRIZE_RANK.keys(), key=lambda k: PRIZE_RANK[k] if PRIZE_RANK[k] == best_rank else 999)
+    highest_category = CATEGORY_BY_RANK[best_rank]
 
     return {
         "is_win": total > 0,
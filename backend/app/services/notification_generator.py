@@ -3,16 +3,33 @@ Notification service for creating user notifications based on ticket check resul
 Compatible with BOTH old ticket_check.details format (list) and new format (dict with entries/winning_details/payout).
 """
 
-from typing import Dict, Any, Tuple
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from fastapi import HTTPException
+from app.repositories import Repository, SupabaseRepository
 from app.services.dbconfig import supabase
+from app.services.write_buffer import summarize_latency
 import re
 
+# Notifications per insert; their JSON bodies are larger than check rows, so chunks are smaller
+NOTIFICATION_CHUNK_SIZE = 200
+# Retries of a failing chunk (backing off) before it is split to isolate bad rows
+NOTIFICATION_RETRIES = 2
+# Unconsumed ticket checks read per page by generate_notifications_for_all_checks
+NOTIFICATION_PAGE_SIZE = 1000
+# Failed notification attempts of a check before the cursor gives up on it
+NOTIFICATION_MAX_ATTEMPTS = 5
+
 
 # -------------------------
 # Helpers
 # -------------------------
 
+def _repository(repo: Optional[Repository]) -> Repository:
+    """`repo`, or the Supabase repository over the service client."""
+    return repo if repo is not None else SupabaseRepository(supabase)
+
+
 def _parse_money(value: Any) -> int:
     """
     "$316,308" -> 316308, "-" -> 0, None -> 0
@@ -60,291 +77,230 @@ def _extract_win_info(ticket_check: Dict[str, Any], draw_payload: Dict[str, Any]
     return 0, 0, {}
 
 
-def _notification_exists(ticket_check_id: Any) -> bool:
+def _ticket_numbers(game_type: str, ticket_details: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The user's numbers from a ticket's details (TOTO entries or 4D bets)."""
+    ticket_numbers = []
+
+    if game_type == "TOTO":
+        toto_entries = ticket_details.get("toto_entries") or []
+        if not toto_entries:
+            # OLD format: single toto_entry
+            toto_entry = ticket_details.get("toto_entry")
+            if toto_entry:
+                toto_entries = [toto_entry]
+
+        for entry in toto_entries:
+            entry_nums = entry.get("numbers", [])
+            if entry_nums:
+                label = entry.get("label", "")
+                ticket_numbers.append({
+                    "label": label,
+                    "numbers": sorted(entry_nums)
+                })
+
+    elif game_type == "4D":
+        fourd_bets = ticket_details.get("fourd_bets") or []
+        for bet in fourd_bets:
+            number = bet.get("number")
+            bet_type = bet.get("bet_type") or bet.get("entry_type") or "Ordinary"
+            if number:
+                ticket_numbers.append({
+                    "number": number,
+                    "bet_type": bet_type
+                })
+
+    return ticket_numbers
+
+
+def _draw_winning_numbers(game_type: str, draw_payload: Dict[str, Any]) -> Dict[str, Any]:
+    """The official winning numbers of a draw."""
+    if game_type == "TOTO":
+        return {
+            "winning_numbers": sorted(draw_payload.get("winning_numbers", [])),
+            "additional_number": draw_payload.get("additional_number")
+        }
+
+    if game_type == "4D":
+        top_prizes = draw_payload.get("top_prizes", {}) or {}
+        return {
+            "first": top_prizes.get("first"),
+            "second": top_prizes.get("second"),
+            "third": top_prizes.get("third"),
+            "starter": draw_payload.get("starter_prizes", []),
+            "consolation": draw_payload.get("consolation_prizes", [])
+        }
+
+    return {}
+
+
+def _winning_bets(ticket_check: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """For 4D, which numbers actually won and in what category."""
+    check_details = ticket_check.get("details", {})
+    if not isinstance(check_details, dict):
+        return []
+
+    winning_bets = []
+    for bet_result in check_details.get("bet_results", []):
+        if bet_result.get("best_category"):
+            for win in bet_result.get("wins", []):
+                winning_bets.append({
+                    "number": win.get("matched"),
+                    "category": win.get("category"),
+                    "payout": win.get("payout", 0)
+                })
+    return winning_bets
+
+
+def _winning_combos(ticket_check: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Winning combinations from the ticket check details (old list or new dict format)."""
+    check_details = ticket_check.get("details", {})
+    if isinstance(check_details, dict):
+        # NEW format: details is dict with winning_details array
+        winning_details = check_details.get("winning_details", [])
+    elif isinstance(check_details, list):
+        # OLD format: details is list of winning combos
+        winning_details = check_details
+    else:
+        winning_details = []
+
+    return [
+        {
+            "combination": detail.get("combination", []),
+            "prize_group": detail.get("prize_group"),
+            "main_matches": detail.get("main_matches"),
+            "has_additional": detail.get("has_additional", False)
+        }
+        for detail in winning_details
+    ]
+
+
+# -------------------------
+# Notification builders (in memory, no database access)
+# -------------------------
+
+def build_win_notification(ticket_check: Dict[str, Any], ticket: Dict[str, Any], draw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Notification row for a winning ticket check, built from the check, its ticket and its draw.
+    """
+    user_id = ticket.get("user_id")
+    game_type = (ticket.get("game_type") or "").upper()
+    draw_date = draw.get("draw_date")
+    draw_no = draw.get("draw_no")
+    draw_payload = draw.get("result", {}) or {}
+
+    prize_group = ticket_check.get("highest_prize_group")
+    winning_combinations, total_payout, counts_by_group = _extract_win_info(ticket_check, draw_payload)
+
+    ticket_numbers = _ticket_numbers(game_type, ticket.get("details", {}) or {})
+    draw_winning_numbers = _draw_winning_numbers(game_type, draw_payload)
+    if game_type == "4D":
+        winning_bets = _winning_bets(ticket_check)
+        if winning_bets:
+            draw_winning_numbers["your_matches"] = winning_bets
+
+    title = f"🎉 Congratulations! You Won {game_type}!"
+    message = f"Your ticket has won Prize Group {prize_group} in the {game_type} Draw #{draw_no}!"
+    if winning_combinations > 1:
+        message += f" You have {winning_combinations} winning combinations!"
+    if total_payout > 0:
+        message += f" Total winnings: ${total_payout}."
+
+    return {
+        "user_id": user_id,
+        "ticket_check_id": str(ticket_check["id"]),
+        "type": "win",
+        "title": title,
+        "message": message,
+        "data": {
+            "game_type": game_type,
+            "draw_date": str(draw_date),
+            "draw_no": draw_no,
+            "prize_group": prize_group,
+            "winning_combinations": winning_combinations,
+            "total_payout": total_payout,
+            "prize_amount": total_payout,  # Alias for frontend compatibility
+            "counts_by_group": counts_by_group,
+            "ticket_numbers": ticket_numbers,  # Your ticket numbers
+            "draw_winning_numbers": draw_winning_numbers,  # Official draw winning numbers
+            "winning_combos": _winning_combos(ticket_check),  # User's winning combinations
+            "ticket_id": ticket_check["ticket_id"],
+            "ticket_check_id": str(ticket_check["id"]),
+        },
+        "is_read": False,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def build_loss_notification(ticket_check: Dict[str, Any], ticket: Dict[str, Any], draw: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Check if a notification already exists for this ticket_check.
-    data->>ticket_check_id is stored as string in JSON.
+    Notification row for a losing ticket check, built from the check, its ticket and its draw.
     """
-    check_id_str = str(ticket_check_id)
-    existing = supabase.table("notifications").select("id").eq("data->>ticket_check_id", check_id_str).execute()
-    return bool(existing.data)
+    user_id = ticket.get("user_id")
+    game_type = (ticket.get("game_type") or "").upper()
+    draw_date = draw.get("draw_date")
+    draw_no = draw.get("draw_no")
+    draw_payload = draw.get("result", {}) or {}
+
+    title = f"Draw Results: {game_type} Draw #{draw_no}"
+    message = f"Your ticket for {game_type} Draw #{draw_no} did not win this time. Better luck next draw!"
+
+    return {
+        "user_id": user_id,
+        "ticket_check_id": str(ticket_check["id"]),
+        "type": "loss",
+        "title": title,
+        "message": message,
+        "data": {
+            "game_type": game_type,
+            "draw_date": str(draw_date),
+            "draw_no": draw_no,
+            "ticket_numbers": _ticket_numbers(game_type, ticket.get("details", {}) or {}),  # Your ticket numbers
+            "draw_winning_numbers": _draw_winning_numbers(game_type, draw_payload),  # Official draw winning numbers
+            "ticket_id": ticket_check["ticket_id"],
+            "ticket_check_id": str(ticket_check["id"]),
+        },
+        "is_read": False,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
 
 
 # -------------------------
 # Notification creators
 # -------------------------
 
-def create_win_notification(ticket_check: Dict[str, Any]) -> Dict[str, Any]:
+def _create_notification(ticket_check: Dict[str, Any], build: Callable[..., Dict[str, Any]], repo: Repository) -> Dict[str, Any]:
+    """Fetch one check's ticket and draw, then build and insert its notification (skipped if it exists)."""
+    ticket = repo.get_ticket(ticket_check["ticket_id"])
+    if not ticket:
+        raise ValueError(f"Ticket not found: {ticket_check['ticket_id']}")
+
+    # IMPORTANT: ticket_check.draw_id is draw_results.uid
+    draw = repo.get_draw(ticket_check["draw_id"])
+    if not draw:
+        raise ValueError(f"Draw not found: {ticket_check['draw_id']}")
+
+    inserted = repo.upsert_notifications([build(ticket_check, ticket, draw)])
+    return inserted[0] if inserted else {}
+
+
+def create_win_notification(ticket_check: Dict[str, Any], repo: Optional[Repository] = None) -> Dict[str, Any]:
     """
     Create a notification for a winning ticket check.
+    Returns the new notification, or {} if the check was already notified.
     """
     try:
-        if _notification_exists(ticket_check["id"]):
-            # return the existing id (optional)
-            existing = supabase.table("notifications").select("*").eq("data->>ticket_check_id", str(ticket_check["id"])).single().execute()
-            return existing.data or {}
-
-        # Ticket
-        ticket_response = supabase.table("tickets").select("*").eq("id", ticket_check["ticket_id"]).single().execute()
-        if not ticket_response.data:
-            raise ValueError(f"Ticket not found: {ticket_check['ticket_id']}")
-        ticket = ticket_response.data
-        user_id = ticket.get("user_id")
-        game_type = (ticket.get("game_type") or "").upper()
-
-        # Draw (IMPORTANT: ticket_check.draw_id is draw_results.uid )
-        draw_response = supabase.table("draw_results").select("*").eq("uid", ticket_check["draw_id"]).single().execute()
-        if not draw_response.data:
-            raise ValueError(f"Draw not found: {ticket_check['draw_id']}")
-        draw = draw_response.data
-        draw_date = draw.get("draw_date")
-        draw_no = draw.get("draw_no")
-        draw_payload = draw.get("result", {}) or {}
-
-        prize_group = ticket_check.get("highest_prize_group")
-
-        winning_combinations, total_payout, counts_by_group = _extract_win_info(ticket_check, draw_payload)
-
-        # Extract ticket numbers from entries
-        ticket_details = ticket.get("details", {}) or {}
-        ticket_numbers = []
-        
-        # Extract draw winning numbers
-        draw_winning_numbers = {}
-        
-        if game_type == "TOTO":
-            # TOTO: Extract user's ticket numbers
-            toto_entries = ticket_details.get("toto_entries") or []
-            if not toto_entries:
-                # OLD format: single toto_entry
-                toto_entry = ticket_details.get("toto_entry")
-                if toto_entry:
-                    toto_entries = [toto_entry]
-            
-            for entry in toto_entries:
-                entry_nums = entry.get("numbers", [])
-                if entry_nums:
-                    label = entry.get("label", "")
-                    ticket_numbers.append({
-                        "label": label,
-                        "numbers": sorted(entry_nums)
-                    })
-            
-            # TOTO: Extract draw winning numbers
-            draw_winning_numbers = {
-                "winning_numbers": sorted(draw_payload.get("winning_numbers", [])),
-                "additional_number": draw_payload.get("additional_number")
-            }
-            
-        elif game_type == "4D":
-            # 4D: Extract user's bet numbers
-            fourd_bets = ticket_details.get("fourd_bets") or []
-            for bet in fourd_bets:
-                number = bet.get("number")
-                bet_type = bet.get("bet_type") or bet.get("entry_type") or "Ordinary"
-                if number:
-                    ticket_numbers.append({
-                        "number": number,
-                        "bet_type": bet_type
-                    })
-            
-            # 4D: Extract draw winning numbers
-            top_prizes = draw_payload.get("top_prizes", {}) or {}
-            draw_winning_numbers = {
-                "first": top_prizes.get("first"),
-                "second": top_prizes.get("second"),
-                "third": top_prizes.get("third"),
-                "starter": draw_payload.get("starter_prizes", []),
-                "consolation": draw_payload.get("consolation_prizes", [])
-            }
-            
-            # For 4D, also extract which numbers actually won and in what category
-            check_details = ticket_check.get("details", {})
-            bet_results = check_details.get("bet_results", [])
-            winning_bets = []
-            for bet_result in bet_results:
-                if bet_result.get("best_category"):
-                    wins = bet_result.get("wins", [])
-                    for win in wins:
-                        winning_bets.append({
-                            "number": win.get("matched"),
-                            "category": win.get("category"),
-                            "payout": win.get("payout", 0)
-                        })
-            
-            if winning_bets:
-                draw_winning_numbers["your_matches"] = winning_bets
-
-        # Extract winning combinations from ticket check details
-        winning_combos = []
-        check_details = ticket_check.get("details", {})
-        if isinstance(check_details, dict):
-            # NEW format: details is dict with winning_details array
-            winning_details = check_details.get("winning_details", [])
-            for detail in winning_details:
-                winning_combos.append({
-                    "combination": detail.get("combination", []),
-                    "prize_group": detail.get("prize_group"),
-                    "main_matches": detail.get("main_matches"),
-                    "has_additional": detail.get("has_additional", False)
-                })
-        elif isinstance(check_details, list):
-            # OLD format: details is list of winning combos
-            for detail in check_details:
-                winning_combos.append({
-                    "combination": detail.get("combination", []),
-                    "prize_group": detail.get("prize_group"),
-                    "main_matches": detail.get("main_matches"),
-                    "has_additional": detail.get("has_additional", False)
-                })
-
-        title = f"🎉 Congratulations! You Won {game_type}!"
-        message = f"Your ticket has won Prize Group {prize_group} in the {game_type} Draw #{draw_no}!"
-        if winning_combinations > 1:
-            message += f" You have {winning_combinations} winning combinations!"
-        if total_payout > 0:
-            message += f" Total winnings: ${total_payout}."
-
-        from datetime import datetime, timezone
-        notification_data = {
-            "user_id": user_id,
-            "type": "win",
-            "title": title,
-            "message": message,
-            "data": {
-                "game_type": game_type,
-                "draw_date": str(draw_date),
-                "draw_no": draw_no,
-                "prize_group": prize_group,
-                "winning_combinations": winning_combinations,
-                "total_payout": total_payout,
-                "prize_amount": total_payout,  # Alias for frontend compatibility
-                "counts_by_group": counts_by_group,
-                "ticket_numbers": ticket_numbers,  # Your ticket numbers
-                "draw_winning_numbers": draw_winning_numbers,  # Official draw winning numbers
-                "winning_combos": winning_combos,  # User's winning combinations
-                "ticket_id": ticket_check["ticket_id"],
-                "ticket_check_id": str(ticket_check["id"]),
-            },
-            "is_read": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-        }
-
-        response = supabase.table("notifications").insert(notification_data).execute()
-        if not response.data:
-            raise ValueError("Failed to create notification")
-        return response.data[0]
-
+        return _create_notification(ticket_check, build_win_notification, _repository(repo))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create win notification: {str(e)}")
 
 
-def create_loss_notification(ticket_check: Dict[str, Any]) -> Dict[str, Any]:
+def create_loss_notification(ticket_check: Dict[str, Any], repo: Optional[Repository] = None) -> Dict[str, Any]:
     """
     Create a notification for a losing ticket check.
+    Returns the new notification, or {} if the check was already notified.
     """
     try:
-        if _notification_exists(ticket_check["id"]):
-            existing = supabase.table("notifications").select("*").eq("data->>ticket_check_id", str(ticket_check["id"])).single().execute()
-            return existing.data or {}
-
-        # Ticket
-        ticket_response = supabase.table("tickets").select("*").eq("id", ticket_check["ticket_id"]).single().execute()
-        if not ticket_response.data:
-            raise ValueError(f"Ticket not found: {ticket_check['ticket_id']}")
-        ticket = ticket_response.data
-        user_id = ticket.get("user_id")
-        game_type = (ticket.get("game_type") or "").upper()
-
-        # Draw (use uid)
-        draw_response = supabase.table("draw_results").select("*").eq("uid", ticket_check["draw_id"]).single().execute()
-        if not draw_response.data:
-            raise ValueError(f"Draw not found: {ticket_check['draw_id']}")
-        draw = draw_response.data
-        draw_date = draw.get("draw_date")
-        draw_no = draw.get("draw_no")
-        draw_payload = draw.get("result", {}) or {}
-
-        # Extract ticket numbers from entries
-        ticket_details = ticket.get("details", {}) or {}
-        ticket_numbers = []
-        
-        # Extract draw winning numbers
-        draw_winning_numbers = {}
-        
-        if game_type == "TOTO":
-            # TOTO: Extract user's ticket numbers
-            toto_entries = ticket_details.get("toto_entries") or []
-            if not toto_entries:
-                # OLD format: single toto_entry
-                toto_entry = ticket_details.get("toto_entry")
-                if toto_entry:
-                    toto_entries = [toto_entry]
-            
-            for entry in toto_entries:
-                entry_nums = entry.get("numbers", [])
-                if entry_nums:
-                    label = entry.get("label", "")
-                    ticket_numbers.append({
-                        "label": label,
-                        "numbers": sorted(entry_nums)
-                    })
-            
-            # TOTO: Extract draw winning numbers
-            draw_winning_numbers = {
-                "winning_numbers": sorted(draw_payload.get("winning_numbers", [])),
-                "additional_number": draw_payload.get("additional_number")
-            }
-            
-        elif game_type == "4D":
-            # 4D: Extract user's bet numbers
-            fourd_bets = ticket_details.get("fourd_bets") or []
-            for bet in fourd_bets:
-                number = bet.get("number")
-                bet_type = bet.get("bet_type") or bet.get("entry_type") or "Ordinary"
-                if number:
-                    ticket_numbers.append({
-                        "number": number,
-                        "bet_type": bet_type
-                    })
-            
-            # 4D: Extract draw winning numbers
-            top_prizes = draw_payload.get("top_prizes", {}) or {}
-            draw_winning_numbers = {
-                "first": top_prizes.get("first"),
-                "second": top_prizes.get("second"),
-                "third": top_prizes.get("third"),
-                "starter": draw_payload.get("starter_prizes", []),
-                "consolation": draw_payload.get("consolation_prizes", [])
-            }
-
-        title = f"Draw Results: {game_type} Draw #{draw_no}"
-        message = f"Your ticket for {game_type} Draw #{draw_no} did not win this time. Better luck next draw!"
-
-        from datetime import datetime, timezone
-        notification_data = {
-            "user_id": user_id,
-            "type": "loss",
-            "title": title,
-            "message": message,
-            "data": {
-                "game_type": game_type,
-                "draw_date": str(draw_date),
-                "draw_no": draw_no,
-                "ticket_numbers": ticket_numbers,  # Your ticket numbers
-                "draw_winning_numbers": draw_winning_numbers,  # Official draw winning numbers
-                "ticket_id": ticket_check["ticket_id"],
-                "ticket_check_id": str(ticket_check["id"]),
-            },
-            "is_read": False,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-        }
-
-        response = supabase.table("notifications").insert(notification_data).execute()
-        if not response.data:
-            raise ValueError("Failed to create notification")
-        return response.data[0]
-
+        return _create_notification(ticket_check, build_loss_notification, _repository(repo))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create loss notification: {str(e)}")
 
@@ -353,76 +309,178 @@ def create_loss_notification(ticket_check: Dict[str, Any]) -> Dict[str, Any]:
 # Generators
 # -------------------------
 
-def generate_notifications_for_draw(draw_id: str, notify_losses: bool = False) -> Dict[str, Any]:
+def _notify_checks(
+    checks: List[Dict[str, Any]],
+    notify_losses: bool,
+    repo: Repository,
+    results: Dict[str, Any],
+    chunk_size: int = NOTIFICATION_CHUNK_SIZE,
+    retries: int = NOTIFICATION_RETRIES,
+    tickets: Optional[Dict[str, Dict[str, Any]]] = None,
+    draws: Optional[Dict[str, Dict[str, Any]]] = None,
+    max_attempts: int = NOTIFICATION_MAX_ATTEMPTS
+) -> None:
     """
-    Generate notifications for all ticket checks of a specific draw.
+    Notify a batch of checks. Tickets and draws (by id) are prefetched in bulk (in_ queries)
+    unless the caller already has them, so building each notification needs no further
+    reads; the rows are then inserted in chunks
+    of `chunk_size`, and each chunk's latency is reported. Checks that already have a
+    notification are dropped by the insert itself (unique ticket_check_id) and counted as skipped.
+
+    Every check is then consumed (stamped notified_at), so the cursor in
+    generate_notifications_for_all_checks moves past it: losses left out by notify_losses=False
+    are stamped notify_skipped, and failed checks are picked up again by the next run until
+    they have failed `max_attempts` times.
     """
-    try:
-        checks_response = supabase.table("ticket_checks").select("*").eq("draw_id", draw_id).execute()
-        checks = checks_response.data or []
-
-        results = {
-            "draw_id": draw_id,
-            "total_checks": len(checks),
-            "win_notifications": 0,
-            "loss_notifications": 0,
-            "errors": [],
-        }
+    results["total_checks_processed"] += len(checks)
+    errors_before = len(results["errors"])
+
+    pending = [check for check in checks if check.get("is_win") or notify_losses]
+    if tickets is None:
+        tickets = {str(t["id"]): t for t in repo.get_tickets({check["ticket_id"] for check in pending})}
+    if draws is None:
+        draws = {str(d["uid"]): d for d in repo.get_draws({check["draw_id"] for check in pending})}
+
+    def count(rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            results[f"{row['type']}_notifications"] += 1
+
+    buffer = repo.notification_buffer(chunk_size, on_written=count, retries=retries)
+    built = 0
+    for check in pending:
+        try:
+            ticket = tickets.get(str(check["ticket_id"]))
+            if not ticket:
+                raise ValueError(f"Ticket not found: {check['ticket_id']}")
+            draw = draws.get(str(check["draw_id"]))
+            if not draw:
+                raise ValueError(f"Draw not found: {check['draw_id']}")
+
+            build = build_win_notification if check.get("is_win") else build_loss_notification
+            buffer.add(build(check, ticket, draw))
+            built += 1
+        except Exception as e:
+            results["errors"].append({"ticket_check_id": check.get("id"), "error": str(e)})
+
+    buffer.flush()
+    results["skipped"] += built - buffer.written - len(buffer.errors)
+    results["errors"].extend(buffer.errors)
+    results["insert_chunks"].extend(buffer.chunk_stats)
+    results["insert_latency"] = summarize_latency(results["insert_chunks"])
+
+    failed = {str(e.get("ticket_check_id")) for e in results["errors"][errors_before:]}
+    repo.mark_checks_notified(check["id"] for check in pending if str(check["id"]) not in failed)
+    repo.mark_checks_notified((check["id"] for check in checks if not (check.get("is_win") or notify_losses)), skipped=True)
+    repo.record_notify_failures((check["id"] for check in pending if str(check["id"]) in failed), max_attempts)
+
+
+def _new_results(**fields: Any) -> Dict[str, Any]:
+    return {
+        **fields,
+        "total_checks_processed": 0,
+        "win_notifications": 0,
+        "loss_notifications": 0,
+        "skipped": 0,
+        "errors": [],
+        "insert_chunks": [],
+        "insert_latency": summarize_latency([]),
+    }
+
+
+class CheckNotifier:
+    """
+    Fused check-and-notify for one draw: notifications are built from the ticket_checks
+    rows as the checker persists them, with the draw and ticket rows the checker already
+    loaded, and inserted right after each check batch. Nothing is read back.
 
+    Hook on_written into the check buffer and track() every page of tickets; results has
+    the same counters as the generators.
+    """
+
+    def __init__(
+        self,
+        repo: Repository,
+        draw: Dict[str, Any],
+        notify_losses: bool = False,
+        chunk_size: int = NOTIFICATION_CHUNK_SIZE
+    ):
+        self.repo = repo
+        self.draw = draw
+        self.game_type = str(draw.get("game") or "").upper()
+        self.notify_losses = notify_losses
+        self.chunk_size = chunk_size
+        self.results = _new_results()
+        self._tickets: Dict[str, Dict[str, Any]] = {}
+
+    def track(self, tickets: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> None:
+        """Keep the ticket rows ({id, user_id, details}) behind check rows about to be written."""
+        pending = {str(row["ticket_id"]) for row in rows}
+        for ticket in tickets:
+            if str(ticket["id"]) in pending:
+                self._tickets[str(ticket["id"])] = {**ticket, "game_type": self.game_type}
+
+    def on_written(self, checks: List[Dict[str, Any]]) -> None:
+        """Check-buffer callback: notify the checks that were just persisted."""
+        tickets = {}
         for check in checks:
-            try:
-                if _notification_exists(check["id"]):
-                    continue
-
-                if check.get("is_win"):
-                    create_win_notification(check)
-                    results["win_notifications"] += 1
-                elif notify_losses:
-                    create_loss_notification(check)
-                    results["loss_notifications"] += 1
-            except Exception as e:
-                results["errors"].append({"ticket_check_id": check.get("id"), "error": str(e)})
+            ticket = self._tickets.pop(str(check["ticket_id"]), None)
+            if ticket:
+                tickets[str(check["ticket_id"])] = ticket
+        _notify_checks(
+            checks, self.notify_losses, self.repo, self.results, self.chunk_size,
+            tickets=tickets, draws={str(self.draw["uid"]): self.draw},
+        )
+
+
+def generate_notifications_for_draw(
+    draw_id: str,
+    notify_losses: bool = False,
+    repo: Optional[Repository] = None,
+    chunk_size: int = NOTIFICATION_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Generate notifications for all ticket checks of a specific draw,
+    inserted `chunk_size` rows per write.
+    """
+    try:
+        repo = _repository(repo)
+        checks = repo.get_ticket_checks(draw_id)
 
+        results = _new_results(draw_id=draw_id, total_checks=len(checks))
+        _notify_checks(checks, notify_losses, repo, results, chunk_size)
         return results
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate notifications: {str(e)}")
 
 
-def generate_notifications_for_all_checks(notify_losses: bool = False) -> Dict[str, Any]:
+def generate_notifications_for_all_checks(
+    notify_losses: bool = False,
+    repo: Optional[Repository] = None,
+    chunk_size: int = NOTIFICATION_CHUNK_SIZE,
+    page_size: int = NOTIFICATION_PAGE_SIZE
+) -> Dict[str, Any]:
     """
-    Generate notifications for all ticket checks that don't have notifications yet.
-    Idempotent: checks if notification already exists before creating.
+    Generate notifications for the ticket checks produced since the last run,
+    inserted `chunk_size` rows per write.
+
+    Only checks not yet consumed (notified_at is null) are read, a page at a time in id
+    order, so a run costs as much as the new checks rather than the whole table.
+    Idempotent: already-notified checks are skipped.
     """
     try:
-        checks_response = supabase.table("ticket_checks").select("*").execute()
-        checks = checks_response.data or []
-
-        results = {
-            "total_checks_processed": 0,
-            "win_notifications": 0,
-            "loss_notifications": 0,
-            "skipped": 0,
-            "errors": [],
-        }
-
-        for check in checks:
-            try:
-                if _notification_exists(check["id"]):
-                    results["skipped"] += 1
-                    continue
-
-                results["total_checks_processed"] += 1
-
-                if check.get("is_win"):
-                    create_win_notification(check)
-                    results["win_notifications"] += 1
-                elif notify_losses:
-                    create_loss_notification(check)
-                    results["loss_notifications"] += 1
-
-            except Exception as e:
-                results["errors"].append({"ticket_check_id": check.get("id"), "error": str(e)})
+        repo = _repository(repo)
+        results = _new_results()
+
+        last_id = None
+        while True:
+            checks = repo.unnotified_check_page(last_id, page_size)
+            if not checks:
+                break
+            _notify_checks(checks, notify_losses, repo, results, chunk_size)
+            if len(checks) < page_size:
+                break
+            last_id = checks[-1]["id"]
 
         return results
 
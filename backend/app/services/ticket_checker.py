@@ -3,29 +3,316 @@ Ticket checking service for BOTH TOTO + 4D draws.
 Evaluates user tickets against official draw results and persists outcomes.
 """
 
-from typing import Dict, Any
+import hashlib
+import json
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from multiprocessing import get_context
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
 from fastapi import HTTPException
 
+from app.repositories import Repository, SupabaseRepository
 from app.services.dbconfig import supabase
-from app.services.toto_checker import evaluate_toto_ticket
-from app.services.fourd_checker import evaluate_4d_ticket
+from app.services.draw_context import DrawContext
+from app.services.toto_batch import evaluate_compiled_toto_batch
+from app.services.toto_checker import evaluate_compiled_toto_ticket, prepare_toto_draw
+from app.services.fourd_batch import evaluate_compiled_4d_batch
+from app.services.fourd_checker import evaluate_compiled_4d_ticket, prepare_4d_draw
+from app.services.notification_generator import NOTIFICATION_CHUNK_SIZE, CheckNotifier
+from app.services.ticket_compiler import compile_ticket
+from app.services.write_buffer import DEFAULT_CHUNK_SIZE, UpsertBuffer, is_row_error
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+def _repository(repo: Optional[Repository]) -> Repository:
+    """`repo`, or the Supabase repository over the service client."""
+    return repo if repo is not None else SupabaseRepository(supabase)
+
+
+def _keyset_pages(
+    fetch_page: Callable[[Optional[str]], List[Dict[str, Any]]],
+    page_size: int,
+    after: Optional[str] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield pages from fetch_page(last_id) until a short page, keyset-paginated by id (starting after `after`)."""
+    last_id = after
+    while True:
+        page = fetch_page(last_id) or []
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def shard_bounds(shard: Optional[Tuple[int, int]]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Ticket-id range [lo, hi) of shard (index, count), splitting the UUID space evenly.
+    None bounds are open-ended; no shard means every ticket.
+    """
+    if shard is None:
+        return None, None
+    index, count = shard
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {index}/{count}")
+    lo = str(uuid.UUID(int=(index << 128) // count)) if index > 0 else None
+    hi = str(uuid.UUID(int=((index + 1) << 128) // count)) if index < count - 1 else None
+    return lo, hi
+
+
+def iter_ticket_pages(
+    game_type: str,
+    draw_date: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    shard: Optional[Tuple[int, int]] = None,
+    repo: Optional[Repository] = None,
+    after: Optional[str] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream a draw's tickets in pages of `page_size`, keyset-paginated by id.
+    Only `id` and `details` are fetched - all the evaluators need.
+    With `shard` (index, count), only that slice of the ticket-id space is read;
+    with `after`, only tickets after that id (resuming a checkpoint).
+    """
+    bounds = shard_bounds(shard)
+    repo = _repository(repo)
+
+    def fetch_page(last_id):
+        return repo.ticket_page(game_type, draw_date, last_id, page_size, bounds)
+
+    return _keyset_pages(fetch_page, page_size, after)
+
+
+def iter_unchecked_ticket_pages(
+    draw_id: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    shard: Optional[Tuple[int, int]] = None,
+    repo: Optional[Repository] = None,
+    after: Optional[str] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream only the draw's tickets without a ticket_checks row (anti-join in the
+    unchecked_tickets_for_draw() RPC), in pages of `page_size` keyed by id.
+    """
+    bounds = shard_bounds(shard)
+    repo = _repository(repo)
+
+    def fetch_page(last_id):
+        return repo.unchecked_ticket_page(draw_id, last_id, page_size, bounds)
+
+    return _keyset_pages(fetch_page, page_size, after)
+
+
+def result_counter(results: Dict[str, Any]) -> Callable[[List[Dict[str, Any]]], None]:
+    """on_written callback counting checked/wins/losses as ticket_checks rows are persisted."""
+    def on_written(rows):
+        for row in rows:
+            results["tickets_checked"] += 1
+            if row["is_win"]:
+                results["wins"] += 1
+            else:
+                results["losses"] += 1
+
+    return on_written
+
+
+def _shard_key(shard: Optional[Tuple[int, int]], unchecked_only: bool = False) -> str:
+    # Full and unchecked-only runs walk different ticket sets, so they never share a checkpoint
+    mode = "unchecked" if unchecked_only else "full"
+    return f"{mode}:all" if shard is None else f"{mode}:{shard[0]}/{shard[1]}"
+
+
+class _Checkpoint:
+    """
+    Durable progress of one (draw, mode, shard) check in check_checkpoints.
+
+    Saved after every flushed batch: tickets are processed in id order, so once a batch
+    ending at ticket X is persisted, every ticket up to X is written, skipped or failed.
+    A rerun of the same mode resumes after X with the saved counts; a crash costs at most
+    one batch. Checkpoints older than the draw's last watermark advance are not resumed.
+    Unchecked rows that were not rewritten (skipped()) count in the saved totals only once
+    they are at or below X, since a rerun counts the ones after X again.
+    """
+
+    def __init__(
+        self,
+        repo: Repository,
+        draw_id: str,
+        shard: Optional[Tuple[int, int]],
+        results: Dict[str, Any],
+        unchecked_only: bool = False
+    ):
+        self.repo = repo
+        self.draw_id = draw_id
+        self.shard = _shard_key(shard, unchecked_only)
+        self.results = results
+        self.buffer: Optional[UpsertBuffer] = None
+        self.count = result_counter(results)
+        # unchanged rows already in results, possibly past the last saved ticket id
+        self._skipped: List[Dict[str, Any]] = []
+
+    def resume(self) -> Optional[str]:
+        """Restore counts from a saved checkpoint; returns the ticket id to continue after, or None."""
+        saved = self.repo.get_checkpoint(self.draw_id, self.shard)
+        if not saved:
+            return None
+        for key in ("tickets_checked", "wins", "losses", "writes_skipped"):
+            self.results[key] = saved.get(key) or 0
+        self.results["errors"].extend(saved.get("errors") or [])
+        self.results["resumed_from"] = saved["last_ticket_id"]
+        return saved["last_ticket_id"]
+
+    def skipped(self, rows: List[Dict[str, Any]]) -> None:
+        """Unchanged rows counted in results without a write; saved once the cursor passes them."""
+        self._skipped.extend(rows)
+
+    def on_written(self, rows: List[Dict[str, Any]]) -> None:
+        """Buffer callback: count the persisted rows, then checkpoint at the last one."""
+        self.count(rows)
+        if not rows:
+            return
+        last_id = max((row["ticket_id"] for row in rows), key=str)
+        pending = self.buffer.errors if self.buffer is not None else []
+        self._skipped = [row for row in self._skipped if str(row["ticket_id"]) > str(last_id)]
+        counts = {k: self.results[k] for k in ("tickets_checked", "wins", "losses", "writes_skipped")}
+        ahead = {"tickets_checked": 0, "wins": 0, "losses": 0}
+        result_counter(ahead)(self._skipped)
+        for key, n in ahead.items():
+            counts[key] -= n
+        counts["writes_skipped"] -= len(self._skipped)
+        self.repo.save_checkpoint({
+            "draw_id": self.draw_id,
+            "shard": self.shard,
+            "last_ticket_id": last_id,
+            **counts,
+            # errors of tickets after last_id are recorded again when the rerun reaches them
+            "errors": [e for e in self.results["errors"] + pending if str(e.get("ticket_id")) <= str(last_id)],
+        })
+
+    def clear(self) -> None:
+        self.repo.delete_checkpoint(self.draw_id, self.shard)
+
+
+def _check_buffer(
+    repo: Repository,
+    chunk_size: int,
+    checkpoint: _Checkpoint,
+    notifier: Optional[CheckNotifier]
+) -> UpsertBuffer:
+    """ticket_checks buffer that checkpoints every flushed batch, then (fused mode) notifies it."""
+    def on_written(rows):
+        checkpoint.on_written(rows)
+        if notifier is not None:
+            notifier.on_written(rows)
+
+    checkpoint.buffer = repo.ticket_check_buffer(chunk_size, on_written=on_written)
+    return checkpoint.buffer
+
+
+def _notification_summary(notifier: Optional[CheckNotifier]) -> Dict[str, Any]:
+    """Fused-mode notification counts for a draw result ({} without a notifier)."""
+    if notifier is None:
+        return {}
+    return {
+        "win_notifications": notifier.results["win_notifications"],
+        "loss_notifications": notifier.results["loss_notifications"],
+        "notification_errors": notifier.results["errors"],
+    }
+
+
+def check_row_hash(row: Dict[str, Any]) -> str:
+    """Stable hash of a ticket_checks row's outcome, stored as result_hash."""
+    outcome = {k: row.get(k) for k in ("is_win", "highest_prize_group", "details")}
+    payload = json.dumps(outcome, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def split_unchanged(
+    rows: List[Dict[str, Any]],
+    existing: Dict[Any, Optional[str]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split rows into (changed, unchanged) against stored hashes {ticket_id: result_hash}."""
+    changed, unchanged = [], []
+    for row in rows:
+        if existing.get(row["ticket_id"]) == row["result_hash"]:
+            unchanged.append(row)
+        else:
+            changed.append(row)
+    return changed, unchanged
+
+
+def _drop_unchanged(
+    draw_id: str,
+    rows: List[Dict[str, Any]],
+    results: Dict[str, Any],
+    repo: Repository,
+    checkpoint: _Checkpoint
+) -> List[Dict[str, Any]]:
+    """Return only rows whose outcome differs from the stored check; unchanged ones count as checked."""
+    existing = repo.get_result_hashes(draw_id, [row["ticket_id"] for row in rows])
+
+    changed, unchanged = split_unchanged(rows, existing)
+    results["writes_skipped"] += len(unchanged)
+    result_counter(results)(unchanged)
+    checkpoint.skipped(unchanged)
+    return changed
 
 
 # -------------------------
 # Draw processing: TOTO
 # -------------------------
 
-def check_tickets_for_draw(draw_id: str) -> Dict[str, Any]:
+def _toto_check_row(ticket_id: Any, draw_id: str, evaluation: Dict[str, Any]) -> Dict[str, Any]:
+    """ticket_checks row for a TOTO evaluation."""
+    row = {
+        "ticket_id": ticket_id,
+        "draw_id": draw_id,
+        "is_win": evaluation["is_win"],
+        "highest_prize_group": evaluation["highest_prize_group"],  # int group 1..7
+        "details": {
+            "entries": evaluation["entries"],
+            "winning_details": evaluation["winning_details"],
+            "payout": evaluation["payout"],
+        },
+    }
+    row["result_hash"] = check_row_hash(row)
+    return row
+
+
+def check_tickets_for_draw(
+    draw_id: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    unchecked_only: bool = False,
+    shard: Optional[Tuple[int, int]] = None,
+    repo: Optional[Repository] = None,
+    notify: bool = False,
+    notify_losses: bool = False,
+    notify_chunk_size: int = NOTIFICATION_CHUNK_SIZE
+) -> Dict[str, Any]:
     """
     Check all TOTO tickets for a specific draw and persist results.
+    Tickets are streamed in pages of `page_size` and results written
+    as bulk upserts of `chunk_size` rows. With `unchecked_only`, only tickets
+    without a ticket_checks row for the draw are evaluated; with `shard` (index, count),
+    only that slice of ticket ids.
+    Rows whose result_hash matches the stored check are not rewritten (writes_skipped).
+    Progress is checkpointed after every flushed batch; a rerun after a crash resumes
+    from the checkpoint (resumed_from). Tickets that fail are dead-lettered (check_dead_letters).
+    With `notify` (fused mode), each persisted batch is notified straight away from the
+    in-memory check rows and ticket page (see CheckNotifier), instead of a later read-back pass.
+    Reads and writes go through `repo` (Supabase by default).
     IDEMPOTENT - safe to run multiple times.
     """
+    repo = _repository(repo)
     try:
-        draw_response = supabase.table("draw_results").select("*").eq("uid", draw_id).single().execute()
-        if not draw_response.data:
+        draw = repo.get_draw(draw_id)
+        if not draw:
             raise HTTPException(status_code=404, detail=f"Draw not found: {draw_id}")
 
-        draw = draw_response.data
         game = str(draw.get("game") or "").lower()
         draw_date = draw.get("draw_date")
         draw_payload = draw.get("result", {}) or {}
@@ -33,51 +320,40 @@ def check_tickets_for_draw(draw_id: str) -> Dict[str, Any]:
         if game != "toto":
             raise HTTPException(status_code=400, detail=f"Unsupported game type: {draw.get('game')}")
 
-        tickets_response = (
-            supabase.table("tickets")
-            .select("*")
-            .eq("game_type", "TOTO")
-            .eq("draw_date", draw_date)
-            .execute()
-        )
-        tickets = tickets_response.data or []
+        results = {"tickets_checked": 0, "wins": 0, "losses": 0, "writes_skipped": 0, "errors": []}
+        checkpoint = _Checkpoint(repo, draw_id, shard, results, unchecked_only)
+        after = checkpoint.resume()
+
+        if unchecked_only:
+            pages = iter_unchecked_ticket_pages(draw_id, page_size, shard, repo, after)
+        else:
+            pages = iter_ticket_pages("TOTO", draw_date, page_size, shard, repo, after)
+        first_page = next(pages, None)
 
-        if not tickets:
+        if not first_page and after is None:
             return {"draw_id": draw_id, "tickets_checked": 0, "wins": 0, "losses": 0, "message": "No tickets found for this draw"}
 
-        results = {"tickets_checked": 0, "wins": 0, "losses": 0, "errors": []}
+        # Prepare the draw once, evaluate each page in one vectorized pass, then persist per ticket
+        ctx = prepare_toto_draw(draw_payload)
+        notifier = CheckNotifier(repo, draw, notify_losses, notify_chunk_size) if notify else None
+        buffer = _check_buffer(repo, chunk_size, checkpoint, notifier)
 
-        for ticket in tickets:
-            try:
-                ticket_id = ticket.get("id")
-                ticket_details = ticket.get("details", {}) or {}
-
-                evaluation = evaluate_toto_ticket(ticket_details, draw_payload)
-
-                ticket_check = {
-                    "ticket_id": ticket_id,
-                    "draw_id": draw_id,
-                    "is_win": evaluation["is_win"],
-                    "highest_prize_group": evaluation["highest_prize_group"],  # int group 1..7
-                    "details": {
-                        "entries": evaluation["entries"],
-                        "winning_details": evaluation["winning_details"],
-                        "payout": evaluation["payout"],
-                    },
-                }
-
-                supabase.table("ticket_checks").upsert(ticket_check, on_conflict="ticket_id,draw_id").execute()
-
-                results["tickets_checked"] += 1
-                if evaluation["is_win"]:
-                    results["wins"] += 1
-                else:
-                    results["losses"] += 1
+        for tickets in chain([first_page] if first_page else [], pages):
+            rows, errors = evaluate_ticket_page("toto", draw_id, ctx, tickets)
+            results["errors"].extend(errors)
+            if not unchecked_only:
+                rows = _drop_unchanged(draw_id, rows, results, repo, checkpoint)
+            if notifier is not None:
+                notifier.track(tickets, rows)
+            for row in rows:
+                buffer.add(row)
 
-            except Exception as e:
-                results["errors"].append({"ticket_id": ticket.get("id"), "error": str(e)})
+        buffer.flush()
+        results["errors"].extend(buffer.errors)
+        repo.record_dead_letters(draw_id, results["errors"])
+        checkpoint.clear()
 
-        return {"draw_id": draw_id, "game_type": "toto", "draw_date": draw_date, **results}
+        return {"draw_id": draw_id, "game_type": "toto", "draw_date": draw_date, **results, **_notification_summary(notifier)}
 
     except HTTPException:
         raise
@@ -91,17 +367,59 @@ def check_tickets_for_draw(draw_id: str) -> Dict[str, Any]:
 
 _FOURD_CATEGORY_TO_GROUP = {"first": 1, "second": 2, "third": 3, "starter": 4, "consolation": 5}
 
-def check_4d_tickets_for_draw(draw_id: str) -> Dict[str, Any]:
+
+def _fourd_check_row(ticket_id: Any, draw_id: str, evaluation: Dict[str, Any]) -> Dict[str, Any]:
+    """ticket_checks row for a 4D evaluation: {is_win, highest_prize_category, total_payout, details:[...]}."""
+    cat = evaluation.get("highest_prize_category")
+    mapped_group = _FOURD_CATEGORY_TO_GROUP.get(cat) if cat else None
+
+    row = {
+        "ticket_id": ticket_id,
+        "draw_id": draw_id,
+        "is_win": evaluation["is_win"],
+        # keep column usable even if it's integer typed in DB
+        "highest_prize_group": mapped_group,
+        "details": {
+            "highest_prize_category": cat,             # "first"/"second"/...
+            "payout": {"total_payout": evaluation.get("total_payout", 0)},
+            "bet_results": evaluation.get("details", []),
+        },
+    }
+    row["result_hash"] = check_row_hash(row)
+    return row
+
+
+def check_4d_tickets_for_draw(
+    draw_id: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    unchecked_only: bool = False,
+    shard: Optional[Tuple[int, int]] = None,
+    repo: Optional[Repository] = None,
+    notify: bool = False,
+    notify_losses: bool = False,
+    notify_chunk_size: int = NOTIFICATION_CHUNK_SIZE
+) -> Dict[str, Any]:
     """
     Check all 4D tickets for a specific draw and persist results.
+    Tickets are streamed in pages of `page_size` and results written
+    as bulk upserts of `chunk_size` rows. With `unchecked_only`, only tickets
+    without a ticket_checks row for the draw are evaluated; with `shard` (index, count),
+    only that slice of ticket ids.
+    Rows whose result_hash matches the stored check are not rewritten (writes_skipped).
+    Progress is checkpointed after every flushed batch; a rerun after a crash resumes
+    from the checkpoint (resumed_from). Tickets that fail are dead-lettered (check_dead_letters).
+    With `notify` (fused mode), each persisted batch is notified straight away from the
+    in-memory check rows and ticket page (see CheckNotifier), instead of a later read-back pass.
+    Reads and writes go through `repo` (Supabase by default).
     IDEMPOTENT - safe to run multiple times.
     """
+    repo = _repository(repo)
     try:
-        draw_response = supabase.table("draw_results").select("*").eq("uid", draw_id).single().execute()
-        if not draw_response.data:
+        draw = repo.get_draw(draw_id)
+        if not draw:
             raise HTTPException(status_code=404, detail=f"Draw not found: {draw_id}")
 
-        draw = draw_response.data
         game = str(draw.get("game") or "").lower()
         draw_date = draw.get("draw_date")
         draw_payload = draw.get("result", {}) or {}
@@ -110,56 +428,40 @@ def check_4d_tickets_for_draw(draw_id: str) -> Dict[str, Any]:
         if game != "4d":
             raise HTTPException(status_code=400, detail=f"Unsupported game type: {draw.get('game')}")
 
-        tickets_response = (
-            supabase.table("tickets")
-            .select("*")
-            .eq("game_type", "4D")
-            .eq("draw_date", draw_date)
-            .execute()
-        )
-        tickets = tickets_response.data or []
+        results = {"tickets_checked": 0, "wins": 0, "losses": 0, "writes_skipped": 0, "errors": []}
+        checkpoint = _Checkpoint(repo, draw_id, shard, results, unchecked_only)
+        after = checkpoint.resume()
+
+        if unchecked_only:
+            pages = iter_unchecked_ticket_pages(draw_id, page_size, shard, repo, after)
+        else:
+            pages = iter_ticket_pages("4D", draw_date, page_size, shard, repo, after)
+        first_page = next(pages, None)
 
-        if not tickets:
+        if not first_page and after is None:
             return {"draw_id": draw_id, "tickets_checked": 0, "wins": 0, "losses": 0, "message": "No tickets found for this draw"}
 
-        results = {"tickets_checked": 0, "wins": 0, "losses": 0, "errors": []}
+        # Index the draw once, evaluate each page's bets in one vectorized pass, then persist per ticket
+        ctx = prepare_4d_draw(draw_payload)
+        notifier = CheckNotifier(repo, draw, notify_losses, notify_chunk_size) if notify else None
+        buffer = _check_buffer(repo, chunk_size, checkpoint, notifier)
 
-        for ticket in tickets:
-            try:
-                ticket_id = ticket.get("id")
-                ticket_details = ticket.get("details", {}) or {}
-
-                evaluation = evaluate_4d_ticket(ticket_details, draw_payload)
-                # evaluation: {is_win, highest_prize_category, total_payout, details:[...]}
-
-                cat = evaluation.get("highest_prize_category")
-                mapped_group = _FOURD_CATEGORY_TO_GROUP.get(cat) if cat else None
-
-                ticket_check = {
-                    "ticket_id": ticket_id,
-                    "draw_id": draw_id,
-                    "is_win": evaluation["is_win"],
-                    # keep column usable even if it's integer typed in DB
-                    "highest_prize_group": mapped_group,
-                    "details": {
-                        "highest_prize_category": cat,             # "first"/"second"/...
-                        "payout": {"total_payout": evaluation.get("total_payout", 0)},
-                        "bet_results": evaluation.get("details", []),
-                    },
-                }
-
-                supabase.table("ticket_checks").upsert(ticket_check, on_conflict="ticket_id,draw_id").execute()
-
-                results["tickets_checked"] += 1
-                if evaluation["is_win"]:
-                    results["wins"] += 1
-                else:
-                    results["losses"] += 1
+        for tickets in chain([first_page] if first_page else [], pages):
+            rows, errors = evaluate_ticket_page("4d", draw_id, ctx, tickets)
+            results["errors"].extend(errors)
+            if not unchecked_only:
+                rows = _drop_unchanged(draw_id, rows, results, repo, checkpoint)
+            if notifier is not None:
+                notifier.track(tickets, rows)
+            for row in rows:
+                buffer.add(row)
 
-            except Exception as e:
-                results["errors"].append({"ticket_id": ticket.get("id"), "error": str(e)})
+        buffer.flush()
+        results["errors"].extend(buffer.errors)
+        repo.record_dead_letters(draw_id, results["errors"])
+        checkpoint.clear()
 
-        return {"draw_id": draw_id, "game_type": "4d", "draw_date": draw_date, **results}
+        return {"draw_id": draw_id, "game_type": "4d", "draw_date": draw_date, **results, **_notification_summary(notifier)}
 
     except HTTPException:
         raise
@@ -167,61 +469,366 @@ def check_4d_tickets_for_draw(draw_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"4D ticket checking failed: {str(e)}")
 
 
+# -------------------------
+# Page evaluation
+# -------------------------
+
+def evaluate_ticket_page(
+    game: str,
+    draw_id: str,
+    ctx: DrawContext,
+    tickets: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Evaluate one page of tickets ({id, details}) against a prepared draw in one vectorized pass.
+    Returns (ticket_checks rows, per-ticket errors).
+    """
+    compiled = []
+    for ticket in tickets:
+        try:
+            compiled.append(compile_ticket(game, ticket.get("id"), ticket.get("details", {}) or {}).parts)
+        except Exception as e:
+            compiled.append(e)
+
+    if game == "toto":
+        evaluations, build_row = evaluate_compiled_toto_batch(compiled, ctx), _toto_check_row
+    else:
+        evaluations, build_row = evaluate_compiled_4d_batch(compiled, ctx), _fourd_check_row
+
+    rows, errors = [], []
+    for ticket, evaluation in zip(tickets, evaluations):
+        try:
+            if isinstance(evaluation, Exception):
+                raise evaluation
+            rows.append(build_row(ticket.get("id"), draw_id, evaluation))
+        except Exception as e:
+            errors.append({"ticket_id": ticket.get("id"), "error": str(e), "error_type": type(e).__name__})
+
+    return rows, errors
+
+
+# -------------------------
+# Single ticket
+# -------------------------
+
+def check_ticket(ticket_id: str, repo: Optional[Repository] = None) -> Dict[str, Any]:
+    """
+    Check one ticket right away (e.g. just after it is saved) if its draw result
+    is already in draw_results. Otherwise the ticket is left for the scheduled run.
+    IDEMPOTENT - safe to run multiple times.
+    """
+    repo = _repository(repo)
+    try:
+        ticket = repo.get_ticket(ticket_id)
+        if not ticket:
+            raise HTTPException(status_code=404, detail=f"Ticket not found: {ticket_id}")
+
+        game = str(ticket.get("game_type") or "").lower()
+        if game not in ("toto", "4d"):
+            raise HTTPException(status_code=400, detail=f"Unsupported game type: {ticket.get('game_type')}")
+
+        draw = repo.find_draw(game, ticket.get("draw_date"))
+        if not draw:
+            return {"ticket_id": ticket_id, "status": "pending", "message": "Draw result not available yet"}
+
+        draw_id = draw.get("uid")
+        draw_payload = draw.get("result", {}) or {}
+        try:
+            ctx = prepare_toto_draw(draw_payload) if game == "toto" else prepare_4d_draw(draw_payload)
+        except ValueError as e:
+            # the stored draw is broken, not the user's ticket
+            raise HTTPException(status_code=500, detail=f"Invalid draw result {draw_id}: {str(e)}")
+
+        compiled = compile_ticket(game, ticket_id, ticket.get("details", {}) or {})
+
+        if game == "toto":
+            evaluation = evaluate_compiled_toto_ticket(compiled.parts, ctx)
+            ticket_check = _toto_check_row(ticket_id, draw_id, evaluation)
+        else:
+            evaluation = evaluate_compiled_4d_ticket(compiled.parts, ctx)
+            ticket_check = _fourd_check_row(ticket_id, draw_id, evaluation)
+
+        repo.upsert_ticket_checks([ticket_check])
+
+        return {
+            "ticket_id": ticket_id,
+            "status": "checked",
+            "draw_id": draw_id,
+            "is_win": ticket_check["is_win"],
+            "highest_prize_group": ticket_check["highest_prize_group"],
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid ticket: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ticket checking failed: {str(e)}")
+
+
+# -------------------------
+# Dead letters
+# -------------------------
+
+DEAD_LETTER_MAX_ATTEMPTS = 5
+
+
+def retry_dead_letters(
+    max_attempts: int = DEAD_LETTER_MAX_ATTEMPTS,
+    limit: int = DEFAULT_PAGE_SIZE,
+    repo: Optional[Repository] = None
+) -> Dict[str, Any]:
+    """
+    Re-check dead-lettered tickets whose backoff has elapsed, and nothing else.
+    Tickets, draws and rows are handled in bulk per draw. Recovered tickets (and tickets
+    or draws that no longer exist) leave the dead-letter table; tickets that fail again
+    count another attempt and back off further, until `max_attempts`. A draw that fails
+    as a whole on bad data (e.g. a broken draw result) fails all its letters, not the whole
+    run; any other failure (connection, 5xx) stops the run and leaves the letters untouched.
+    """
+    repo = _repository(repo)
+    try:
+        letters = repo.due_dead_letters(max_attempts, limit)
+        results = {"retried": len(letters), "recovered": 0, "wins": 0, "failed": 0, "dropped": 0, "errors": []}
+        if not letters:
+            return results
+
+        ticket_ids_by_draw: Dict[str, List[str]] = {}
+        for letter in letters:
+            ticket_ids_by_draw.setdefault(str(letter["draw_id"]), []).append(str(letter["ticket_id"]))
+        draws = {str(d["uid"]): d for d in repo.get_draws(ticket_ids_by_draw)}
+        tickets = {str(t["id"]): t for t in repo.get_tickets(i for ids in ticket_ids_by_draw.values() for i in ids)}
+
+        for draw_id, ticket_ids in ticket_ids_by_draw.items():
+            draw = draws.get(draw_id)
+            game = str((draw or {}).get("game") or "").lower()
+            if draw is None or game not in ("toto", "4d"):
+                page, gone = [], ticket_ids
+            else:
+                page = [tickets[i] for i in ticket_ids if i in tickets]
+                gone = [i for i in ticket_ids if i not in tickets]
+
+            recovered: List[Any] = []
+
+            def on_written(rows):
+                recovered.extend(row["ticket_id"] for row in rows)
+                results["wins"] += sum(1 for row in rows if row["is_win"])
+
+            errors: List[Dict[str, Any]] = []
+            try:
+                if page:
+                    draw_payload = draw.get("result", {}) or {}
+                    ctx = prepare_toto_draw(draw_payload) if game == "toto" else prepare_4d_draw(draw_payload)
+                    rows, errors = evaluate_ticket_page(game, draw_id, ctx, page)
+                    buffer = repo.ticket_check_buffer(on_written=on_written)
+                    for row in rows:
+                        buffer.add(row)
+                    buffer.flush()
+                    errors.extend(buffer.errors)
+            except Exception as e:
+                if not is_row_error(e):
+                    raise
+                # Every letter of the draw not written yet fails this attempt; other draws go on
+                done = {str(i) for i in recovered}
+                errors = [
+                    {"ticket_id": t["id"], "error": str(e), "error_type": type(e).__name__}
+                    for t in page if str(t["id"]) not in done
+                ]
+
+            repo.delete_dead_letters(draw_id, recovered + gone)
+            repo.record_dead_letters(draw_id, errors, retry=True)
+            results["recovered"] += len(recovered)
+            results["dropped"] += len(gone)
+            results["failed"] += len(errors)
+            results["errors"].extend(dict(e, draw_id=draw_id) for e in errors)
+
+        return results
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Dead-letter retry failed: {str(e)}")
+
+
 # -------------------------
 # Batch processing (dispatcher)
 # -------------------------
 
-def check_all_unprocessed_draws() -> Dict[str, Any]:
+def _advance_watermark(draw: Dict[str, Any], draw_result: Dict[str, Any], repo: Repository) -> None:
+    """Record that every ticket up to the RPC's as_of time is checked for this draw."""
+    repo.upsert_draw_check_status({
+        "draw_id": draw.get("uid"),
+        "game": draw.get("game"),
+        "draw_date": draw.get("draw_date"),
+        "checked_through": draw.get("as_of"),
+        "tickets_checked": draw_result.get("tickets_checked", 0),
+    })
+
+
+def _check_draw_unit(
+    game: str,
+    draw_id: str,
+    shard: Optional[Tuple[int, int]],
+    pipeline: bool = False,
+    notify: bool = False,
+    notify_losses: bool = False,
+    notify_chunk_size: int = NOTIFICATION_CHUNK_SIZE,
+    repo: Optional[Repository] = None
+) -> Dict[str, Any]:
+    """Check one (draw, shard) work unit; runs in a pool worker when workers > 1."""
+    try:
+        if pipeline:
+            # imported here: ticket_pipeline builds on this module
+            from app.services.ticket_pipeline import run_check_pipelined
+            return run_check_pipelined(draw_id, unchecked_only=True, shard=shard)
+        run_checker = check_tickets_for_draw if game == "toto" else check_4d_tickets_for_draw
+        return run_checker(
+            draw_id, unchecked_only=True, shard=shard, repo=repo,
+            notify=notify, notify_losses=notify_losses, notify_chunk_size=notify_chunk_size,
+        )
+    except Exception as e:
+        return {"draw_id": draw_id, "game": game, "error": str(e)}
+
+
+def _merge_draw_results(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine the shard results of one draw into a single draw summary."""
+    if len(parts) == 1:
+        return parts[0]
+
+    merged = {
+        "draw_id": parts[0].get("draw_id"), "tickets_checked": 0, "wins": 0, "losses": 0,
+        "writes_skipped": 0, "errors": [], "shards": len(parts),
+    }
+    failures = []
+    for part in parts:
+        if "error" in part:
+            failures.append(part["error"])
+            merged.setdefault("game", part.get("game"))
+            continue
+        merged["game_type"] = part.get("game_type", merged.get("game_type"))
+        merged["draw_date"] = part.get("draw_date", merged.get("draw_date"))
+        for key in ("tickets_checked", "wins", "losses", "writes_skipped"):
+            merged[key] += part.get(key, 0)
+        merged["errors"].extend(part.get("errors", []))
+        if "win_notifications" in part:
+            for key in ("win_notifications", "loss_notifications"):
+                merged[key] = merged.get(key, 0) + part[key]
+            merged.setdefault("notification_errors", []).extend(part["notification_errors"])
+    if failures:
+        merged["error"] = "; ".join(failures)
+    return merged
+
+
+def check_all_unprocessed_draws(
+    workers: int = 1,
+    shard: Optional[Tuple[int, int]] = None,
+    pipeline: bool = False,
+    repo: Optional[Repository] = None,
+    notify: bool = False,
+    notify_losses: bool = False,
+    notify_chunk_size: int = NOTIFICATION_CHUNK_SIZE
+) -> Dict[str, Any]:
     """
-    Check all draws that have tickets but no ticket_checks yet.
+    Check all draws that have tickets without ticket_checks yet.
     Supports both TOTO and 4D.
+
+    Draws come from the draws_with_unchecked_tickets() RPC, which only looks at tickets
+    newer than each draw's draw_check_status watermark, and only those unchecked tickets
+    are evaluated. The watermark advances once a draw is checked; tickets that failed are
+    dead-lettered (and skipped by the RPCs), and retry_dead_letters re-checks them with backoff.
+
+    Work is partitioned by draw and ticket-id shard: `shard` (index, count) restricts this
+    run to one slice of ticket ids (e.g. one of several CI jobs), and `workers` > 1 splits
+    each draw's slice further across a process pool. Sharded runs leave the watermark
+    alone, since no single job has seen the whole draw; so do runs resumed from a checkpoint.
+    An un-sharded run (the final step after sharded jobs) also advances the watermark of
+    every draw whose tickets were all checked elsewhere (draws_with_stale_watermark).
+
+    With `pipeline`, each unit runs through ticket_pipeline (async fetch / evaluate / write
+    stages overlapping on bounded queues) instead of the sequential checker.
+
+    With `notify` (fused check-and-notify), every unit notifies the checks it writes, in the
+    same batch (see CheckNotifier); notifications are deduplicated on ticket_check_id, so
+    shards and workers can notify independently. Not supported with the pipeline.
+
+    `repo` (Supabase by default) serves in-process runs; pool workers and the pipeline
+    open their own Supabase connections, so they cannot be given one.
     """
     try:
-        # Pull both games, dispatch by draw.game
-        draws_response = supabase.table("draw_results").select("uid, game, draw_date").execute()
-        draws = draws_response.data or []
+        if shard is not None:
+            shard_bounds(shard)  # validate early
+        if repo is not None and (workers > 1 or pipeline):
+            raise ValueError("repo is only supported with workers=1 and no pipeline")
+        if notify and pipeline:
+            raise ValueError("notify (fused check-and-notify) is not supported with the pipeline")
+        repo = _repository(repo)
+
+        draws = [
+            d for d in repo.draws_with_unchecked_tickets()
+            if str(d.get("game") or "").lower() in ("toto", "4d")
+        ]
 
         results = {
             "draws_processed": 0,
             "total_tickets_checked": 0,
             "total_wins": 0,
             "total_losses": 0,
+            "total_writes_skipped": 0,
+            "total_dead_lettered": 0,
+            "watermarks_advanced": 0,
             "draw_summaries": [],
         }
+        if notify:
+            results.update(total_win_notifications=0, total_loss_notifications=0)
 
+        # One unit per (draw, sub-shard); sub-shard j of this run is global shard index * workers + j
+        workers = max(1, workers)
+        shard_index, shard_count = shard or (0, 1)
+        units = []
         for draw in draws:
-            draw_id = draw.get("uid")
-            game = str(draw.get("game") or "").lower()
-            draw_date = draw.get("draw_date")
-
-            if game not in ("toto", "4d"):
+            for j in range(workers):
+                unit_shard = (shard_index * workers + j, shard_count * workers)
+                units.append((
+                    str(draw.get("game")).lower(), draw.get("uid"), unit_shard if unit_shard[1] > 1 else None,
+                    pipeline, notify, notify_losses, notify_chunk_size,
+                ))
+
+        if workers == 1:
+            outcomes = [_check_draw_unit(*unit, repo=repo) for unit in units]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+                outcomes = list(pool.map(_check_draw_unit, *zip(*units))) if units else []
+
+        for n, draw in enumerate(draws):
+            parts = outcomes[n * workers:(n + 1) * workers]
+            draw_result = _merge_draw_results(parts)
+
+            if all("error" in part for part in parts):
+                results["draw_summaries"].append(draw_result)
                 continue
 
-            ticket_game_type = "TOTO" if game == "toto" else "4D"
-            run_checker = check_tickets_for_draw if game == "toto" else check_4d_tickets_for_draw
-
-            existing_checks = supabase.table("ticket_checks").select("id", count="exact").eq("draw_id", draw_id).execute()
-            tickets_count = (
-                supabase.table("tickets")
-                .select("id", count="exact")
-                .eq("game_type", ticket_game_type)
-                .eq("draw_date", draw_date)
-                .execute()
-            )
-
-            tickets_total = tickets_count.count or 0
-            checks_total = existing_checks.count or 0
-
-            if tickets_total > 0 and checks_total < tickets_total:
-                try:
-                    draw_result = run_checker(draw_id)
-                    results["draws_processed"] += 1
-                    results["total_tickets_checked"] += draw_result.get("tickets_checked", 0)
-                    results["total_wins"] += draw_result.get("wins", 0)
-                    results["total_losses"] += draw_result.get("losses", 0)
-                    results["draw_summaries"].append(draw_result)
-                except Exception as e:
-                    results["draw_summaries"].append({"draw_id": draw_id, "game": game, "error": str(e)})
+            results["draws_processed"] += 1
+            results["total_tickets_checked"] += draw_result.get("tickets_checked", 0)
+            results["total_wins"] += draw_result.get("wins", 0)
+            results["total_losses"] += draw_result.get("losses", 0)
+            results["total_writes_skipped"] += draw_result.get("writes_skipped", 0)
+            results["total_dead_lettered"] += len(draw_result.get("errors", []))
+            if notify:
+                results["total_win_notifications"] += draw_result.get("win_notifications", 0)
+                results["total_loss_notifications"] += draw_result.get("loss_notifications", 0)
+            results["draw_summaries"].append(draw_result)
+
+            # A resumed unit skipped ids below its checkpoint, where tickets may have been added since
+            resumed = any(part.get("resumed_from") for part in parts)
+            if shard is None and not resumed and "error" not in draw_result:
+                _advance_watermark(draw, draw_result, repo)
+                results["watermarks_advanced"] += 1
+
+        if shard is None:
+            # Draws finished by sharded jobs (or by earlier resumed runs) no longer have unchecked tickets
+            advanced = {str(draw.get("uid")) for draw in draws}
+            for draw in repo.draws_with_stale_watermark():
+                if str(draw.get("uid")) not in advanced:
+                    _advance_watermark(draw, {}, repo)
+                    results["watermarks_advanced"] += 1
 
         return results
 
@@ -0,0 +1,102 @@
+"""
+Compiled ticket cache.
+Turns a ticket's loosely typed `details` into the checkers' compact form once
+(TOTO entry masks, 4D uint16 numbers + stakes) and caches it by ticket id + content hash,
+so re-checks and multi-draw checks skip parsing and normalization.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from app.services.toto_checker import compile_toto_ticket
+from app.services.fourd_checker import compile_4d_ticket
+
+_COMPILERS = {
+    "toto": compile_toto_ticket,
+    "4d": compile_4d_ticket,
+}
+
+
+class CompiledTicket:
+    """A ticket's compiled parts: tuple of CompiledTotoEntry (TOTO) or CompiledFourDBet (4D)."""
+
+    __slots__ = ("ticket_id", "content_hash", "game", "parts")
+
+    def __init__(self, ticket_id: Any, content_hash: str, game: str, parts: Tuple[Any, ...]):
+        self.ticket_id = ticket_id
+        self.content_hash = content_hash
+        self.game = game
+        self.parts = parts
+
+
+def ticket_content_hash(ticket_details: Dict[str, Any]) -> str:
+    """Stable hash of a ticket's details, so an edited ticket is recompiled."""
+    payload = json.dumps(ticket_details, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class TicketCompileCache:
+    """
+    LRU cache of CompiledTicket keyed by (game, ticket_id, content_hash).
+    Compilation errors are raised to the caller and never cached.
+    Safe to share between the pipeline's evaluator threads: the LRU bookkeeping
+    runs under a lock, compilation itself runs outside it.
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple[str, Any, str], CompiledTicket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, game: str, ticket_id: Any, ticket_details: Dict[str, Any]) -> CompiledTicket:
+        game = str(game or "").lower()
+        compiler = _COMPILERS.get(game)
+        if compiler is None:
+            raise ValueError(f"Unsupported game type: {game}")
+
+        ticket_details = ticket_details or {}
+        content_hash = ticket_content_hash(ticket_details)
+        key = (game, ticket_id, content_hash)
+
+        with self._lock:
+            compiled = self._items.get(key)
+            if compiled is not None:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return compiled
+            self.misses += 1
+
+        compiled = CompiledTicket(ticket_id, content_hash, game, compiler(ticket_details))
+        with self._lock:
+            self._items[key] = compiled
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return compiled
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Process-wide cache shared by the batch checkers
+ticket_cache = TicketCompileCache()
+
+
+def compile_ticket(
+    game: str,
+    ticket_id: Any,
+    ticket_details: Dict[str, Any],
+    cache: Optional[TicketCompileCache] = None
+) -> CompiledTicket:
+    """Compile a ticket through the (default) cache."""
+    return (cache or ticket_cache).get(game, ticket_id, ticket_details)
@@ -0,0 +1,231 @@
+"""
+Pipelined ticket checking.
+Overlaps the network and CPU stages of a draw check with asyncio: fetchers page tickets through
+the async Supabase client, evaluators score pages in an executor, and a writer flushes
+ticket_checks batches. Stages are joined by bounded queues, so a slow stage applies
+backpressure upstream instead of buffering the whole draw.
+
+The stages talk to the AsyncClient through the query builders of supabase_repository, not
+through a Repository, and keep only part of the sequential checker's bookkeeping:
+- kept: result_hash skipping (writes_skipped) and dead-lettering of failed tickets
+- skipped: checkpoints, since concurrent fetchers write out of id order and there is no
+  single cursor to resume from (a crashed run starts the draw over; it is idempotent),
+  and fused notifications
+- left to the caller, as for the sequential checker: the draw's watermark
+  (draw_check_status), which check_all_unprocessed_draws advances after a pipelined unit
+  like after any other
+"""
+
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from supabase import AsyncClient, create_async_client
+
+from app.repositories.supabase_repository import (
+    IN_LOOKUP_CHUNK,
+    existing_hashes_query,
+    record_dead_letters_query,
+    ticket_page_query,
+    unchecked_page_query,
+)
+from app.services.dbconfig import url, key
+from app.services.fourd_checker import prepare_4d_draw
+from app.services.toto_checker import prepare_toto_draw
+from app.services.ticket_checker import (
+    DEFAULT_PAGE_SIZE,
+    evaluate_ticket_page,
+    result_counter,
+    shard_bounds,
+    split_unchanged,
+)
+from app.services.write_buffer import DEFAULT_CHUNK_SIZE, AsyncUpsertBuffer
+
+_PREPARE_DRAW = {"toto": prepare_toto_draw, "4d": prepare_4d_draw}
+
+# Marks the end of a queue's stream
+_DONE = object()
+
+
+async def _fetch_pages(
+    client: AsyncClient,
+    draw: Dict[str, Any],
+    shard: Optional[Tuple[int, int]],
+    page_size: int,
+    unchecked_only: bool,
+    pages: asyncio.Queue
+) -> None:
+    """Page one ticket-id shard of the draw (keyset by id) into the pages queue."""
+    bounds = shard_bounds(shard)
+    game_type = "TOTO" if draw["game"] == "toto" else "4D"
+    last_id = None
+    while True:
+        if unchecked_only:
+            query = unchecked_page_query(client, draw["uid"], last_id, page_size, bounds)
+        else:
+            query = ticket_page_query(client, game_type, draw["draw_date"], last_id, page_size, bounds)
+        page = (await query.execute()).data or []
+        if not page:
+            return
+        await pages.put(page)
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+async def _drop_unchanged(
+    client: AsyncClient,
+    draw_id: str,
+    page_rows: List[Dict[str, Any]],
+    results: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Return only rows whose result_hash differs from the stored check; unchanged ones count as checked."""
+    existing = {}
+    for start in range(0, len(page_rows), IN_LOOKUP_CHUNK):
+        ids = [row["ticket_id"] for row in page_rows[start:start + IN_LOOKUP_CHUNK]]
+        for stored in (await existing_hashes_query(client, draw_id, ids).execute()).data or []:
+            existing[stored["ticket_id"]] = stored.get("result_hash")
+
+    changed, unchanged = split_unchanged(page_rows, existing)
+    results["writes_skipped"] += len(unchanged)
+    result_counter(results)(unchanged)
+    return changed
+
+
+async def _evaluate_pages(
+    client: AsyncClient,
+    draw: Dict[str, Any],
+    ctx: Any,
+    executor: Executor,
+    skip_unchanged: bool,
+    pages: asyncio.Queue,
+    rows: asyncio.Queue,
+    results: Dict[str, Any]
+) -> None:
+    """Evaluate pages in the executor until the fetchers are done."""
+    loop = asyncio.get_running_loop()
+    while True:
+        page = await pages.get()
+        if page is _DONE:
+            return
+        page_rows, page_errors = await loop.run_in_executor(
+            executor, evaluate_ticket_page, draw["game"], draw["uid"], ctx, page
+        )
+        results["errors"].extend(page_errors)
+        if skip_unchanged:
+            page_rows = await _drop_unchanged(client, draw["uid"], page_rows, results)
+        await rows.put(page_rows)
+
+
+async def _write_rows(buffer: AsyncUpsertBuffer, rows: asyncio.Queue) -> None:
+    """Feed evaluated rows into the upsert buffer and flush the tail once evaluation ends."""
+    while True:
+        batch = await rows.get()
+        if batch is _DONE:
+            await buffer.flush()
+            return
+        for row in batch:
+            await buffer.add(row)
+
+
+async def check_draw_pipelined(
+    draw_id: str,
+    client: Optional[AsyncClient] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    fetchers: int = 2,
+    evaluators: int = 2,
+    queue_size: int = 4,
+    unchecked_only: bool = False,
+    shard: Optional[Tuple[int, int]] = None,
+    executor: Optional[Executor] = None
+) -> Dict[str, Any]:
+    """
+    Check a draw's tickets (TOTO or 4D) with overlapping fetch -> evaluate -> write stages.
+
+    - `fetchers` concurrent fetchers each page one sub-shard of the draw's ticket ids
+      (of `shard`, if given) through the async client
+    - `evaluators` tasks score pages in `executor` (a thread pool by default; pass a
+      ProcessPoolExecutor to evaluate on several cores)
+    - one writer upserts ticket_checks in chunks of `chunk_size`, splitting failed chunks;
+      rows whose result_hash is unchanged are skipped (writes_skipped)
+    Failed tickets are dead-lettered once the draw is done; nothing is checkpointed or
+    notified, and the watermark is left to the caller (see the module docstring).
+    Queues hold at most `queue_size` pages / row batches. Returns the same summary as
+    check_tickets_for_draw / check_4d_tickets_for_draw.
+    """
+    own_executor = executor is None
+    if client is None:
+        client = await create_async_client(url, key)
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=evaluators)
+
+    try:
+        draw_response = await client.table("draw_results").select("*").eq("uid", draw_id).limit(1).execute()
+        if not draw_response.data:
+            raise HTTPException(status_code=404, detail=f"Draw not found: {draw_id}")
+
+        draw = dict(draw_response.data[0])
+        game = draw.get("game")
+        draw["game"] = str(game or "").lower()
+        if draw["game"] not in _PREPARE_DRAW:
+            raise HTTPException(status_code=400, detail=f"Unsupported game type: {game}")
+
+        ctx = _PREPARE_DRAW[draw["game"]](draw.get("result", {}) or {})
+        results = {"tickets_checked": 0, "wins": 0, "losses": 0, "writes_skipped": 0, "errors": []}
+        buffer = AsyncUpsertBuffer(
+            client, "ticket_checks", on_conflict="ticket_id,draw_id",
+            chunk_size=chunk_size, on_written=result_counter(results),
+        )
+        pages: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        rows: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        index, count = shard or (0, 1)
+        fetch_shards = [(index * fetchers + j, count * fetchers) for j in range(fetchers)]
+
+        async def fetch_stage():
+            await asyncio.gather(*(
+                _fetch_pages(client, draw, s if s[1] > 1 else None, page_size, unchecked_only, pages)
+                for s in fetch_shards
+            ))
+            for _ in range(evaluators):
+                await pages.put(_DONE)
+
+        async def evaluate_stage():
+            await asyncio.gather(*(
+                _evaluate_pages(client, draw, ctx, executor, not unchecked_only, pages, rows, results)
+                for _ in range(evaluators)
+            ))
+            await rows.put(_DONE)
+
+        stages = [asyncio.ensure_future(stage) for stage in (fetch_stage(), evaluate_stage(), _write_rows(buffer, rows))]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for stage in stages:
+                stage.cancel()
+            raise
+
+        results["errors"].extend(buffer.errors)
+        dead_letters = record_dead_letters_query(client, draw_id, results["errors"])
+        if dead_letters is not None:
+            await dead_letters.execute()
+
+        summary = {"draw_id": draw_id, "game_type": draw["game"], "draw_date": draw.get("draw_date"), **results}
+        if not results["tickets_checked"] and not results["errors"]:
+            summary["message"] = "No tickets found for this draw"
+        return summary
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Pipelined ticket checking failed: {str(e)}")
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+def run_check_pipelined(draw_id: str, **kwargs: Any) -> Dict[str, Any]:
+    """Synchronous entry point for check_draw_pipelined (scripts, pool workers)."""
+    return asyncio.run(check_draw_pipelined(draw_id, **kwargs))
@@ -0,0 +1,209 @@
+"""
+Batch TOTO evaluation.
+Scores every TOTO entry of a draw (or of several draws, as a tickets x draws matrix)
+in one vectorized NumPy pass instead of one ticket at a time.
+"""
+
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.draw_context import DrawContext
+from app.services.toto_checker import (
+    TOTO_MAX_NUMBER,
+    _PRIZE_GROUP_BY_MATCH,
+    CompiledTotoEntry,
+    _entry_details,
+    _entry_result,
+    _system_counts,
+    _ticket_result,
+    compile_toto_ticket,
+    prepare_toto_draw,
+)
+
+
+# Columns of a counts row: column g holds prize group g, column 0 absorbs non-winning rolls.
+_NUM_COLUMNS = 8
+
+# Prize group indexed by main_matches * 2 + has_additional (0 = no prize).
+_GROUP_LOOKUP = np.array([g or 0 for g in _PRIZE_GROUP_BY_MATCH], dtype=np.intp)
+
+
+def _build_system_table() -> np.ndarray:
+    """counts[size, main_matches, has_additional, group] for Ordinary/System entries."""
+    table = np.zeros((TOTO_MAX_NUMBER + 1, 7, 2, _NUM_COLUMNS), dtype=np.int64)
+    for size in range(6, TOTO_MAX_NUMBER + 1):
+        for main in range(0, 7):
+            for add in (0, 1):
+                if main + add > size:
+                    continue
+                for group, n in _system_counts(size, main, bool(add)):
+                    table[size, main, add, group] = n
+    return table
+
+
+_SYSTEM_TABLE = _build_system_table()
+
+
+def _batch_counts(entry_masks: np.ndarray, roll_masks: np.ndarray, win_masks: np.ndarray, additional_masks: np.ndarray) -> np.ndarray:
+    """
+    Per-entry, per-draw win counts as an (entries x draws x 8) array.
+    Ordinary/System cells come straight from the closed-form table; SystemRoll cells
+    add the rolled numbers that hit a main number, the additional number, or neither.
+    """
+    entry_masks = entry_masks[:, None]
+    win = win_masks[None, :]
+    additional = additional_masks[None, :]
+    num_draws = win_masks.shape[0]
+
+    main = np.bitwise_count(entry_masks & win).astype(np.intp)
+    add = ((entry_masks & additional) != 0).astype(np.intp)
+    size = np.broadcast_to(np.bitwise_count(entry_masks).astype(np.intp), main.shape)
+
+    counts = np.zeros((entry_masks.shape[0], num_draws, _NUM_COLUMNS), dtype=np.int64)
+
+    is_system = roll_masks == 0
+    counts[is_system] = _SYSTEM_TABLE[size[is_system], main[is_system], add[is_system]]
+
+    rows = np.flatnonzero(~is_system)
+    if len(rows):
+        rolls = roll_masks[rows][:, None]
+        roll_main = np.bitwise_count(rolls & win).astype(np.int64)
+        roll_additional = ((rolls & additional) != 0).astype(np.int64)
+        roll_other = np.bitwise_count(rolls).astype(np.int64) - roll_main - roll_additional
+
+        fixed_main, fixed_add = main[rows], add[rows]
+        cells = (rows[:, None], np.arange(num_draws)[None, :])
+        np.add.at(counts, (*cells, _GROUP_LOOKUP[(fixed_main + 1) * 2 + fixed_add]), roll_main)
+        np.add.at(counts, (*cells, _GROUP_LOOKUP[fixed_main * 2 + 1]), roll_additional)
+        np.add.at(counts, (*cells, _GROUP_LOOKUP[fixed_main * 2 + fixed_add]), roll_other)
+
+    counts[..., 0] = 0
+    return counts
+
+
+def evaluate_toto_tickets_batch(
+    tickets_details: List[Dict[str, Any]],
+    draw_payload: Dict[str, Any],
+    include_details: bool = True,
+    ctx: Optional[DrawContext] = None
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Evaluate many TOTO tickets against one draw.
+
+    Returns one item per ticket, in order, with the same structure as
+    evaluate_toto_ticket. A ticket that cannot be parsed yields the exception
+    instead, so callers can record it per ticket. An invalid draw raises.
+    """
+    if ctx is None:
+        ctx = prepare_toto_draw(draw_payload)
+
+    compiled: List[Union[Tuple[CompiledTotoEntry, ...], Exception]] = []
+    for ticket_details in tickets_details:
+        try:
+            compiled.append(compile_toto_ticket(ticket_details or {}))
+        except Exception as e:
+            compiled.append(e)
+
+    return evaluate_compiled_toto_batch(compiled, ctx, include_details)
+
+
+def evaluate_compiled_toto_batch(
+    compiled_tickets: List[Union[Tuple[CompiledTotoEntry, ...], Exception]],
+    ctx: DrawContext,
+    include_details: bool = True
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Batch-evaluate tickets compiled by compile_toto_ticket against a prepared draw.
+    Exception items (tickets that failed to compile) are passed through unchanged.
+    """
+    matrix = evaluate_compiled_toto_matrix(compiled_tickets, [ctx], include_details)
+    return [row if isinstance(row, Exception) else row[0] for row in matrix]
+
+
+def evaluate_toto_ticket_over_draws(
+    ticket_details: Dict[str, Any],
+    draw_payloads: List[Dict[str, Any]],
+    include_details: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate one TOTO ticket against many draws (multi-draw tickets, "what-if" checks).
+    Returns one evaluate_toto_ticket-style result per draw, in order. Invalid tickets or draws raise.
+    """
+    entries = compile_toto_ticket(ticket_details or {})
+    ctxs = [prepare_toto_draw(payload) for payload in draw_payloads]
+    return evaluate_compiled_toto_matrix([entries], ctxs, include_details)[0]
+
+
+def evaluate_compiled_toto_matrix(
+    compiled_tickets: List[Union[Tuple[CompiledTotoEntry, ...], Exception]],
+    ctxs: List[DrawContext],
+    include_details: bool = True
+) -> List[Union[List[Dict[str, Any]], Exception]]:
+    """
+    Evaluate compiled tickets against several prepared draws as one tickets x draws pass.
+    Returns, per ticket, a list of results (one per draw, in ctxs order), or the ticket's
+    compile exception unchanged.
+    """
+    num_draws = len(ctxs)
+    win_masks = np.array([c.win_mask for c in ctxs], dtype=np.uint64)
+    additional_masks = np.array([c.additional_mask for c in ctxs], dtype=np.uint64)
+    prize_amounts = np.array(
+        [[0] + [c.prize_amounts.get(g, 0) for g in range(1, _NUM_COLUMNS)] for c in ctxs],
+        dtype=np.int64,
+    ).reshape(num_draws, _NUM_COLUMNS)
+
+    results: List[Union[List[Dict[str, Any]], Exception, None]] = [None] * len(compiled_tickets)
+
+    # Flatten every entry of every compiled ticket; each ticket owns a contiguous slice.
+    flat: List[CompiledTotoEntry] = []
+    ticket_slices = []
+    for i, entries in enumerate(compiled_tickets):
+        if isinstance(entries, Exception):
+            results[i] = entries
+            continue
+        ticket_slices.append((i, len(flat), len(flat) + len(entries)))
+        flat.extend(entries)
+
+    if not flat:
+        return results
+    if not num_draws:
+        for i, _, _ in ticket_slices:
+            results[i] = []
+        return results
+
+    entry_masks = np.array([e.entry_mask for e in flat], dtype=np.uint64)
+    roll_masks = np.array([e.roll_mask for e in flat], dtype=np.uint64)
+    entry_counts = _batch_counts(entry_masks, roll_masks, win_masks, additional_masks)
+
+    owner = np.empty(len(flat), dtype=np.intp)
+    for slot, (_, start, stop) in enumerate(ticket_slices):
+        owner[start:stop] = slot
+    ticket_counts = np.zeros((len(ticket_slices), num_draws, _NUM_COLUMNS), dtype=np.int64)
+    np.add.at(ticket_counts, owner, entry_counts)
+    ticket_payouts = (ticket_counts * prize_amounts[None, :, :]).sum(axis=2)
+
+    entry_counts = entry_counts.tolist()
+    ticket_counts = ticket_counts.tolist()
+    ticket_payouts = ticket_payouts.tolist()
+
+    for slot, (i, start, stop) in enumerate(ticket_slices):
+        row = []
+        for d, ctx in enumerate(ctxs):
+            per_entry_results = []
+            for k in range(start, stop):
+                entry = flat[k]
+                counts_by_group = {g: n for g, n in enumerate(entry_counts[k][d]) if n}
+                winning_details = []
+                if include_details and counts_by_group:
+                    winning_details = _entry_details(entry.entry_mask, entry.roll_mask, ctx.win_mask, ctx.additional_mask)
+                per_entry_results.append(_entry_result(entry, counts_by_group, winning_details))
+
+            payout = {
+                "total_payout": ticket_payouts[slot][d],
+                "counts_by_group": {g: n for g, n in enumerate(ticket_counts[slot][d]) if n},
+            }
+            row.append(_ticket_result(per_entry_results, payout))
+        results[i] = row
+
+    return results
@@ -4,15 +4,68 @@ Evaluates TOTO tickets against official draw results.
 """
 
 from itertools import combinations
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from math import comb
+from typing import List, Dict, Any, Optional, Tuple
 from collections import Counter
 import re
 
+from app.services.draw_context import DrawContext
+
+
+# -------------------------
+# Bitmask encoding
+# -------------------------
+
+# TOTO number n (1..49) is stored at bit (n - 1), so any entry or draw fits in 49 bits.
+TOTO_MIN_NUMBER = 1
+TOTO_MAX_NUMBER = 49
+
+# Prize group indexed by main_matches * 2 + has_additional (None = no prize).
+_PRIZE_GROUP_BY_MATCH = (
+    None, None,  # 0 main
+    None, None,  # 1 main
+    None, None,  # 2 main
+    7, 6,        # 3 main (+ additional)
+    5, 4,        # 4 main (+ additional)
+    3, 2,        # 5 main (+ additional)
+    1, 1,        # 6 main (additional cannot be present)
+)
+
+
+# Mask covering numbers lo..hi (inclusive), indexed by (lo, hi).
+_RANGE_MASKS = {
+    (lo, hi): ((1 << hi) - 1) ^ ((1 << (lo - 1)) - 1)
+    for lo in range(TOTO_MIN_NUMBER, TOTO_MAX_NUMBER + 1)
+    for hi in range(lo, TOTO_MAX_NUMBER + 1)
+}
+
+
+def _to_mask(numbers) -> int:
+    """Encode TOTO numbers as a 49-bit integer mask."""
+    mask = 0
+    for n in numbers:
+        n = int(n)
+        if not TOTO_MIN_NUMBER <= n <= TOTO_MAX_NUMBER:
+            raise ValueError(f"Invalid TOTO number: {n} (must be 1-49)")
+        mask |= 1 << (n - 1)
+    return mask
+
 
 # -------------------------
 # Helpers
 # -------------------------
 
+def _mask_to_numbers(mask: int) -> List[int]:
+    """Decode a mask back into ascending TOTO numbers."""
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length())
+        mask ^= low
+    return out
+
+
 def _to_int_list(xs) -> List[int]:
     """Defensively coerce list elements to int."""
     if not xs:
@@ -36,19 +89,28 @@ def _parse_money(value: Any) -> int:
     return int(re.sub(r"[^\d]", "", s))
 
 
-def compute_total_payout(winning_details: List[Dict[str, Any]], prize_groups: Dict[str, Any]) -> Dict[str, Any]:
-    """Sum payout per winning combination, based on draw_payload['prize_groups']['groupX']."""
-    counts = Counter(d["prize_group"] for d in winning_details)
+def _parse_prize_amounts(prize_groups: Dict[str, Any]) -> Dict[int, int]:
+    """Parse draw_payload['prize_groups'] once into {group: amount} for groups 1..7."""
+    prize_groups = prize_groups or {}
+    return {g: _parse_money(prize_groups.get(f"group{g}")) for g in range(1, 8)}
+
+
+def _payout_from_amounts(counts_by_group: Dict[int, int], prize_amounts: Dict[int, int]) -> Dict[str, Any]:
+    """Sum payout from per-group win counts and pre-parsed prize amounts."""
     total = 0
-    for d in winning_details:
-        key = f"group{d['prize_group']}"
-        total += _parse_money(prize_groups.get(key))
+    for group, count in counts_by_group.items():
+        total += count * prize_amounts.get(group, 0)
     return {
         "total_payout": total,
-        "counts_by_group": dict(counts),
+        "counts_by_group": dict(sorted(counts_by_group.items())),
     }
 
 
+def compute_payout_from_counts(counts_by_group: Dict[int, int], prize_groups: Dict[str, Any]) -> Dict[str, Any]:
+    """Sum payout from per-group win counts, based on draw_payload['prize_groups']['groupX']."""
+    return _payout_from_amounts(counts_by_group, _parse_prize_amounts(prize_groups))
+
+
 def extract_toto_entries(ticket_details: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     Supports both:
@@ -86,34 +148,17 @@ def generate_combinations(numbers: List[int]) -> List[List[int]]:
     return [list(combo) for combo in combinations(nums, 6)]
 
 
-def evaluate_toto_combination(
+def _evaluate_combination_mask(
     combination: List[int],
-    winning_numbers: List[int],
-    additional_number: int
+    combo_mask: int,
+    win_mask: int,
+    additional_mask: int
 ) -> Optional[Dict[str, Any]]:
-    """Evaluate a single 6-number combination against draw results."""
-    combo_set = set(combination)
-    win_set = set(winning_numbers)
-
-    main_matches = len(combo_set & win_set)
-    has_additional = additional_number in combo_set
-
-    prize_group = None
-    if main_matches == 6:
-        prize_group = 1
-    elif main_matches == 5 and has_additional:
-        prize_group = 2
-    elif main_matches == 5:
-        prize_group = 3
-    elif main_matches == 4 and has_additional:
-        prize_group = 4
-    elif main_matches == 4:
-        prize_group = 5
-    elif main_matches == 3 and has_additional:
-        prize_group = 6
-    elif main_matches == 3:
-        prize_group = 7
+    """Evaluate a combination that has already been encoded as a bitmask."""
+    main_matches = (combo_mask & win_mask).bit_count()
+    has_additional = bool(combo_mask & additional_mask)
 
+    prize_group = _PRIZE_GROUP_BY_MATCH[main_matches * 2 + has_additional]
     if prize_group is None:
         return None
 
@@ -125,11 +170,46 @@ def evaluate_toto_combination(
     }
 
 
-def evaluate_toto_entry(entry: Dict[str, Any], draw_payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Evaluate ONE TOTO entry (A/B/...) against the draw."""
-    bet_type = entry.get("bet_type")
-    label = entry.get("label")
+def evaluate_toto_combination(
+    combination: List[int],
+    winning_numbers: List[int],
+    additional_number: int
+) -> Optional[Dict[str, Any]]:
+    """Evaluate a single 6-number combination against draw results."""
+    return _evaluate_combination_mask(
+        combination,
+        _to_mask(combination),
+        _to_mask(winning_numbers),
+        _to_mask([additional_number]),
+    )
+
+
+@lru_cache(maxsize=None)
+def _system_counts(size: int, main_matches: int, has_additional: bool) -> Tuple[Tuple[int, int], ...]:
+    """
+    Closed-form win counts for an entry of `size` numbers (6 = Ordinary, 7..12 = System).
 
+    Each 6-number combination takes k of the `main_matches` winning numbers,
+    optionally the additional number, and fills the rest from the non-matching
+    numbers, so the count per prize group is a product of binomials.
+    Returns ((prize_group, count), ...) sorted by prize group.
+    """
+    others = size - main_matches - int(has_additional)
+    counts: Dict[int, int] = {}
+    for k in range(3, min(main_matches, 6) + 1):
+        for add in ((False, True) if has_additional else (False,)):
+            slots = 6 - k - int(add)
+            if slots < 0:
+                continue
+            n = comb(main_matches, k) * comb(others, slots)
+            if n:
+                group = _PRIZE_GROUP_BY_MATCH[k * 2 + add]
+                counts[group] = counts.get(group, 0) + n
+    return tuple(sorted(counts.items()))
+
+
+def _parse_draw(draw_payload: Dict[str, Any]) -> Tuple[int, int]:
+    """Returns (win_mask, additional_mask) for a TOTO draw payload."""
     winning_numbers = _to_int_list(draw_payload.get("winning_numbers", []))
     additional_number = draw_payload.get("additional_number")
 
@@ -138,55 +218,210 @@ def evaluate_toto_entry(entry: Dict[str, Any], draw_payload: Dict[str, Any]) ->
     if additional_number is None:
         raise ValueError("Invalid draw: missing additional number")
 
+    return _to_mask(winning_numbers), _to_mask([additional_number])
+
+
+def prepare_toto_draw(draw_payload: Dict[str, Any]) -> DrawContext:
+    """Validate a TOTO draw once and keep its masks and parsed prize amounts for reuse across tickets."""
+    win_mask, additional_mask = _parse_draw(draw_payload)
+    return DrawContext(
+        "toto",
+        draw_payload,
+        win_mask=win_mask,
+        additional_mask=additional_mask,
+        prize_amounts=_parse_prize_amounts(draw_payload.get("prize_groups", {})),
+    )
+
+
+def _parse_system_roll(entry: Dict[str, Any]) -> Tuple[List[int], int, int]:
+    """
+    Returns (fixed_numbers, fixed_mask, roll_mask) for a SystemRoll entry.
+    The roll covers roll_from..roll_to inclusive, minus the fixed numbers.
+    """
+    system_roll = entry.get("system_roll") or {}
+    fixed_numbers = _to_int_list(system_roll.get("fixed_numbers", []))
+    if len(set(fixed_numbers)) != 5 or len(fixed_numbers) != 5:
+        raise ValueError("Invalid TOTO SystemRoll: must have exactly 5 unique fixed numbers")
+
+    try:
+        roll_from = int(system_roll.get("roll_from"))
+        roll_to = int(system_roll.get("roll_to"))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid TOTO SystemRoll: roll_from and roll_to are required")
+
+    roll_mask = _RANGE_MASKS.get((roll_from, roll_to))
+    if roll_mask is None:
+        raise ValueError(f"Invalid TOTO SystemRoll range: {roll_from}-{roll_to}")
+
+    fixed_mask = _to_mask(fixed_numbers)
+    roll_mask &= ~fixed_mask
+    if not roll_mask:
+        raise ValueError("Invalid TOTO SystemRoll: roll range only covers fixed numbers")
+
+    return fixed_numbers, fixed_mask, roll_mask
+
+
+def _parse_entry(entry: Dict[str, Any]) -> Tuple[List[int], int, int]:
+    """
+    Returns (numbers, entry_mask, roll_mask) for one TOTO entry.
+    - Ordinary/System: entry_mask holds every number, roll_mask = 0
+    - SystemRoll: entry_mask holds the 5 fixed numbers, roll_mask the rolling numbers
+    """
+    if entry.get("bet_type") == "SystemRoll":
+        return _parse_system_roll(entry)
+
     numbers = _to_int_list(entry.get("numbers", []))
+    if len(set(numbers)) < 6:
+        raise ValueError("Invalid TOTO entry: must have at least 6 unique numbers")
+    return numbers, _to_mask(numbers), 0
+
+
+class CompiledTotoEntry:
+    """One TOTO entry reduced to masks by compile_toto_entry, so it can be re-evaluated without re-parsing."""
+
+    __slots__ = ("label", "bet_type", "numbers", "entry_mask", "roll_mask")
+
+    def __init__(self, label: Optional[str], bet_type: Optional[str], numbers: Tuple[int, ...], entry_mask: int, roll_mask: int):
+        self.label = label
+        self.bet_type = bet_type
+        self.numbers = numbers
+        self.entry_mask = entry_mask
+        self.roll_mask = roll_mask
+
+
+def compile_toto_entry(entry: Dict[str, Any]) -> CompiledTotoEntry:
+    """Parse and validate one entry dict into its compact form."""
+    numbers, entry_mask, roll_mask = _parse_entry(entry)
+    return CompiledTotoEntry(entry.get("label"), entry.get("bet_type"), tuple(numbers), entry_mask, roll_mask)
 
-    if bet_type == "SystemRoll":
-        raise ValueError("SystemRoll checking not implemented yet")
 
-    combos = generate_combinations(numbers)
+def compile_toto_ticket(ticket_details: Dict[str, Any]) -> Tuple[CompiledTotoEntry, ...]:
+    """Compile every entry of a ticket's details."""
+    entries = extract_toto_entries(ticket_details)
+    if not entries:
+        raise ValueError("No TOTO entries found in ticket details")
+    return tuple(compile_toto_entry(entry) for entry in entries)
 
+
+def _system_roll_counts(fixed_mask: int, roll_mask: int, win_mask: int, additional_mask: int) -> Dict[int, int]:
+    """
+    Win counts for 5 fixed numbers + one rolling number, without building each combination.
+    A roll number either adds a main match, is the additional number, or adds nothing.
+    """
+    fixed_main = (fixed_mask & win_mask).bit_count()
+    fixed_additional = bool(fixed_mask & additional_mask)
+
+    roll_main = (roll_mask & win_mask).bit_count()
+    roll_additional = int(bool(roll_mask & additional_mask))
+    roll_other = roll_mask.bit_count() - roll_main - roll_additional
+
+    counts: Dict[int, int] = {}
+    for main_matches, has_additional, n in (
+        (fixed_main + 1, fixed_additional, roll_main),
+        (fixed_main, True, roll_additional),
+        (fixed_main, fixed_additional, roll_other),
+    ):
+        group = _PRIZE_GROUP_BY_MATCH[main_matches * 2 + has_additional]
+        if n and group is not None:
+            counts[group] = counts.get(group, 0) + n
+    return dict(sorted(counts.items()))
+
+
+def _entry_counts(entry_mask: int, roll_mask: int, win_mask: int, additional_mask: int) -> Dict[int, int]:
+    """Per-prize-group win counts for a parsed entry."""
+    if roll_mask:
+        return _system_roll_counts(entry_mask, roll_mask, win_mask, additional_mask)
+    return dict(_system_counts(
+        entry_mask.bit_count(),
+        (entry_mask & win_mask).bit_count(),
+        bool(entry_mask & additional_mask),
+    ))
+
+
+def _entry_details(entry_mask: int, roll_mask: int, win_mask: int, additional_mask: int) -> List[Dict[str, Any]]:
+    """Enumerate the winning 6-number combinations of a parsed entry (only needed for `details`)."""
     winning_details = []
-    for combo in combos:
-        r = evaluate_toto_combination(combo, winning_numbers, int(additional_number))
+    if roll_mask:
+        fixed_numbers = _mask_to_numbers(entry_mask)
+        for n in _mask_to_numbers(roll_mask):
+            r = _evaluate_combination_mask(fixed_numbers + [n], entry_mask | (1 << (n - 1)), win_mask, additional_mask)
+            if r:
+                winning_details.append(r)
+        return winning_details
+
+    for combo in generate_combinations(_mask_to_numbers(entry_mask)):
+        r = _evaluate_combination_mask(combo, _to_mask(combo), win_mask, additional_mask)
         if r:
             winning_details.append(r)
+    return winning_details
+
 
-    if not winning_details:
+def _entry_result(
+    entry: CompiledTotoEntry,
+    counts_by_group: Dict[int, int],
+    winning_details: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Shape the per-entry result returned by evaluate_toto_entry."""
+    if not counts_by_group:
         return {
-            "label": label,
-            "bet_type": bet_type,
-            "numbers": numbers,
+            "label": entry.label,
+            "bet_type": entry.bet_type,
+            "numbers": list(entry.numbers),
             "is_win": False,
             "highest_prize_group": None,
+            "counts_by_group": {},
             "details": []
         }
 
-    highest_prize_group = min(d["prize_group"] for d in winning_details)
     return {
-        "label": label,
-        "bet_type": bet_type,
-        "numbers": numbers,
+        "label": entry.label,
+        "bet_type": entry.bet_type,
+        "numbers": list(entry.numbers),
         "is_win": True,
-        "highest_prize_group": highest_prize_group,
+        "highest_prize_group": min(counts_by_group),
+        "counts_by_group": counts_by_group,
         "details": winning_details
     }
 
 
-def evaluate_toto_ticket(ticket_details: Dict[str, Any], draw_payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Evaluate a ticket that may contain multiple TOTO entries."""
-    entries = extract_toto_entries(ticket_details)
-    if not entries:
-        raise ValueError("No TOTO entries found in ticket details")
-
-    per_entry_results = []
-    all_winning_details = []
+def evaluate_toto_entry(
+    entry: Dict[str, Any],
+    draw_payload: Dict[str, Any],
+    include_details: bool = True,
+    ctx: Optional[DrawContext] = None
+) -> Dict[str, Any]:
+    """
+    Evaluate ONE TOTO entry (A/B/...) against the draw.
+    Win counts are computed in closed form; the per-combination `details`
+    list is only enumerated for winning entries when include_details=True.
+    SystemRoll entries report their 5 fixed numbers as `numbers`.
+    Pass a prepared `ctx` to skip re-validating the draw.
+    """
+    if ctx is None:
+        win_mask, additional_mask = _parse_draw(draw_payload)
+    else:
+        win_mask, additional_mask = ctx.win_mask, ctx.additional_mask
+    return _evaluate_compiled_entry(compile_toto_entry(entry), win_mask, additional_mask, include_details)
+
+
+def _evaluate_compiled_entry(
+    entry: CompiledTotoEntry,
+    win_mask: int,
+    additional_mask: int,
+    include_details: bool
+) -> Dict[str, Any]:
+    """Evaluate a compiled entry against pre-parsed draw masks."""
+    counts_by_group = _entry_counts(entry.entry_mask, entry.roll_mask, win_mask, additional_mask)
+    winning_details = []
+    if include_details and counts_by_group:
+        winning_details = _entry_details(entry.entry_mask, entry.roll_mask, win_mask, additional_mask)
+    return _entry_result(entry, counts_by_group, winning_details)
 
-    for entry in entries:
-        res = evaluate_toto_entry(entry, draw_payload)
-        per_entry_results.append(res)
-        all_winning_details.extend(res["details"])
 
-    if not all_winning_details:
+def _ticket_result(per_entry_results: List[Dict[str, Any]], payout: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape the ticket-level result returned by evaluate_toto_ticket."""
+    counts_by_group = payout["counts_by_group"]
+    if not counts_by_group:
         return {
             "is_win": False,
             "highest_prize_group": None,
@@ -195,13 +430,50 @@ def evaluate_toto_ticket(ticket_details: Dict[str, Any], draw_payload: Dict[str,
             "payout": {"total_payout": 0, "counts_by_group": {}},
         }
 
-    highest_prize_group = min(d["prize_group"] for d in all_winning_details)
-    payout = compute_total_payout(all_winning_details, draw_payload.get("prize_groups", {}))
+    all_winning_details = []
+    for res in per_entry_results:
+        all_winning_details.extend(res["details"])
 
     return {
         "is_win": True,
-        "highest_prize_group": highest_prize_group,
+        "highest_prize_group": min(counts_by_group),
         "entries": per_entry_results,
         "winning_details": all_winning_details,
         "payout": payout,
     }
+
+
+def evaluate_toto_ticket(
+    ticket_details: Dict[str, Any],
+    draw_payload: Dict[str, Any],
+    include_details: bool = True,
+    ctx: Optional[DrawContext] = None
+) -> Dict[str, Any]:
+    """
+    Evaluate a ticket that may contain multiple TOTO entries.
+    Payout is computed from per-entry counts, so with include_details=False
+    the cost scales with the number of entries rather than nC6.
+    Pass a `ctx` from prepare_toto_draw to share draw preparation across tickets.
+    """
+    entries = compile_toto_ticket(ticket_details)
+    if ctx is None:
+        ctx = prepare_toto_draw(draw_payload)
+    return evaluate_compiled_toto_ticket(entries, ctx, include_details)
+
+
+def evaluate_compiled_toto_ticket(
+    entries: Tuple[CompiledTotoEntry, ...],
+    ctx: DrawContext,
+    include_details: bool = True
+) -> Dict[str, Any]:
+    """Evaluate a ticket compiled by compile_toto_ticket against a prepared draw."""
+    per_entry_results = []
+    counts_by_group = Counter()
+
+    for entry in entries:
+        res = _evaluate_compiled_entry(entry, ctx.win_mask, ctx.additional_mask, include_details)
+        per_entry_results.append(res)
+        counts_by_group.update(res["counts_by_group"])
+
+    payout = _payout_from_amounts(counts_by_group, ctx.prize_amounts)
+    return _ticket_result(per_entry_results, payout)
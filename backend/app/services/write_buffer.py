@@ -0,0 +1,199 @@
+"""
+Buffered bulk writes to Supabase.
+Collects rows and flushes them as multi-row upserts (or inserts) in chunks, instead of one
+round trip per row. A chunk rejected for its data is split in half, so one bad row only costs
+itself; a chunk that fails for any other reason (network, timeout, 5xx, auth) is retried with
+backoff and then raises. Every chunk write is timed, to tune chunk sizes against API limits.
+"""
+
+import asyncio
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_RETRIES = 2
+
+# SQLSTATE classes caused by the rows themselves: 22 data exception, 23 integrity constraint violation
+_ROW_ERROR_SQLSTATE_CLASSES = ("22", "23")
+
+
+def is_row_error(error: Exception) -> bool:
+    """
+    Whether a failed write was caused by the rows it carried (bad data, constraint violation),
+    so splitting the chunk can isolate them. Transport, timeout, server and auth errors are not.
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, str) and code[:2] in _ROW_ERROR_SQLSTATE_CLASSES:
+        return True
+    return isinstance(error, (ValueError, TypeError, KeyError, sqlite3.IntegrityError, sqlite3.DataError))
+
+
+def summarize_latency(chunk_stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summary of chunk write latencies (ms): count, rows, mean/p50/p95/max of successful chunks, failures."""
+    ok = sorted(s["ms"] for s in chunk_stats if s["ok"])
+    summary = {
+        "chunks": len(ok),
+        "rows": sum(s["rows"] for s in chunk_stats if s["ok"]),
+        "failed_writes": sum(1 for s in chunk_stats if not s["ok"]),
+    }
+    if ok:
+        summary.update({
+            "mean_ms": round(sum(ok) / len(ok), 2),
+            "p50_ms": ok[len(ok) // 2],
+            "p95_ms": ok[min(len(ok) - 1, int(len(ok) * 0.95))],
+            "max_ms": ok[-1],
+        })
+    return summary
+
+
+class UpsertBuffer:
+    """
+    Write buffer for one table.
+
+    Rows are flushed automatically every `chunk_size` rows; call flush() once at the end.
+    - written: number of rows persisted
+    - errors:  one {error_key: ..., "error": ..., "error_type": ...} per row that could not be written
+    - chunk_stats: one {"rows", "ms", "attempts", "ok"} per chunk written (see latency_stats())
+    - on_written(rows) is called with every chunk that was persisted
+    - write(rows), if given, persists one chunk instead of client.table(table).upsert(...);
+      if it returns a list (the rows actually stored), written and on_written count those
+    - a chunk rejected for its rows (is_row_error) is split until the bad rows are isolated
+    - any other failure is retried `retries` times (delay `retry_delay` s, doubling) and then
+      raised, so an outage aborts the flush instead of turning every row into an error
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        table: str,
+        on_conflict: Optional[str],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        error_key: str = "ticket_id",
+        on_written: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        write: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        retries: int = DEFAULT_RETRIES,
+        retry_delay: float = 0.5,
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+        self.chunk_size = chunk_size
+        self.error_key = error_key
+        self.on_written = on_written
+        self.write = write
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.written = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.chunk_stats: List[Dict[str, Any]] = []
+        self._rows: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        rows, self._rows = self._rows, []
+        for start in range(0, len(rows), self.chunk_size):
+            self._write(rows[start:start + self.chunk_size])
+
+    def _execute(self, rows: List[Dict[str, Any]]) -> Any:
+        if self.write is not None:
+            return self.write(rows)
+        return self.client.table(self.table).upsert(rows, on_conflict=self.on_conflict)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                result = self._execute(rows)
+                if self.write is None:
+                    result = result.execute()
+            except Exception as e:
+                self._timed(rows, started, attempt, ok=False)
+                if not is_row_error(e):
+                    if attempt < self.retries:
+                        time.sleep(self.retry_delay * 2 ** attempt)
+                        continue
+                    raise
+                if len(rows) == 1:
+                    self._failed(rows[0], e)
+                    return
+                # Split and retry each half so the bad row(s) are isolated
+                mid = len(rows) // 2
+                self._write(rows[:mid])
+                self._write(rows[mid:])
+                return
+
+            self._timed(rows, started, attempt, ok=True)
+            self._persisted(result if isinstance(result, list) else rows)
+            return
+
+    def _timed(self, rows: List[Dict[str, Any]], started: float, attempt: int, ok: bool) -> None:
+        ms = (time.perf_counter() - started) * 1000
+        self.chunk_stats.append({"rows": len(rows), "ms": round(ms, 2), "attempts": attempt + 1, "ok": ok})
+
+    def _failed(self, row: Dict[str, Any], error: Exception) -> None:
+        self.errors.append({self.error_key: row.get(self.error_key), "error": str(error), "error_type": type(error).__name__})
+
+    def _persisted(self, rows: List[Dict[str, Any]]) -> None:
+        self.written += len(rows)
+        if self.on_written:
+            self.on_written(rows)
+
+    def latency_stats(self) -> Dict[str, Any]:
+        """summarize_latency() of this buffer's chunk writes."""
+        return summarize_latency(self.chunk_stats)
+
+
+class AsyncUpsertBuffer(UpsertBuffer):
+    """UpsertBuffer for a supabase AsyncClient: add() and flush() are coroutines."""
+
+    async def add(self, row: Dict[str, Any]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        rows, self._rows = self._rows, []
+        for start in range(0, len(rows), self.chunk_size):
+            await self._write(rows[start:start + self.chunk_size])
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                result = self._execute(rows)
+                if self.write is None:
+                    result = await result.execute()
+                elif asyncio.iscoroutine(result):
+                    result = await result
+            except Exception as e:
+                self._timed(rows, started, attempt, ok=False)
+                if not is_row_error(e):
+                    if attempt < self.retries:
+                        await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                        continue
+                    raise
+                if len(rows) == 1:
+                    self._failed(rows[0], e)
+                    return
+                mid = len(rows) // 2
+                await self._write(rows[:mid])
+                await self._write(rows[mid:])
+                return
+
+            self._timed(rows, started, attempt, ok=True)
+            self._persisted(result if isinstance(result, list) else rows)
+            return
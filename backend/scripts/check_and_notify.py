@@ -3,6 +3,7 @@ Standalone script to check tickets and generate notifications.
 Runs after draw results are scraped and stored in Supabase.
 """
 
+import argparse
 import os
 import sys
 from datetime import datetime
@@ -11,54 +12,134 @@ from datetime import datetime
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from app.services.ticket_checker import check_all_unprocessed_draws
-from app.services.notification_generator import generate_notifications_for_all_checks
+from app.services.notification_generator import NOTIFICATION_CHUNK_SIZE, generate_notifications_for_all_checks
 
 
-def main():
+def parse_shard(value):
+    """Parse a --shard value "i/N" into (i, N), with 0 <= i < N."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected i/N (e.g. 0/4)")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected 0 <= i < N")
+    return index, count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check tickets against draw results and notify users.")
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help="Only check ticket-id shard i of N (e.g. 0/4), to split a draw night across jobs; "
+             "run once more without --shard after all shards finish",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("CHECK_WORKERS", "1")),
+        help="Number of worker processes for ticket checking (default: CHECK_WORKERS or 1)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Check each draw with the async fetch/evaluate/write pipeline",
+    )
+    parser.add_argument(
+        "--fused",
+        action="store_true",
+        help="Notify each batch of checks as it is written, from the in-memory results (no read-back pass); "
+             "not with --shard",
+    )
+    parser.add_argument(
+        "--notify-chunk-size",
+        type=int,
+        default=int(os.getenv("NOTIFY_CHUNK_SIZE", str(NOTIFICATION_CHUNK_SIZE))),
+        help=f"Notifications per insert (default: NOTIFY_CHUNK_SIZE or {NOTIFICATION_CHUNK_SIZE})",
+    )
+    args = parser.parse_args(argv)
+    if args.shard and args.fused:
+        parser.error("--fused cannot be used with --shard: sharded runs notify nothing, the final run without --shard does")
+    return args
+
+
+def main(argv=None):
     """
     Main execution flow:
     1. Check all tickets against draw results
     2. Generate notifications for users
+
+    With --shard i/N only one slice of tickets is checked and nothing is notified
+    (so --fused is rejected). Sharded jobs must be followed by one run without --shard
+    (a join step): it checks anything the shards left over, advances the draw watermarks
+    and notifies, once every shard's checks are written.
+
+    With --fused (un-sharded runs only), step 1 already notifies every check it writes;
+    step 2 then only sweeps checks that were left unnotified (e.g. by an earlier failed run).
     """
+    args = parse_args(argv)
     print("\n" + "=" * 60)
     print("TICKETSENSE - TICKET CHECKER & NOTIFIER")
     print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    if args.shard:
+        print(f"Shard: {args.shard[0]}/{args.shard[1]}")
     print("=" * 60)
     
     # Step 1: Check tickets against draw results
     print("\n[STEP 1] Checking tickets against draw results...")
     print("-" * 60)
     
+    # Notify losers by default (set to False to only notify winners)
+    notify_losses = os.getenv('NOTIFY_LOSSES', 'true').lower() == 'true'
+
     try:
-        check_results = check_all_unprocessed_draws()
+        check_results = check_all_unprocessed_draws(
+            workers=args.workers,
+            shard=args.shard,
+            pipeline=args.pipeline,
+            notify=args.fused,
+            notify_losses=notify_losses,
+            notify_chunk_size=args.notify_chunk_size,
+        )
         
         draws_processed = check_results.get('draws_processed', 0)
         tickets_checked = check_results.get('total_tickets_checked', 0)
         total_wins = check_results.get('total_wins', 0)
         total_losses = check_results.get('total_losses', 0)
+        writes_skipped = check_results.get('total_writes_skipped', 0)
+        dead_lettered = check_results.get('total_dead_lettered', 0)
         
         print(f"\n✓ Draws processed: {draws_processed}")
         print(f"✓ Tickets checked: {tickets_checked}")
         print(f"✓ Winners: {total_wins}")
         print(f"✓ Non-winners: {total_losses}")
+        print(f"✓ Unchanged results (writes skipped): {writes_skipped}")
+        if args.fused:
+            print(f"✓ Win notifications created (fused): {check_results.get('total_win_notifications', 0)}")
+            print(f"✓ Loss notifications created (fused): {check_results.get('total_loss_notifications', 0)}")
+        if check_results.get('watermarks_advanced'):
+            print(f"✓ Draw watermarks advanced: {check_results['watermarks_advanced']}")
+        if dead_lettered:
+            print(f"⚠ Failed tickets dead-lettered: {dead_lettered} (retry with scripts/retry_dead_letters.py)")
         
         if draws_processed == 0:
-            print("\nℹ No new draws to process. Exiting.")
-            sys.exit(0)
+            print("\nℹ No new draws to check.")
             
     except Exception as e:
         print(f"\n✗ Error checking tickets: {str(e)}")
         sys.exit(1)
     
+    if args.shard:
+        print("\nℹ Sharded run: notifications and watermarks are handled by the final run without --shard. Exiting.")
+        sys.exit(0)
+
     # Step 2: Generate notifications for users
     print("\n[STEP 2] Generating user notifications...")
     print("-" * 60)
     
     try:
-        # Notify losers by default (set to False to only notify winners)
-        notify_losses = os.getenv('NOTIFY_LOSSES', 'true').lower() == 'true'
-        
-        notify_results = generate_notifications_for_all_checks(notify_losses)
+        notify_results = generate_notifications_for_all_checks(notify_losses, chunk_size=args.notify_chunk_size)
         
         checks_processed = notify_results.get('total_checks_processed', 0)
         win_notifications = notify_results.get('win_notifications', 0)
@@ -70,6 +151,15 @@ def main():
         print(f"✓ Win notifications created: {win_notifications}")
         print(f"✓ Loss notifications created: {loss_notifications}")
         print(f"✓ Already notified (skipped): {skipped}")
+
+        latency = notify_results.get('insert_latency') or {}
+        if latency.get('chunks'):
+            print(
+                f"✓ Insert chunks: {latency['chunks']} x {args.notify_chunk_size} rows, "
+                f"latency mean {latency['mean_ms']}ms / p95 {latency['p95_ms']}ms / max {latency['max_ms']}ms"
+            )
+            if latency['failed_writes']:
+                print(f"⚠ Failed chunk writes (retried or split): {latency['failed_writes']}")
         
         if errors:
             print(f"\n⚠ Errors encountered: {len(errors)}")
@@ -85,6 +175,9 @@ def main():
     print("SUMMARY")
     print("=" * 60)
     print(f"✓ {tickets_checked} tickets checked")
+    if args.fused:
+        win_notifications += check_results.get('total_win_notifications', 0)
+        loss_notifications += check_results.get('total_loss_notifications', 0)
     print(f"✓ {win_notifications} users notified of wins")
     if notify_losses:
         print(f"✓ {loss_notifications} users notified of losses")
@@ -0,0 +1,62 @@
+"""
+Standalone script to re-check dead-lettered tickets.
+Only tickets in check_dead_letters whose backoff has elapsed are retried; each failure
+doubles the ticket's next delay, and tickets stop being retried after --max-attempts.
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Add the backend app to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.ticket_checker import DEAD_LETTER_MAX_ATTEMPTS, retry_dead_letters
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Retry dead-lettered ticket checks.")
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=int(os.getenv("DEAD_LETTER_MAX_ATTEMPTS", str(DEAD_LETTER_MAX_ATTEMPTS))),
+        help="Skip tickets that already failed this many times (default: DEAD_LETTER_MAX_ATTEMPTS or 5)",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=1000,
+        help="Maximum number of dead letters to retry in this run",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("\n" + "=" * 60)
+    print("TICKETSENSE - DEAD-LETTER RETRY")
+    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+
+    try:
+        results = retry_dead_letters(max_attempts=args.max_attempts, limit=args.limit)
+    except Exception as e:
+        print(f"\n✗ Error retrying dead letters: {str(e)}")
+        sys.exit(1)
+
+    print(f"\n✓ Dead letters due: {results['retried']}")
+    print(f"✓ Recovered: {results['recovered']} ({results['wins']} winners)")
+    print(f"✓ Dropped (ticket or draw gone): {results['dropped']}")
+    print(f"✓ Failed again: {results['failed']}")
+
+    for error in results["errors"][:5]:  # Show first 5 errors
+        print(f"  - {error.get('ticket_id')}: {error.get('error_type')}: {error.get('error', 'Unknown error')}")
+
+    print(f"\n✅ Completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60 + "\n")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+-- Draw check watermarks.
+-- check_all_unprocessed_draws asks draws_with_unchecked_tickets() for the draws that have
+-- work to do, instead of counting tickets and checks for every draw in history.
+-- Apply in the Supabase SQL editor (or psql) before running the checker.
+
+create table if not exists draw_check_status (
+    draw_id          uuid primary key references draw_results (uid) on delete cascade,
+    game             text not null,
+    draw_date        date not null,
+    -- every ticket created at or before this time has a ticket_checks row for the draw
+    checked_through  timestamptz not null,
+    tickets_checked  integer not null default 0,
+    updated_at       timestamptz not null default now()
+);
+
+alter table tickets add column if not exists created_at timestamptz not null default now();
+
+create index if not exists tickets_game_date_created_idx on tickets (game_type, draw_date, created_at);
+create index if not exists ticket_checks_ticket_draw_idx on ticket_checks (ticket_id, draw_id);
+
+-- Draws with at least one ticket that is newer than the draw's watermark and has no check row.
+-- as_of is the database time of the query; pass it back as checked_through once the draw is done.
+create or replace function draws_with_unchecked_tickets()
+returns table (uid uuid, game text, draw_date date, unchecked_tickets bigint, as_of timestamptz)
+language sql stable
+as $$
+    select d.uid, d.game, d.draw_date, count(t.id) as unchecked_tickets, now() as as_of
+    from draw_results d
+    left join draw_check_status s on s.draw_id = d.uid
+    join tickets t
+      on t.game_type = upper(d.game)
+     and t.draw_date = d.draw_date
+     and (s.checked_through is null or t.created_at > s.checked_through)
+    where not exists (
+        select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid
+    )
+    group by d.uid, d.game, d.draw_date
+    order by d.draw_date, d.uid;
+$$;
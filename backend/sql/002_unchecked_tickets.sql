@@ -0,0 +1,25 @@
+-- Anti-join of a draw's tickets against ticket_checks.
+-- Lets the checker evaluate only tickets that have no check row yet, a page at a time
+-- (keyset by ticket id), instead of re-evaluating the whole draw.
+
+create or replace function unchecked_tickets_for_draw(
+    p_draw_id uuid,
+    p_after uuid default null,
+    p_limit integer default 1000
+)
+returns table (id uuid, details jsonb)
+language sql stable
+as $$
+    select t.id, t.details
+    from draw_results d
+    join tickets t
+      on t.game_type = upper(d.game)
+     and t.draw_date = d.draw_date
+    where d.uid = p_draw_id
+      and (p_after is null or t.id > p_after)
+      and not exists (
+          select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid
+      )
+    order by t.id
+    limit p_limit;
+$$;
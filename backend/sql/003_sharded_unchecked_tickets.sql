@@ -0,0 +1,31 @@
+-- Ticket-id shards for unchecked_tickets_for_draw().
+-- p_from / p_to bound the ticket ids to [p_from, p_to) so parallel workers or CI jobs
+-- can each check one slice of a draw. Null bounds are open-ended.
+
+drop function if exists unchecked_tickets_for_draw(uuid, uuid, integer);
+
+create or replace function unchecked_tickets_for_draw(
+    p_draw_id uuid,
+    p_after uuid default null,
+    p_limit integer default 1000,
+    p_from uuid default null,
+    p_to uuid default null
+)
+returns table (id uuid, details jsonb)
+language sql stable
+as $$
+    select t.id, t.details
+    from draw_results d
+    join tickets t
+      on t.game_type = upper(d.game)
+     and t.draw_date = d.draw_date
+    where d.uid = p_draw_id
+      and (p_after is null or t.id > p_after)
+      and (p_from is null or t.id >= p_from)
+      and (p_to is null or t.id < p_to)
+      and not exists (
+          select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid
+      )
+    order by t.id
+    limit p_limit;
+$$;
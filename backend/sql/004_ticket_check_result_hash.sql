@@ -0,0 +1,4 @@
+-- Content hash of each check's outcome (is_win, highest_prize_group, details).
+-- Re-runs compare hashes in bulk and only rewrite rows whose outcome changed.
+
+alter table ticket_checks add column if not exists result_hash text;
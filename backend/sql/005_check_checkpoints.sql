@@ -0,0 +1,19 @@
+-- Resumable draw checks.
+-- The checker saves one checkpoint per (draw, ticket-id shard) after every flushed batch of
+-- ticket_checks rows, and a restarted run continues after last_ticket_id instead of starting
+-- the draw over. The row is deleted once the draw (shard) finishes.
+
+create table if not exists check_checkpoints (
+    draw_id          uuid not null references draw_results (uid) on delete cascade,
+    -- "all", or "i/N" for a ticket-id shard
+    shard            text not null,
+    -- every ticket id up to and including this one has been processed
+    last_ticket_id   uuid not null,
+    tickets_checked  integer not null default 0,
+    wins             integer not null default 0,
+    losses           integer not null default 0,
+    writes_skipped   integer not null default 0,
+    errors           jsonb not null default '[]'::jsonb,
+    updated_at       timestamptz not null default now(),
+    primary key (draw_id, shard)
+);
@@ -0,0 +1,93 @@
+-- Dead-lettered ticket checks.
+-- Tickets that fail to evaluate or to write are recorded here with their error class and
+-- attempt count instead of only in the run's summary. Both unchecked-ticket queries skip
+-- them, so a draw with a bad ticket is no longer re-attempted in full on every run;
+-- scripts/retry_dead_letters.py re-checks them with exponential backoff.
+
+create table if not exists check_dead_letters (
+    ticket_id        uuid not null references tickets (id) on delete cascade,
+    draw_id          uuid not null references draw_results (uid) on delete cascade,
+    error_type       text not null,
+    error            text,
+    attempts         integer not null default 1,
+    first_failed_at  timestamptz not null default now(),
+    last_failed_at   timestamptz not null default now(),
+    next_retry_at    timestamptz not null default now(),
+    primary key (ticket_id, draw_id)
+);
+
+create index if not exists check_dead_letters_due_idx on check_dead_letters (next_retry_at);
+
+-- Record failures ([{ticket_id, error_type, error}, ...]) for a draw. A ticket that is
+-- already dead-lettered gets attempts + 1 and its next retry pushed out exponentially.
+create or replace function record_dead_letters(
+    p_draw_id uuid,
+    p_errors jsonb,
+    p_backoff_seconds integer default 900
+)
+returns void
+language sql
+as $$
+    insert into check_dead_letters as x (ticket_id, draw_id, error_type, error, next_retry_at)
+    select distinct on (e->>'ticket_id')
+           (e->>'ticket_id')::uuid, p_draw_id, coalesce(e->>'error_type', 'Exception'), e->>'error',
+           now() + make_interval(secs => p_backoff_seconds)
+    from jsonb_array_elements(p_errors) e
+    where e->>'ticket_id' is not null
+    on conflict (ticket_id, draw_id) do update
+       set error_type = excluded.error_type,
+           error = excluded.error,
+           attempts = x.attempts + 1,
+           last_failed_at = now(),
+           next_retry_at = now() + make_interval(secs => p_backoff_seconds * power(2, x.attempts));
+$$;
+
+create or replace function draws_with_unchecked_tickets()
+returns table (uid uuid, game text, draw_date date, unchecked_tickets bigint, as_of timestamptz)
+language sql stable
+as $$
+    select d.uid, d.game, d.draw_date, count(t.id) as unchecked_tickets, now() as as_of
+    from draw_results d
+    left join draw_check_status s on s.draw_id = d.uid
+    join tickets t
+      on t.game_type = upper(d.game)
+     and t.draw_date = d.draw_date
+     and (s.checked_through is null or t.created_at > s.checked_through)
+    where not exists (
+        select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid
+    )
+      and not exists (
+        select 1 from check_dead_letters x where x.ticket_id = t.id and x.draw_id = d.uid
+    )
+    group by d.uid, d.game, d.draw_date
+    order by d.draw_date, d.uid;
+$$;
+
+create or replace function unchecked_tickets_for_draw(
+    p_draw_id uuid,
+    p_after uuid default null,
+    p_limit integer default 1000,
+    p_from uuid default null,
+    p_to uuid default null
+)
+returns table (id uuid, details jsonb)
+language sql stable
+as $$
+    select t.id, t.details
+    from draw_results d
+    join tickets t
+      on t.game_type = upper(d.game)
+     and t.draw_date = d.draw_date
+    where d.uid = p_draw_id
+      and (p_after is null or t.id > p_after)
+      and (p_from is null or t.id >= p_from)
+      and (p_to is null or t.id < p_to)
+      and not exists (
+          select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid
+      )
+      and not exists (
+          select 1 from check_dead_letters x where x.ticket_id = t.id and x.draw_id = d.uid
+      )
+    order by t.id
+    limit p_limit;
+$$;
@@ -0,0 +1,24 @@
+-- One notification per ticket check, enforced by the database.
+-- The generator used to look up data->>ticket_check_id (no index) before inserting, which
+-- costs a read per batch and races when two runs overlap. notifications now carry the check
+-- id in its own column with a unique index, and the generator inserts with
+-- upsert(on_conflict="ticket_check_id", ignore_duplicates=True): duplicates are dropped by
+-- the insert itself.
+
+alter table notifications
+    add column if not exists ticket_check_id uuid references ticket_checks (id) on delete set null;
+
+-- Backfill from the JSON payload
+update notifications
+set ticket_check_id = (data->>'ticket_check_id')::uuid
+where ticket_check_id is null
+  and data ? 'ticket_check_id';
+
+-- Keep the earliest notification of checks that were notified more than once
+delete from notifications n
+using notifications earlier
+where n.ticket_check_id = earlier.ticket_check_id
+  and (n.created_at, n.id) > (earlier.created_at, earlier.id);
+
+-- Notifications without a check (null) are not constrained
+create unique index if not exists notifications_ticket_check_id_key on notifications (ticket_check_id);
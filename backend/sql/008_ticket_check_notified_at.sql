@@ -0,0 +1,18 @@
+-- Notification cursor on ticket_checks.
+-- generate_notifications_for_all_checks used to read every ticket_checks row on every run.
+-- Checks are now stamped with notified_at once they are consumed (notified, already notified,
+-- a loss with loss notifications off, or out of attempts; see 013 for notify_skipped and
+-- notify_attempts), and the generator pages only through checks where notified_at is null,
+-- so a run costs as much as the checks produced since the last one.
+
+alter table ticket_checks add column if not exists notified_at timestamptz;
+
+-- Checks that already have a notification are consumed
+update ticket_checks c
+set notified_at = n.created_at
+from notifications n
+where n.ticket_check_id = c.id
+  and c.notified_at is null;
+
+-- Keyset pages over unconsumed checks stay on this (small) partial index
+create index if not exists ticket_checks_unnotified_idx on ticket_checks (id) where notified_at is null;
@@ -0,0 +1,35 @@
+-- Fused check-and-notify.
+-- With --fused the checker builds notifications from the ticket rows it already paged
+-- through, so unchecked_tickets_for_draw() now returns each ticket's user_id as well.
+-- The return type changes, so the function is dropped and recreated (same filters as 006).
+
+drop function if exists unchecked_tickets_for_draw(uuid, uuid, integer, uuid, uuid);
+
+create or replace function unchecked_tickets_for_draw(
+    p_draw_id uuid,
+    p_after uuid default null,
+    p_limit integer default 1000,
+    p_from uuid default null,
+    p_to uuid default null
+)
+returns table (id uuid, user_id uuid, details jsonb)
+language sql stable
+as $$
+    select t.id, t.user_id, t.details
+    from draw_results d
+    join tickets t
+      on t.game_type = upper(d.game)
+     and t.draw_date = d.draw_date
+    where d.uid = p_draw_id
+      and (p_after is null or t.id > p_after)
+      and (p_from is null or t.id >= p_from)
+      and (p_to is null or t.id < p_to)
+      and not exists (
+          select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid
+      )
+      and not exists (
+          select 1 from check_dead_letters x where x.ticket_id = t.id and x.draw_id = d.uid
+      )
+    order by t.id
+    limit p_limit;
+$$;
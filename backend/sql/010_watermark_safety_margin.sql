@@ -0,0 +1,28 @@
+-- Watermark safety margin.
+-- as_of used to be now(): a ticket inserted by a transaction that commits after this query
+-- but carries an earlier created_at fell below the new watermark and was never discovered.
+-- as_of now lags now() by 10 minutes, so such tickets stay above the watermark. Recent
+-- tickets that are already checked are filtered out by the anti-join, so the overlap costs
+-- no extra checking. Keep the margin in sync with WATERMARK_MARGIN_SECONDS (repositories/base.py).
+
+create or replace function draws_with_unchecked_tickets()
+returns table (uid uuid, game text, draw_date date, unchecked_tickets bigint, as_of timestamptz)
+language sql stable
+as $$
+    select d.uid, d.game, d.draw_date, count(t.id) as unchecked_tickets,
+           now() - interval '10 minutes' as as_of
+    from draw_results d
+    left join draw_check_status s on s.draw_id = d.uid
+    join tickets t
+      on t.game_type = upper(d.game)
+     and t.draw_date = d.draw_date
+     and (s.checked_through is null or t.created_at > s.checked_through)
+    where not exists (
+        select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid
+    )
+      and not exists (
+        select 1 from check_dead_letters x where x.ticket_id = t.id and x.draw_id = d.uid
+    )
+    group by d.uid, d.game, d.draw_date
+    order by d.draw_date, d.uid;
+$$;
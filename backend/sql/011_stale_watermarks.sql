@@ -0,0 +1,26 @@
+-- Advancing watermarks after sharded runs.
+-- Sharded jobs never advance a draw's watermark (no single job sees the whole draw), and once
+-- every shard is done draws_with_unchecked_tickets() no longer returns the draw, so the
+-- watermark never moved. The final un-sharded run asks this function for draws whose tickets
+-- above the watermark are all checked (or dead-lettered) and advances them to as_of.
+-- as_of keeps the 10 minute margin of migration 010.
+
+create or replace function draws_with_stale_watermark()
+returns table (uid uuid, game text, draw_date date, as_of timestamptz)
+language sql stable
+as $$
+    select d.uid, d.game, d.draw_date, now() - interval '10 minutes' as as_of
+    from draw_results d
+    left join draw_check_status s on s.draw_id = d.uid
+    join tickets t
+      on t.game_type = upper(d.game)
+     and t.draw_date = d.draw_date
+     and (s.checked_through is null or t.created_at > s.checked_through)
+    where t.created_at <= now() - interval '10 minutes'
+    group by d.uid, d.game, d.draw_date
+    having bool_and(
+        exists (select 1 from ticket_checks c where c.ticket_id = t.id and c.draw_id = d.uid)
+        or exists (select 1 from check_dead_letters x where x.ticket_id = t.id and x.draw_id = d.uid)
+    )
+    order by d.draw_date, d.uid;
+$$;
@@ -0,0 +1,8 @@
+-- Checkpoints per check mode.
+-- check_checkpoints.shard is now "<mode>:<shard>", e.g. "full:all" or "unchecked:0/4", so a
+-- full re-check never resumes from an unchecked-only run's checkpoint (or the other way round).
+-- The checker also ignores checkpoints saved before the draw's watermark last advanced
+-- (draw_check_status.updated_at); both tables now get updated_at on every upsert.
+
+-- Checkpoints from before this change have no mode and can't be told apart; drop them
+delete from check_checkpoints where shard not like '%:%';
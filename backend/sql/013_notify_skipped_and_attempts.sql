@@ -0,0 +1,19 @@
+-- Every check the notifier reads is consumed.
+-- Losses left out because loss notifications are off are stamped notified_at like notified
+-- checks, with notify_skipped = true, so the cursor never reads them again (clear notified_at
+-- where notify_skipped to notify them after all). Checks whose notification fails count
+-- notify_attempts and are consumed once they reach the notifier's max attempts, instead of
+-- being re-read by every run.
+
+alter table ticket_checks add column if not exists notify_skipped boolean not null default false;
+alter table ticket_checks add column if not exists notify_attempts integer not null default 0;
+
+create or replace function record_notify_failures(p_check_ids uuid[], p_max_attempts integer)
+returns void
+language sql
+as $$
+    update ticket_checks
+    set notify_attempts = notify_attempts + 1,
+        notified_at = case when notify_attempts + 1 >= p_max_attempts then now() else notified_at end
+    where id = any(p_check_ids);
+$$;
@@ -0,0 +1,33 @@
+-- Only dead-letter retries count attempts.
+-- A check run that fails on an already dead-lettered ticket (e.g. a full re-check) used to
+-- bump its attempts and push its retry out, so the ticket ran out of attempts without being
+-- retried. record_dead_letters now takes p_retry: only retry_dead_letters passes true; other
+-- callers refresh the error and leave attempts and next_retry_at alone.
+
+drop function if exists record_dead_letters(uuid, jsonb, integer);
+
+create or replace function record_dead_letters(
+    p_draw_id uuid,
+    p_errors jsonb,
+    p_backoff_seconds integer default 900,
+    p_retry boolean default false
+)
+returns void
+language sql
+as $$
+    insert into check_dead_letters as x (ticket_id, draw_id, error_type, error, next_retry_at)
+    select distinct on (e->>'ticket_id')
+           (e->>'ticket_id')::uuid, p_draw_id, coalesce(e->>'error_type', 'Exception'), e->>'error',
+           now() + make_interval(secs => p_backoff_seconds)
+    from jsonb_array_elements(p_errors) e
+    where e->>'ticket_id' is not null
+    on conflict (ticket_id, draw_id) do update
+       set error_type = excluded.error_type,
+           error = excluded.error,
+           attempts = x.attempts + case when p_retry then 1 else 0 end,
+           last_failed_at = now(),
+           next_retry_at = case
+               when p_retry then now() + make_interval(secs => p_backoff_seconds * power(2, x.attempts))
+               else x.next_retry_at
+           end;
+$$;
@@ -0,0 +1,171 @@
+import pytest
+
+from app.services import fourd_checker
+from app.services.fourd_checker import (
+    _build_draw_index,
+    evaluate_4d_bet,
+    evaluate_4d_ticket,
+)
+
+
+# ==================== Fixtures ====================
+
+@pytest.fixture
+def draw_payload():
+    return {
+        "top_prizes": {"first": "1234", "second": "5678", "third": "9012"},
+        "starter_prizes": ["4321", "0001", "1100", "2222", "3331", "0101", "7788", "0456", "6540", "1111"],
+        "consolation_prizes": ["0000", "0100", "1010", "3133", "4455", "5566", "6677", "7789", "8899", "9900"],
+    }
+
+
+# ==================== Draw Index Tests ====================
+
+def test_digit_index_groups_permutations(draw_payload):
+    """Numbers sharing sorted digits are grouped under one key"""
+    draw_index, digit_index = _build_draw_index(draw_payload)
+
+    assert draw_index["1234"] == 1
+    assert digit_index["1234"] == [("1234", 1), ("4321", 4)]
+    assert digit_index["0011"] == [("0101", 4), ("1010", 5), ("1100", 4)]
+
+
+def test_invalid_draw_rejected():
+    """Top prizes must be 4-digit strings"""
+    with pytest.raises(ValueError):
+        _build_draw_index({"top_prizes": {"first": "123", "second": "5678", "third": "9012"}})
+
+
+# ==================== Bet Tests ====================
+
+def test_ordinary_bet(draw_payload):
+    """Ordinary bets only match the exact number"""
+    draw_index, digit_index = _build_draw_index(draw_payload)
+    r = evaluate_4d_bet({"entry_type": "Ordinary", "number": "1234", "big_amount": 1, "small_amount": 1}, draw_index, digit_index)
+
+    assert r["best_category"] == "first"
+    assert r["covered_count"] == 1
+    assert r["payout"] == 5000.0
+
+
+def test_system_bet_matches_every_permutation(draw_payload):
+    """System bets win on any permutation and list wins in number order"""
+    draw_index, digit_index = _build_draw_index(draw_payload)
+    r = evaluate_4d_bet({"entry_type": "System", "number": "4312", "big_amount": 1}, draw_index, digit_index)
+
+    assert r["covered_count"] == 24
+    assert [w["matched"] for w in r["wins"]] == ["1234", "4321"]
+    assert r["best_category"] == "first"
+    assert r["payout"] == 2250.0
+
+
+def test_ibet_uses_pattern_table(draw_payload):
+    """iBet payouts depend on the digit pattern of the number"""
+    draw_index, digit_index = _build_draw_index(draw_payload)
+    r = evaluate_4d_bet({"bet_type": "iBet", "number": "0011", "big_amount": 1, "small_amount": 1}, draw_index, digit_index)
+
+    assert r["covered_count"] == 6
+    # 2pairs: two starters (41 big) + one consolation (10 big), no small payout for starter/consolation
+    assert r["payout"] == 92.0
+    assert r["best_category"] == "starter"
+
+
+def test_roll_bet(draw_payload):
+    """Roll bets cover the ten numbers of the pattern"""
+    draw_index, digit_index = _build_draw_index(draw_payload)
+    r = evaluate_4d_bet({"entry_type": "Roll", "roll_pattern": "56x8", "big_amount": 1}, draw_index, digit_index)
+
+    assert r["covered_count"] == 10
+    assert r["best_category"] == "second"
+    assert r["payout"] == 1000.0
+
+
+def test_small_bet_without_payout_still_ranks(draw_payload):
+    """A small-only starter hit has a category but no payout"""
+    draw_index, digit_index = _build_draw_index(draw_payload)
+    r = evaluate_4d_bet({"entry_type": "Ordinary", "number": "4321", "small_amount": 1}, draw_index, digit_index)
+
+    assert r["best_category"] == "starter"
+    assert r["payout"] == 0
+    assert r["wins"] == []
+
+
+# ==================== Ticket Tests ====================
+
+def test_ticket_highest_category(draw_payload):
+    """Ticket totals bet payouts and reports the best category"""
+    ticket = {"fourd_bets": [
+        {"entry_type": "Ordinary", "number": "0000", "big_amount": 2},
+        {"entry_type": "Ordinary", "number": "9012", "big_amount": 1},
+        {"entry_type": "Ordinary", "number": "1357", "big_amount": 1},
+    ]}
+    res = evaluate_4d_ticket(ticket, draw_payload)
+
+    assert res["is_win"] is True
+    assert res["highest_prize_category"] == "third"
+    assert res["total_payout"] == 610.0
+
+
+def test_ticket_without_bets(draw_payload):
+    """Tickets must carry fourd_bets"""
+    with pytest.raises(ValueError):
+        evaluate_4d_ticket({}, draw_payload)
+
+
+def test_prepared_draw_context(draw_payload):
+    """A prepared DrawContext is reused across tickets"""
+    from app.services.fourd_checker import prepare_4d_draw
+
+    ctx = prepare_4d_draw(draw_payload)
+    ticket = {"fourd_bets": [{"entry_type": "iBet", "number": "3412", "big_amount": 1}]}
+
+    assert evaluate_4d_ticket(ticket, draw_payload, ctx) == evaluate_4d_ticket(ticket, draw_payload)
+
+
+def test_batch_matches_single_ticket(draw_payload):
+    """Vectorized batch evaluation matches evaluate_4d_ticket ticket by ticket"""
+    from app.services.fourd_batch import evaluate_4d_tickets_batch
+
+    tickets = [
+        {"fourd_bets": [
+            {"entry_type": "Ordinary", "number": "0000", "big_amount": 2, "small_amount": 1},
+            {"entry_type": "System", "number": "4312", "big_amount": 1},
+        ]},
+        {"fourd_bets": [
+            {"bet_type": "iBet", "number": "0011", "big_amount": 1, "small_amount": 1},
+            {"entry_type": "Roll", "roll_pattern": "56x8", "big_amount": 1},
+            {"entry_type": "Ordinary", "number": "4321", "small_amount": 1},
+        ]},
+        {"fourd_bets": [{"entry_type": "Ordinary", "number": "1357", "big_amount": 1}]},
+        {},
+    ]
+    results = evaluate_4d_tickets_batch(tickets, draw_payload)
+
+    for ticket, result in zip(tickets[:3], results):
+        assert result == evaluate_4d_ticket(ticket, draw_payload)
+    assert isinstance(results[3], ValueError)
+
+
+def test_ticket_over_draws_matches_each_draw(draw_payload):
+    """Multi-draw evaluation gives the single-draw result for every draw"""
+    from app.services.fourd_batch import evaluate_4d_ticket_over_draws
+
+    other_draw = dict(draw_payload, top_prizes={"first": "0000", "second": "4312", "third": "8765"})
+    draws = [draw_payload, other_draw]
+    ticket = {"fourd_bets": [
+        {"entry_type": "System", "number": "4312", "big_amount": 1, "small_amount": 1},
+        {"entry_type": "Ordinary", "number": "0000", "big_amount": 2},
+    ]}
+
+    assert evaluate_4d_ticket_over_draws(ticket, draws) == [evaluate_4d_ticket(ticket, d) for d in draws]
+
+
+def test_direct_bet_evaluation_reuses_draw_tables(draw_payload):
+    """Direct evaluate_4d_bet calls build the rank table once per draw, not per bet"""
+    draw_index, _ = _build_draw_index(draw_payload)
+    fourd_checker._cached_tables.cache_clear()
+    for number in ("1234", "4321", "0000"):
+        evaluate_4d_bet({"entry_type": "Ordinary", "number": number, "big_amount": 1}, draw_index)
+
+    info = fourd_checker._cached_tables.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
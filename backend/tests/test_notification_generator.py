@@ -0,0 +1,154 @@
+import pytest
+from unittest.mock import patch
+
+from app.repositories import SQLiteRepository
+from app.services import notification_generator, ticket_checker
+
+
+# ==================== Fixtures ====================
+
+def _seeded_repo():
+    """SQLite repository with one 4D draw and 10 tickets, every 3rd a winner"""
+    repo = SQLiteRepository()
+    repo.insert_draw_results([{
+        "uid": "d1", "game": "4d", "draw_no": 5000, "draw_date": "2026-01-03",
+        "result": {"top_prizes": {"first": "1234", "second": "2345", "third": "3456"}},
+    }])
+    repo.insert_tickets([
+        {"id": f"t{i:02d}", "user_id": f"u{i}", "game_type": "4D", "draw_date": "2026-01-03",
+         "details": {"fourd_bets": [{"entry_type": "Ordinary", "number": "1234" if i % 3 == 0 else "9999", "big_amount": 1}]}}
+        for i in range(10)
+    ])
+    return repo
+
+
+@pytest.fixture
+def repo():
+    """The seeded repository with draw d1 checked"""
+    repo = _seeded_repo()
+    ticket_checker.check_4d_tickets_for_draw("d1", repo=repo)
+    return repo
+
+
+# ==================== Generator Tests ====================
+
+def test_generate_for_draw_prefetches_in_bulk(repo):
+    """Tickets and draws are fetched once per batch, never per check"""
+    with patch.object(repo, "get_ticket", side_effect=AssertionError("per-check read")), \
+         patch.object(repo, "get_draw", side_effect=AssertionError("per-check read")):
+        result = notification_generator.generate_notifications_for_draw("d1", notify_losses=True, repo=repo)
+
+    assert (result["win_notifications"], result["loss_notifications"]) == (4, 6)
+    assert result["errors"] == []
+
+
+def test_generate_skips_notified_checks(repo):
+    """Re-notifying a draw inserts nothing; every check is already notified"""
+    first = notification_generator.generate_notifications_for_draw("d1", repo=repo)
+    second = notification_generator.generate_notifications_for_draw("d1", repo=repo)
+
+    assert (first["win_notifications"], first["loss_notifications"]) == (4, 0)
+    assert second["skipped"] == 4
+    assert second["win_notifications"] == 0
+
+
+def test_all_checks_consumes_only_new_checks(repo):
+    """The notified_at cursor hands each check to the generator once, skipped losses included"""
+    first = notification_generator.generate_notifications_for_all_checks(notify_losses=False, repo=repo, page_size=3)
+    second = notification_generator.generate_notifications_for_all_checks(notify_losses=False, repo=repo, page_size=3)
+
+    assert (first["total_checks_processed"], first["win_notifications"]) == (10, 4)
+    assert second["total_checks_processed"] == 0
+    assert sum(c["notify_skipped"] for c in repo.get_ticket_checks("d1")) == 6
+
+    repo.insert_tickets([{"id": "t10", "user_id": "u10", "game_type": "4D", "draw_date": "2026-01-03",
+                          "details": {"fourd_bets": [{"entry_type": "Ordinary", "number": "1234", "big_amount": 1}]}}])
+    ticket_checker.check_all_unprocessed_draws(repo=repo)
+    third = notification_generator.generate_notifications_for_all_checks(repo=repo)
+
+    assert (third["total_checks_processed"], third["win_notifications"]) == (1, 1)
+
+
+def test_win_notification_body(repo):
+    """Win bodies are built in memory from the check, ticket and draw"""
+    check = next(c for c in repo.get_ticket_checks("d1") if c["ticket_id"] == "t03")
+    row = notification_generator.build_win_notification(check, repo.get_ticket("t03"), repo.get_draw("d1"))
+
+    assert row["user_id"] == "u3"
+    assert row["ticket_check_id"] == str(check["id"])
+    assert row["data"]["ticket_check_id"] == str(check["id"])
+    assert row["data"]["draw_winning_numbers"]["your_matches"][0]["number"] == "1234"
+    assert "Draw #5000" in row["message"]
+
+
+def test_missing_ticket_reported(repo):
+    """A check whose ticket is gone is reported, the rest still notified"""
+    repo.conn.execute("delete from tickets where id = 't00'")
+    result = notification_generator.generate_notifications_for_draw("d1", repo=repo)
+
+    assert result["win_notifications"] == 3
+    assert "Ticket not found" in result["errors"][0]["error"]
+    # the failed check stays unconsumed, so the next run retries it
+    assert [c["ticket_id"] for c in repo.unnotified_check_page(None, 100)] == ["t00"]
+
+
+def test_failing_check_given_up_after_max_attempts(repo):
+    """A check that keeps failing is re-read by each run until it runs out of attempts"""
+    repo.conn.execute("delete from tickets where id = 't00'")
+    for _ in range(2):
+        result = notification_generator.generate_notifications_for_all_checks(repo=repo)
+        assert "Ticket not found" in result["errors"][0]["error"]
+
+    (check,) = repo.unnotified_check_page(None, 100)
+    assert (check["ticket_id"], check["notify_attempts"]) == ("t00", 2)
+
+    notification_generator._notify_checks(
+        [check], False, repo, notification_generator._new_results(), max_attempts=3
+    )
+    assert repo.unnotified_check_page(None, 100) == []
+
+
+def test_notifications_inserted_in_chunks(repo):
+    """Rows are inserted chunk_size at a time; a bad row is split out, the rest still land"""
+    insert = repo.upsert_notifications
+    calls = []
+
+    def flaky_insert(rows):
+        calls.append(len(rows))
+        if any(r["data"]["ticket_id"] == "t05" for r in rows):
+            raise ValueError("invalid row")
+        return insert(rows)
+
+    with patch.object(repo, "upsert_notifications", side_effect=flaky_insert), \
+         patch("app.services.write_buffer.time.sleep") as sleep:
+        result = notification_generator.generate_notifications_for_draw(
+            "d1", notify_losses=True, repo=repo, chunk_size=4
+        )
+
+    # t05's chunk is rejected for its data: split down to t05 alone, without retrying
+    assert max(calls) == 4 and calls.count(1) == 2
+    sleep.assert_not_called()
+    assert result["win_notifications"] + result["loss_notifications"] == 9
+    assert [e["error_type"] for e in result["errors"]] == ["ValueError"]
+    assert result["insert_latency"]["chunks"] == len([s for s in result["insert_chunks"] if s["ok"]])
+
+
+# ==================== Fused Check-and-Notify Tests ====================
+
+def test_fused_check_notifies_without_read_back():
+    """Notifications are built from the written check rows and the ticket pages already in memory"""
+    repo = _seeded_repo()
+    with patch.object(repo, "get_tickets", side_effect=AssertionError("ticket read-back")), \
+         patch.object(repo, "get_ticket_checks", side_effect=AssertionError("check read-back")):
+        result = ticket_checker.check_all_unprocessed_draws(repo=repo, notify=True, notify_losses=True)
+
+    assert (result["total_tickets_checked"], result["total_wins"]) == (10, 4)
+    assert (result["total_win_notifications"], result["total_loss_notifications"]) == (4, 6)
+    assert repo.unnotified_check_page(None, 100) == []
+
+    (win,) = [n for n in repo.conn.execute("select user_id, ticket_check_id from notifications where type = 'win' and user_id = 'u3'")]
+    (check,) = [c for c in repo.get_ticket_checks("d1") if c["ticket_id"] == "t03"]
+    assert win["ticket_check_id"] == check["id"]
+
+    swept = notification_generator.generate_notifications_for_all_checks(notify_losses=True, repo=repo)
+    assert swept["total_checks_processed"] == 0
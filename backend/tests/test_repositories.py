@@ -0,0 +1,254 @@
+import pytest
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from unittest.mock import patch
+
+from app.repositories import SQLiteRepository
+from app.services import ticket_checker
+
+
+# ==================== Fixtures ====================
+
+@pytest.fixture
+def repo():
+    repo = SQLiteRepository()
+    repo.insert_draw_results([{
+        "uid": "d1", "game": "4d", "draw_no": 5000, "draw_date": "2026-01-03",
+        "result": {"top_prizes": {"first": "1234", "second": "2345", "third": "3456"}},
+    }])
+    repo.insert_tickets([
+        {"id": f"t{i:02d}", "user_id": "u1", "game_type": "4D", "draw_date": "2026-01-03",
+         "details": {"fourd_bets": [{"entry_type": "Ordinary", "number": "1234" if i % 3 == 0 else "9999", "big_amount": 1}]}}
+        for i in range(25)
+    ])
+    return repo
+
+
+# ==================== SQLite Repository Tests ====================
+
+def test_ticket_pages_and_lookups(repo):
+    """Keyset pages honor id bounds; bulk lookups return stored rows with JSON decoded"""
+    page = repo.ticket_page("4D", "2026-01-03", "t09", 5, bounds=(None, "t12"))
+
+    assert [t["id"] for t in page] == ["t10", "t11"]
+    assert page[0]["details"]["fourd_bets"][0]["number"] == "9999"
+    assert {t["id"] for t in repo.get_tickets(["t01", "t02", "missing"])} == {"t01", "t02"}
+    assert repo.latest_draw_no("4d") == 5000
+    assert repo.draw_exists("4d", 5000) and not repo.draw_exists("toto", 5000)
+
+
+def test_draw_history_for_predictors(repo):
+    """Draw history comes back flattened like the Supabase ML views, newest first"""
+    repo.insert_draw_results([
+        {"uid": f"toto{n}", "game": "toto", "draw_no": n, "draw_date": f"2026-01-0{n - 4000}",
+         "result": {"winning_numbers": ["3", "11", "19", "27", "35", str(40 + n - 4000)], "additional_number": "7"}}
+        for n in (4001, 4002)
+    ])
+
+    (fourd,) = repo.draw_history("4d", 10)
+    assert fourd == {"draw_no": 5000, "draw_date": "2026-01-03",
+                     "first_prize": "1234", "second_prize": "2345", "third_prize": "3456"}
+    toto = repo.draw_history("toto", 1)
+    assert [(d["draw_no"], d["winning_numbers"][-1]) for d in toto] == [(4002, 42)]
+
+
+def test_checker_runs_against_sqlite(repo):
+    """The draw checker reads and writes through the repository"""
+    result = ticket_checker.check_4d_tickets_for_draw("d1", chunk_size=7, page_size=10, repo=repo)
+
+    assert (result["tickets_checked"], result["wins"], result["losses"]) == (25, 9, 16)
+    checks = repo.get_ticket_checks("d1")
+    assert len(checks) == 25
+    assert sum(c["is_win"] for c in checks) == 9
+
+    rerun = ticket_checker.check_4d_tickets_for_draw("d1", repo=repo)
+    assert rerun["writes_skipped"] == 25
+
+
+def test_unprocessed_draws_against_sqlite(repo):
+    """The watermark and anti-join queries only hand out unchecked tickets"""
+    repo.upsert_ticket_checks([{"ticket_id": "t00", "draw_id": "d1", "is_win": True, "details": {}}])
+    assert repo.draws_with_unchecked_tickets()[0]["unchecked_tickets"] == 24
+
+    result = ticket_checker.check_all_unprocessed_draws(repo=repo)
+
+    assert result["total_tickets_checked"] == 24
+    assert repo.draws_with_unchecked_tickets() == []
+    assert repo.unchecked_ticket_page("d1", None, 10) == []
+
+
+def test_final_unsharded_run_advances_watermark(repo):
+    """Sharded jobs leave the watermark alone; the final un-sharded run advances it"""
+    repo.conn.execute("update tickets set created_at = '2026-01-03T00:00:00+00:00'")
+    for index in range(2):
+        ticket_checker.check_all_unprocessed_draws(shard=(index, 2), repo=repo)
+
+    assert repo.draws_with_unchecked_tickets() == []
+    assert repo.conn.execute("select count(*) from draw_check_status").fetchone()[0] == 0
+    (stale,) = repo.draws_with_stale_watermark()
+
+    final = ticket_checker.check_all_unprocessed_draws(repo=repo)
+
+    assert (final["draws_processed"], final["watermarks_advanced"]) == (0, 1)
+    (checked_through,) = repo.conn.execute("select checked_through from draw_check_status").fetchone()
+    assert checked_through >= stale["as_of"]
+    assert repo.draws_with_stale_watermark() == []
+
+
+def test_late_committed_ticket_stays_above_watermark(repo):
+    """A ticket committed after the watermark moved, but created just before it, is still found"""
+    ticket_checker.check_all_unprocessed_draws(repo=repo)
+    assert repo.draws_with_unchecked_tickets() == []
+
+    created = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+    repo.insert_tickets([{"id": "t99", "user_id": "u1", "game_type": "4D", "draw_date": "2026-01-03",
+                          "created_at": created, "details": {"fourd_bets": []}}])
+
+    assert [d["unchecked_tickets"] for d in repo.draws_with_unchecked_tickets()] == [1]
+
+
+def test_stale_checkpoints_not_resumed(repo):
+    """A full re-check ignores an unchecked-only run's checkpoint and one older than the watermark"""
+    progress = {"last_ticket_id": "t06", "tickets_checked": 7, "wins": 3, "losses": 4, "writes_skipped": 0, "errors": []}
+    repo.save_checkpoint({"draw_id": "d1", "shard": "unchecked:all", **progress})
+
+    result = ticket_checker.check_4d_tickets_for_draw("d1", repo=repo)
+
+    assert "resumed_from" not in result
+    assert result["tickets_checked"] == 25
+    assert len(repo.get_ticket_checks("d1")) == 25
+    assert repo.get_checkpoint("d1", "unchecked:all") is not None
+
+    repo.save_checkpoint({"draw_id": "d1", "shard": "full:all", **progress})
+    repo.conn.execute("update check_checkpoints set updated_at = '2026-01-03T00:00:00+00:00'")
+    repo.upsert_draw_check_status({"draw_id": "d1", "game": "4d", "draw_date": "2026-01-03",
+                                   "checked_through": "2026-01-04T00:00:00+00:00", "tickets_checked": 25})
+    assert repo.get_checkpoint("d1", "full:all") is None
+
+    rerun = ticket_checker.check_4d_tickets_for_draw("d1", repo=repo)
+
+    assert "resumed_from" not in rerun
+    assert (rerun["tickets_checked"], rerun["writes_skipped"]) == (25, 25)
+
+
+def test_resume_after_crash_counts_each_ticket_once(repo):
+    """Unchanged rows past the checkpoint are not in its counts, so a resume adds up to the draw"""
+    ticket_checker.check_4d_tickets_for_draw("d1", repo=repo)
+    for ticket_id, number in (("t05", "1234"), ("t15", "9999"), ("t20", "1234")):
+        details = f'{{"fourd_bets": [{{"entry_type": "Ordinary", "number": "{number}", "big_amount": 1}}]}}'
+        repo.conn.execute("update tickets set details = ? where id = ?", [details, ticket_id])
+
+    upsert = repo.upsert_ticket_checks
+    calls = []
+
+    def crash_after_first_write(rows):
+        calls.append(rows)
+        if len(calls) > 1:
+            raise sqlite3.OperationalError("disk I/O error")
+        return upsert(rows)
+
+    with patch.object(repo, "upsert_ticket_checks", side_effect=crash_after_first_write), \
+         patch("app.services.write_buffer.time.sleep"), pytest.raises(HTTPException):
+        ticket_checker.check_4d_tickets_for_draw("d1", chunk_size=1, page_size=10, repo=repo)
+
+    saved = repo.get_checkpoint("d1", "full:all")
+    assert (saved["last_ticket_id"], saved["tickets_checked"], saved["writes_skipped"]) == ("t05", 6, 5)
+
+    result = ticket_checker.check_4d_tickets_for_draw("d1", chunk_size=1, page_size=10, repo=repo)
+
+    assert result["resumed_from"] == "t05"
+    assert result["tickets_checked"] == result["wins"] + result["losses"] == 25
+    assert result["writes_skipped"] == 22
+
+
+def test_notification_upsert_ignores_duplicates(repo):
+    """A second notification for the same ticket check is dropped by the insert itself"""
+    first = repo.upsert_notifications([{"user_id": "u1", "type": "win", "ticket_check_id": "c1"}])
+    second = repo.upsert_notifications([
+        {"user_id": "u1", "type": "win", "ticket_check_id": "c1"},
+        {"user_id": "u1", "type": "loss", "ticket_check_id": "c2"},
+    ])
+
+    assert len(first) == 1
+    assert [n["ticket_check_id"] for n in second] == ["c2"]
+    assert repo.conn.execute("select count(*) from notifications").fetchone()[0] == 2
+
+
+def test_dead_letters_retried_with_backoff(repo):
+    """Failed tickets are dead-lettered, skipped by the anti-join and recovered by a retry"""
+    repo.conn.execute("update tickets set details = '{}' where id = 't00'")
+    ticket_checker.check_all_unprocessed_draws(repo=repo)
+
+    assert repo.draws_with_unchecked_tickets() == []
+    assert repo.due_dead_letters(5, 10) == []  # still backing off
+
+    ticket_checker.retry_dead_letters(repo=repo)  # nothing due yet
+    repo.conn.execute("update check_dead_letters set next_retry_at = '2000-01-01'")
+    failed = ticket_checker.retry_dead_letters(repo=repo)
+    assert (failed["failed"], failed["errors"][0]["error_type"]) == (1, "ValueError")
+
+    repo.conn.execute("update tickets set details = ? where id = 't00'", ['{"fourd_bets": [{"entry_type": "Ordinary", "number": "1234", "big_amount": 1}]}'])
+    repo.conn.execute("update check_dead_letters set next_retry_at = '2000-01-01'")
+    (letter,) = repo.due_dead_letters(5, 10)
+    assert letter["attempts"] == 2
+
+    result = ticket_checker.retry_dead_letters(repo=repo)
+    assert (result["recovered"], result["wins"]) == (1, 1)
+    assert repo.due_dead_letters(5, 10) == []
+    assert repo.get_result_hashes("d1", ["t00"])
+
+
+def test_outage_is_not_dead_lettered(repo):
+    """A write outage fails the draw for the next run instead of dead-lettering its tickets"""
+    outage = sqlite3.OperationalError("database is locked")
+    with patch.object(repo, "upsert_ticket_checks", side_effect=outage), \
+         patch("app.services.write_buffer.time.sleep"):
+        result = ticket_checker.check_all_unprocessed_draws(repo=repo)
+
+    assert result["draws_processed"] == 0
+    assert "database is locked" in result["draw_summaries"][0]["error"]
+    assert repo.conn.execute("select count(*) from check_dead_letters").fetchone()[0] == 0
+    assert repo.conn.execute("select count(*) from draw_check_status").fetchone()[0] == 0
+    assert repo.draws_with_unchecked_tickets()[0]["unchecked_tickets"] == 25
+
+
+def test_dead_letter_retry_survives_a_broken_draw(repo):
+    """A draw that fails as a whole counts an attempt for its letters; the run goes on"""
+    repo.insert_draw_results([{"uid": "d2", "game": "4d", "draw_no": 5001, "draw_date": "2026-01-04",
+                               "result": {"top_prizes": {"first": "12"}}}])
+    repo.record_dead_letters("d1", [{"ticket_id": "t00", "error_type": "ValueError", "error": "bad"}])
+    repo.record_dead_letters("d2", [{"ticket_id": "t01", "error_type": "ValueError", "error": "bad"}])
+    repo.conn.execute("update check_dead_letters set next_retry_at = '2000-01-01'")
+
+    result = ticket_checker.retry_dead_letters(repo=repo)
+
+    assert (result["recovered"], result["failed"]) == (1, 1)
+    assert result["errors"][0]["draw_id"] == "d2"
+    repo.conn.execute("update check_dead_letters set next_retry_at = '2000-01-01'")
+    (letter,) = repo.due_dead_letters(5, 10)
+    assert (letter["ticket_id"], letter["attempts"]) == ("t01", 2)
+
+
+def test_dead_letter_retry_outage_leaves_letters_alone(repo):
+    """A connection failure stops the retry run without counting attempts against the letters"""
+    repo.record_dead_letters("d1", [{"ticket_id": "t00", "error_type": "ValueError", "error": "bad"}])
+    repo.conn.execute("update check_dead_letters set next_retry_at = '2000-01-01'")
+
+    outage = sqlite3.OperationalError("database is locked")
+    with patch.object(repo, "upsert_ticket_checks", side_effect=outage), \
+         patch("app.services.write_buffer.time.sleep"), pytest.raises(HTTPException):
+        ticket_checker.retry_dead_letters(repo=repo)
+
+    (letter,) = repo.due_dead_letters(5, 10)
+    assert (letter["attempts"], letter["next_retry_at"]) == (1, "2000-01-01")
+
+
+def test_recheck_does_not_count_dead_letter_attempts(repo):
+    """Check runs failing on a dead-lettered ticket again leave its attempts to the retries"""
+    repo.conn.execute("update tickets set details = '{}' where id = 't00'")
+    ticket_checker.check_4d_tickets_for_draw("d1", repo=repo)
+    ticket_checker.check_4d_tickets_for_draw("d1", repo=repo)
+
+    (attempts,) = repo.conn.execute("select attempts from check_dead_letters where ticket_id = 't00'").fetchone()
+    assert attempts == 1
@@ -0,0 +1,410 @@
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import ticket_checker
+
+
+# ==================== Fixtures ====================
+
+class _Query:
+    """Minimal PostgREST query builder over in-memory rows"""
+
+    def __init__(self, db, table):
+        self.db, self.table = db, table
+        self.filters, self.after, self.page_size, self.rows = {}, None, None, None
+        self.is_single = self.is_delete = False
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, key, value):
+        self.filters[key] = value
+        return self
+
+    def in_(self, key, values):
+        self.filters[key] = lambda v, allowed=set(values): v in allowed
+        return self
+
+    def gt(self, key, value):
+        self.after = value
+        return self
+
+    def order(self, key):
+        return self
+
+    def limit(self, n):
+        self.page_size = n
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.rows, self.keys = rows, on_conflict.split(",")
+        return self
+
+    def delete(self):
+        self.is_delete = True
+        return self
+
+    def _matches(self, row):
+        return all(v(row.get(k)) if callable(v) else row.get(k) == v for k, v in self.filters.items())
+
+    def execute(self):
+        response = MagicMock()
+        stored = self.db.tables.setdefault(self.table, [])
+        if self.rows is not None:
+            self.db.upserts.append((self.table, self.rows))
+            for row in self.rows if isinstance(self.rows, list) else [self.rows]:
+                key = [row[k] for k in self.keys]
+                stored[:] = [r for r in stored if [r[k] for k in self.keys] != key]
+                stored.append(row)
+            response.data = list(self.rows) if isinstance(self.rows, list) else [self.rows]
+            return response
+        if self.is_delete:
+            stored[:] = [r for r in stored if not self._matches(r)]
+            return response
+        rows = [r for r in stored if self._matches(r)]
+        if self.is_single:
+            response.data = rows[0] if rows else None
+            return response
+        if self.table != "tickets":
+            if self.after is not None:
+                rows = sorted((r for r in rows if r["id"] > self.after), key=lambda r: r["id"])
+            response.data = rows[:self.page_size]
+            return response
+        rows = sorted((r for r in rows if self.after is None or r["id"] > self.after), key=lambda r: r["id"])
+        self.db.pages.append(len(rows[:self.page_size]))
+        response.data = rows[:self.page_size]
+        return response
+
+
+@pytest.fixture
+def mock_db():
+    db = MagicMock()
+    db.tables = {
+        "draw_results": [{
+            "uid": "d1", "game": "4d", "draw_date": "2026-01-03",
+            "result": {"top_prizes": {"first": "1234", "second": "2345", "third": "3456"}},
+        }],
+        "tickets": [
+            {"id": f"t{i:02d}", "game_type": "4D", "draw_date": "2026-01-03",
+             "details": {"fourd_bets": [{"entry_type": "Ordinary", "number": "1234" if i % 3 == 0 else "9999", "big_amount": 1}]}}
+            for i in range(25)
+        ],
+        "ticket_checks": [],
+    }
+    db.pages, db.upserts = [], []
+    db.table.side_effect = lambda name: _Query(db, name)
+    db.checked = set()
+    db.stale_watermarks = []
+
+    def rpc(name, params=None):
+        response = MagicMock()
+        dead = {x["ticket_id"] for x in db.tables.get("check_dead_letters", [])}
+        if name == "draws_with_unchecked_tickets":
+            response.data = [
+                {"uid": "d1", "game": "4d", "draw_date": "2026-01-03", "unchecked_tickets": 25, "as_of": "2026-01-04T00:00:00+00:00"},
+            ]
+        elif name == "draws_with_stale_watermark":
+            response.data = list(db.stale_watermarks)
+        elif name == "record_dead_letters":
+            letters = db.tables.setdefault("check_dead_letters", [])
+            for e in params["p_errors"]:
+                old = next((x for x in letters if x["ticket_id"] == e["ticket_id"]), None)
+                if old:
+                    old.update(e, attempts=old["attempts"] + int(params["p_retry"]))
+                else:
+                    letters.append(dict(e, draw_id=params["p_draw_id"], attempts=1))
+        else:
+            after = params["p_after"]
+            lo, hi = params.get("p_from"), params.get("p_to")
+            rows = [
+                t for t in db.tables["tickets"]
+                if t["id"] not in db.checked and t["id"] not in dead and (after is None or t["id"] > after)
+                and (lo is None or t["id"] >= lo) and (hi is None or t["id"] < hi)
+            ]
+            response.data = rows[:params["p_limit"]]
+        query = MagicMock()
+        query.execute.return_value = response
+        return query
+
+    db.rpc.side_effect = rpc
+    with patch.object(ticket_checker, "supabase", db):
+        yield db
+
+
+def _check_batches(db):
+    """Row batches written to ticket_checks, in order"""
+    return [rows for table, rows in db.upserts if table == "ticket_checks"]
+
+
+# ==================== Draw Checking Tests ====================
+
+def test_tickets_streamed_by_page(mock_db):
+    """Tickets are fetched in keyset pages and written in chunks"""
+    result = ticket_checker.check_4d_tickets_for_draw("d1", chunk_size=7, page_size=10)
+
+    assert mock_db.pages == [10, 10, 5]
+    assert [len(rows) for rows in _check_batches(mock_db)] == [7, 7, 7, 4]
+    assert (result["tickets_checked"], result["wins"], result["losses"]) == (25, 9, 16)
+    assert result["errors"] == []
+
+
+def test_rerun_skips_unchanged_rows(mock_db):
+    """A re-run compares result hashes and only rewrites changed outcomes"""
+    ticket_checker.check_4d_tickets_for_draw("d1")
+    mock_db.upserts.clear()
+
+    mock_db.tables["tickets"][1]["details"]["fourd_bets"][0]["number"] = "1234"
+    result = ticket_checker.check_4d_tickets_for_draw("d1")
+
+    assert [r["ticket_id"] for rows in _check_batches(mock_db) for r in rows] == ["t01"]
+    assert result["writes_skipped"] == 24
+    assert (result["tickets_checked"], result["wins"]) == (25, 10)
+
+
+def test_checkpoint_saved_after_each_batch(mock_db):
+    """Every flushed batch checkpoints its last ticket; a finished draw drops the checkpoint"""
+    ticket_checker.check_4d_tickets_for_draw("d1", chunk_size=7, page_size=10)
+
+    saved = [row for table, row in mock_db.upserts if table == "check_checkpoints"]
+    assert [c["last_ticket_id"] for c in saved] == ["t06", "t13", "t20", "t24"]
+    assert saved[1]["tickets_checked"] == 14
+    assert mock_db.tables["check_checkpoints"] == []
+
+
+def test_resume_from_checkpoint(mock_db):
+    """A rerun continues after the checkpoint with its counts instead of starting over"""
+    mock_db.tables["check_checkpoints"] = [{
+        "draw_id": "d1", "shard": "full:all", "last_ticket_id": "t13",
+        "tickets_checked": 14, "wins": 5, "losses": 9, "writes_skipped": 0, "errors": [],
+    }]
+    result = ticket_checker.check_4d_tickets_for_draw("d1")
+
+    assert [r["ticket_id"] for rows in _check_batches(mock_db) for r in rows] == [f"t{i}" for i in range(14, 25)]
+    assert (result["tickets_checked"], result["wins"], result["losses"]) == (25, 9, 16)
+    assert result["resumed_from"] == "t13"
+    assert mock_db.tables["check_checkpoints"] == []
+
+
+def test_draw_without_tickets(mock_db):
+    mock_db.tables["tickets"] = []
+    result = ticket_checker.check_4d_tickets_for_draw("d1")
+
+    assert result["tickets_checked"] == 0
+    assert result["message"] == "No tickets found for this draw"
+
+
+# ==================== Unprocessed Draw Tests ====================
+
+def test_unprocessed_draws_advance_watermark(mock_db):
+    """Draws come from the RPC and their watermark moves to the RPC's as_of"""
+    result = ticket_checker.check_all_unprocessed_draws()
+
+    mock_db.rpc.assert_any_call("draws_with_unchecked_tickets")
+    assert result["draws_processed"] == 1
+    assert result["total_tickets_checked"] == 25
+
+    table, status = mock_db.upserts[-1]
+    assert table == "draw_check_status"
+    assert status["draw_id"] == "d1"
+    assert status["checked_through"] == "2026-01-04T00:00:00+00:00"
+
+
+def test_failed_tickets_dead_lettered(mock_db):
+    """Failed tickets are dead-lettered, so the draw's watermark still advances"""
+    mock_db.tables["tickets"][0]["details"] = {}
+    result = ticket_checker.check_all_unprocessed_draws()
+
+    assert result["total_dead_lettered"] == 1
+    (letter,) = mock_db.tables["check_dead_letters"]
+    assert (letter["ticket_id"], letter["error_type"], letter["attempts"]) == ("t00", "ValueError", 1)
+    assert mock_db.upserts[-1][0] == "draw_check_status"
+
+    mock_db.checked = {t["id"] for t in mock_db.tables["tickets"]} - {"t00"}
+    again = ticket_checker.check_4d_tickets_for_draw("d1", unchecked_only=True)
+    assert again["message"] == "No tickets found for this draw"
+
+
+def test_unchecked_only_skips_checked_tickets(mock_db):
+    """The anti-join path only evaluates tickets without a check row"""
+    mock_db.checked = {f"t{i:02d}" for i in range(20)}
+    result = ticket_checker.check_4d_tickets_for_draw("d1", unchecked_only=True)
+
+    assert result["tickets_checked"] == 5
+    assert [r["ticket_id"] for r in _check_batches(mock_db)[0]] == ["t20", "t21", "t22", "t23", "t24"]
+
+
+def test_shard_bounds_partition_ids():
+    """Shards split the ticket-id space into adjacent ranges"""
+    bounds = [ticket_checker.shard_bounds((i, 4)) for i in range(4)]
+
+    assert bounds[0][0] is None and bounds[-1][1] is None
+    assert all(bounds[i][1] == bounds[i + 1][0] for i in range(3))
+    assert bounds[2][0] == "80000000-0000-0000-0000-000000000000"
+    with pytest.raises(ValueError):
+        ticket_checker.shard_bounds((4, 4))
+
+
+def test_sharded_run_keeps_watermark(mock_db):
+    """A sharded run only reads its id range and leaves the watermark alone"""
+    ticket_checker.check_all_unprocessed_draws(shard=(1, 2))
+
+    params = [c.args[1] for c in mock_db.rpc.call_args_list if c.args[0] == "unchecked_tickets_for_draw"]
+    assert params[0]["p_from"] == "80000000-0000-0000-0000-000000000000"
+    assert params[0]["p_to"] is None
+    assert all(table != "draw_check_status" for table, _ in mock_db.upserts)
+
+
+class _InlinePool:
+    """ProcessPoolExecutor stand-in running units in this process (so the patched client is used)"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    map = staticmethod(map)
+
+
+def test_worker_units_advance_watermark(mock_db):
+    """workers > 1 splits each draw into sub-shards, and the un-sharded run still advances the watermark"""
+    with patch.object(ticket_checker, "ProcessPoolExecutor", _InlinePool):
+        result = ticket_checker.check_all_unprocessed_draws(workers=2)
+
+    assert result["total_tickets_checked"] == 25
+    assert result["draw_summaries"][0]["shards"] == 2
+    assert result["watermarks_advanced"] == 1
+    (status,) = [rows for table, rows in mock_db.upserts if table == "draw_check_status"]
+    assert status["checked_through"] == "2026-01-04T00:00:00+00:00"
+
+
+# ==================== Single Ticket Tests ====================
+
+def test_check_single_ticket(mock_db):
+    """A saved ticket is checked at once when its draw is available"""
+    result = ticket_checker.check_ticket("t03")
+
+    assert result["status"] == "checked"
+    assert result["is_win"] is True
+    table, (row,) = mock_db.upserts[0]
+    assert (table, row["ticket_id"], row["draw_id"]) == ("ticket_checks", "t03", "d1")
+
+
+def test_check_single_ticket_pending(mock_db):
+    """A ticket whose draw has not happened yet is left for the scheduled run"""
+    mock_db.tables["draw_results"] = []
+    result = ticket_checker.check_ticket("t03")
+
+    assert result["status"] == "pending"
+    assert mock_db.upserts == []
+
+
+def test_check_single_ticket_not_found(mock_db):
+    """A missing ticket is a 404, not an error from the lookup itself"""
+    with pytest.raises(HTTPException) as exc:
+        ticket_checker.check_ticket("missing")
+    assert exc.value.status_code == 404
+
+
+def test_check_single_ticket_error_codes(mock_db):
+    """A broken draw result is a server error; only a malformed ticket is 422"""
+    draw = mock_db.tables["draw_results"][0]
+    draw["result"] = {"top_prizes": {"first": "12"}}
+    with pytest.raises(HTTPException) as exc:
+        ticket_checker.check_ticket("t03")
+    assert exc.value.status_code == 500
+
+    draw["result"] = {"top_prizes": {"first": "1234", "second": "2345", "third": "3456"}}
+    mock_db.tables["tickets"][3]["details"] = {"fourd_bets": [{"entry_type": "Ordinary", "number": "12"}]}
+    with pytest.raises(HTTPException) as exc:
+        ticket_checker.check_ticket("t03")
+    assert exc.value.status_code == 422
+
+
+def test_supabase_ticket_checks_read_in_pages(mock_db):
+    """get_ticket_checks pages by id instead of one select that PostgREST would cap"""
+    from app.repositories import SupabaseRepository, supabase_repository
+
+    mock_db.tables["ticket_checks"] = [{"id": f"c{i}", "ticket_id": f"t0{i}", "draw_id": "d1"} for i in range(5)]
+    with patch.object(supabase_repository, "READ_PAGE_SIZE", 2):
+        checks = SupabaseRepository(mock_db).get_ticket_checks("d1")
+
+    assert [c["id"] for c in checks] == ["c0", "c1", "c2", "c3", "c4"]
+
+
+# ==================== Pipelined Checking Tests ====================
+
+class _AsyncQuery(_Query):
+    async def execute(self):
+        return _Query.execute(self)
+
+
+class _AsyncRpc:
+    def __init__(self, query):
+        self.query = query
+
+    async def execute(self):
+        return self.query.execute()
+
+
+def _async_client(db):
+    client = MagicMock()
+    client.table.side_effect = lambda name: _AsyncQuery(db, name)
+    client.rpc.side_effect = lambda name, params=None: _AsyncRpc(db.rpc(name, params))
+    return client
+
+
+def test_pipelined_check_matches_sequential(mock_db):
+    """The async pipeline writes the same rows and summary as the sequential checker"""
+    from app.services.ticket_pipeline import run_check_pipelined
+
+    expected = ticket_checker.check_4d_tickets_for_draw("d1", chunk_size=7, page_size=10)
+    expected_rows = sorted((r for rows in _check_batches(mock_db) for r in rows), key=lambda r: r["ticket_id"])
+    mock_db.upserts.clear()
+    mock_db.tables["ticket_checks"] = []
+
+    result = run_check_pipelined("d1", client=_async_client(mock_db), chunk_size=7, page_size=10, fetchers=1, queue_size=1)
+    rows = sorted((r for rows in _check_batches(mock_db) for r in rows), key=lambda r: r["ticket_id"])
+
+    assert rows == expected_rows
+    assert all(len(batch) <= 7 for batch in _check_batches(mock_db))
+    assert {k: result[k] for k in ("tickets_checked", "wins", "losses", "errors")} == \
+        {k: expected[k] for k in ("tickets_checked", "wins", "losses", "errors")}
+
+
+def test_pipelined_check_unchecked_only(mock_db):
+    """The pipeline's anti-join mode skips tickets that already have a check row"""
+    from app.services.ticket_pipeline import run_check_pipelined
+
+    mock_db.checked = {f"t{i:02d}" for i in range(20)}
+    result = run_check_pipelined("d1", client=_async_client(mock_db), unchecked_only=True)
+
+    assert result["tickets_checked"] == 5
+
+
+def test_pipelined_check_missing_draw(mock_db):
+    """A missing draw is a 404 from the pipeline too"""
+    from app.services.ticket_pipeline import run_check_pipelined
+
+    with pytest.raises(HTTPException) as exc:
+        run_check_pipelined("missing", client=_async_client(mock_db))
+    assert exc.value.status_code == 404
+
+
+def test_pipelined_units_keep_dispatcher_bookkeeping(mock_db):
+    """Pipelined units skip checkpoints, but the dispatcher still advances the watermark"""
+    with patch("app.services.ticket_pipeline.create_async_client", AsyncMock(return_value=_async_client(mock_db))):
+        result = ticket_checker.check_all_unprocessed_draws(pipeline=True)
+
+    assert (result["draws_processed"], result["total_tickets_checked"]) == (1, 25)
+    assert all(table != "check_checkpoints" for table, _ in mock_db.upserts)
+    table, status = mock_db.upserts[-1]
+    assert (table, status["draw_id"]) == ("draw_check_status", "d1")
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
@@ -252,3 +253,51 @@ def test_delete_ticket_not_found(mock_supabase, override_auth_dependency, mock_a
     
     assert response.status_code == 404
     assert response.json()["detail"] == "Ticket not found"
+
+
+# ==================== POST /tickets/{id}/check Tests ====================
+
+@patch('app.api.tickets.check_ticket')
+@patch('app.api.tickets.supabase')
+def test_check_ticket_success(mock_supabase, mock_check, override_auth_dependency, mock_auth_header):
+    """An owned ticket is checked immediately"""
+    ticket_id = str(uuid4())
+    mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value.data = [{"id": ticket_id}]
+    mock_check.return_value = {"ticket_id": ticket_id, "status": "checked", "is_win": True}
+
+    response = client.post(f"/tickets/{ticket_id}/check", headers=mock_auth_header)
+
+    assert response.status_code == 200
+    assert response.json()["result"]["status"] == "checked"
+    mock_check.assert_called_once_with(ticket_id)
+
+
+@patch('app.api.tickets.check_ticket')
+@patch('app.api.tickets.supabase')
+def test_check_ticket_runs_off_the_event_loop(mock_supabase, mock_check, override_auth_dependency, mock_auth_header):
+    """The blocking check runs in the threadpool, not on the event loop"""
+    ticket_id = str(uuid4())
+    mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value.data = [{"id": ticket_id}]
+
+    def check(ticket_id):
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        return {"ticket_id": ticket_id, "status": "pending"}
+
+    mock_check.side_effect = check
+    response = client.post(f"/tickets/{ticket_id}/check", headers=mock_auth_header)
+
+    assert response.status_code == 200
+    assert response.json()["result"]["status"] == "pending"
+
+
+@patch('app.api.tickets.check_ticket')
+@patch('app.api.tickets.supabase')
+def test_check_ticket_not_owned(mock_supabase, mock_check, override_auth_dependency, mock_auth_header):
+    """Tickets of other users are not checked"""
+    mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.execute.return_value.data = []
+
+    response = client.post(f"/tickets/{uuid4()}/check", headers=mock_auth_header)
+
+    assert response.status_code == 404
+    mock_check.assert_not_called()
@@ -0,0 +1,291 @@
+import pytest
+from itertools import combinations
+
+from app.services.toto_checker import (
+    evaluate_toto_combination,
+    evaluate_toto_entry,
+    evaluate_toto_ticket,
+)
+
+
+# ==================== Fixtures ====================
+
+@pytest.fixture
+def draw_payload():
+    return {
+        "winning_numbers": [3, 11, 19, 27, 35, 43],
+        "additional_number": 49,
+        "prize_groups": {
+            "group1": "$1,000,000",
+            "group2": "$100,000",
+            "group3": "$1,500",
+            "group4": "$400",
+            "group5": "$50",
+            "group6": "$25",
+            "group7": "$10",
+        },
+    }
+
+
+def _reference_group(combo, winning_numbers, additional_number):
+    """Straightforward set-based prize group, used as the expected value."""
+    main = len(set(combo) & set(winning_numbers))
+    add = additional_number in combo
+    table = {(6, False): 1, (5, True): 2, (5, False): 3, (4, True): 4, (4, False): 5, (3, True): 6, (3, False): 7}
+    return table.get((main, add))
+
+
+# ==================== Combination Tests ====================
+
+def test_combination_prize_groups(draw_payload):
+    """Every prize group is reachable and matches the set-based rules"""
+    wins = draw_payload["winning_numbers"]
+    add = draw_payload["additional_number"]
+    pool = wins + [add, 1, 2, 4]
+
+    for combo in combinations(sorted(pool), 6):
+        r = evaluate_toto_combination(list(combo), wins, add)
+        expected = _reference_group(combo, wins, add)
+        if expected is None:
+            assert r is None
+        else:
+            assert r["prize_group"] == expected
+            assert r["combination"] == sorted(combo)
+
+
+def test_combination_rejects_out_of_range_numbers(draw_payload):
+    """Numbers outside 1-49 cannot be encoded"""
+    with pytest.raises(ValueError):
+        evaluate_toto_combination([0, 1, 2, 3, 4, 5], draw_payload["winning_numbers"], 49)
+
+
+# ==================== Entry / Ticket Tests ====================
+
+def test_ordinary_entry_group_1(draw_payload):
+    """Six main matches wins Group 1"""
+    entry = {"label": "A", "bet_type": "Ordinary", "numbers": [43, 35, 27, 19, 11, 3]}
+    res = evaluate_toto_entry(entry, draw_payload)
+
+    assert res["is_win"] is True
+    assert res["highest_prize_group"] == 1
+    assert res["details"][0]["combination"] == [3, 11, 19, 27, 35, 43]
+
+
+def test_system_entry_details_match_enumeration(draw_payload):
+    """System 12 details list every winning combination in order"""
+    numbers = [3, 11, 19, 27, 35, 49, 1, 2, 4, 5, 6, 7]
+    entry = {"label": "A", "bet_type": "System", "numbers": numbers}
+    res = evaluate_toto_entry(entry, draw_payload)
+
+    expected = [
+        list(c) for c in combinations(sorted(numbers), 6)
+        if _reference_group(c, draw_payload["winning_numbers"], 49) is not None
+    ]
+    assert [d["combination"] for d in res["details"]] == expected
+    assert res["highest_prize_group"] == 2
+
+
+def test_losing_ticket(draw_payload):
+    """No matches gives an empty payout"""
+    ticket = {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [1, 2, 4, 5, 6, 7]}]}
+    res = evaluate_toto_ticket(ticket, draw_payload)
+
+    assert res["is_win"] is False
+    assert res["payout"] == {"total_payout": 0, "counts_by_group": {}}
+
+
+def test_ticket_payout(draw_payload):
+    """Payout sums the prize amount of every winning combination"""
+    ticket = {"toto_entries": [
+        {"label": "A", "bet_type": "Ordinary", "numbers": [3, 11, 19, 27, 35, 49]},
+        {"label": "B", "bet_type": "Ordinary", "numbers": [3, 11, 19, 1, 2, 4]},
+    ]}
+    res = evaluate_toto_ticket(ticket, draw_payload)
+
+    assert res["highest_prize_group"] == 2
+    assert res["payout"]["counts_by_group"] == {2: 1, 7: 1}
+    assert res["payout"]["total_payout"] == 100_010
+
+
+# ==================== Closed-form Counting Tests ====================
+
+@pytest.mark.parametrize("size", range(6, 13))
+def test_counts_match_enumeration(draw_payload, size):
+    """Closed-form counts agree with enumerating every combination"""
+    wins = draw_payload["winning_numbers"]
+    for main in range(0, 7):
+        for with_additional in (False, True):
+            numbers = wins[:main] + ([49] if with_additional else []) + [1, 2, 4, 5, 6, 7, 8, 9, 10, 12, 13, 14]
+            numbers = numbers[:size]
+            if len(numbers) < 6:
+                continue
+            res = evaluate_toto_entry({"bet_type": "System", "numbers": numbers}, draw_payload)
+
+            expected = {}
+            for c in combinations(numbers, 6):
+                g = _reference_group(c, wins, 49)
+                if g is not None:
+                    expected[g] = expected.get(g, 0) + 1
+            assert res["counts_by_group"] == expected
+            assert len(res["details"]) == sum(expected.values())
+
+
+def test_ticket_without_details(draw_payload):
+    """include_details=False keeps payout but skips combination lists"""
+    ticket = {"toto_entries": [{"label": "A", "bet_type": "System", "numbers": [3, 11, 19, 27, 35, 49, 1, 2, 4, 5, 6, 7]}]}
+    full = evaluate_toto_ticket(ticket, draw_payload)
+    lean = evaluate_toto_ticket(ticket, draw_payload, include_details=False)
+
+    assert lean["winning_details"] == []
+    assert lean["payout"] == full["payout"]
+    assert lean["highest_prize_group"] == full["highest_prize_group"]
+
+
+# ==================== SystemRoll Tests ====================
+
+def _system_roll_entry(fixed, roll_from=1, roll_to=49):
+    return {
+        "label": "A",
+        "bet_type": "SystemRoll",
+        "numbers": None,
+        "system_size": None,
+        "system_roll": {"fixed_numbers": fixed, "roll_from": roll_from, "roll_to": roll_to},
+    }
+
+
+@pytest.mark.parametrize("fixed", [
+    [3, 11, 19, 27, 35],
+    [3, 11, 19, 27, 49],
+    [3, 11, 19, 1, 2],
+    [3, 11, 49, 1, 2],
+    [1, 2, 4, 5, 6],
+])
+def test_system_roll_matches_enumeration(draw_payload, fixed):
+    """SystemRoll counts agree with checking each rolled combination"""
+    res = evaluate_toto_entry(_system_roll_entry(fixed), draw_payload)
+
+    expected = {}
+    expected_combos = []
+    for n in range(1, 50):
+        if n in fixed:
+            continue
+        combo = sorted(fixed + [n])
+        g = _reference_group(combo, draw_payload["winning_numbers"], 49)
+        if g is not None:
+            expected[g] = expected.get(g, 0) + 1
+            expected_combos.append(combo)
+
+    assert res["counts_by_group"] == expected
+    assert [d["combination"] for d in res["details"]] == expected_combos
+    assert res["numbers"] == fixed
+
+
+def test_system_roll_partial_range(draw_payload):
+    """Only numbers inside roll_from..roll_to are rolled"""
+    res = evaluate_toto_entry(_system_roll_entry([3, 11, 1, 2, 4], 40, 45), draw_payload)
+
+    assert res["counts_by_group"] == {7: 1}
+    assert res["details"][0]["combination"] == [1, 2, 3, 4, 11, 43]
+
+
+def test_system_roll_invalid_range(draw_payload):
+    """A range that only covers fixed numbers is rejected"""
+    with pytest.raises(ValueError):
+        evaluate_toto_entry(_system_roll_entry([1, 2, 3, 4, 5], 2, 4), draw_payload)
+
+
+# ==================== Batch Tests ====================
+
+def test_batch_matches_single_ticket(draw_payload):
+    """Batch evaluation returns the same result as evaluate_toto_ticket per ticket"""
+    from app.services.toto_batch import evaluate_toto_tickets_batch
+
+    tickets = [
+        {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [3, 11, 19, 27, 35, 49]}]},
+        {"toto_entries": [{"label": "A", "bet_type": "System", "numbers": [3, 11, 19, 27, 1, 2, 4, 5, 6, 7]}]},
+        {"toto_entry": _system_roll_entry([3, 11, 19, 1, 2])},
+        {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [1, 2, 4, 5, 6, 7]}]},
+    ]
+    results = evaluate_toto_tickets_batch(tickets, draw_payload)
+
+    assert results == [evaluate_toto_ticket(t, draw_payload) for t in tickets]
+
+
+def test_batch_reports_bad_ticket(draw_payload):
+    """An unparsable ticket yields its exception without failing the batch"""
+    from app.services.toto_batch import evaluate_toto_tickets_batch
+
+    tickets = [
+        {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [1, 2, 3]}]},
+        {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [3, 11, 19, 27, 35, 43]}]},
+    ]
+    results = evaluate_toto_tickets_batch(tickets, draw_payload)
+
+    assert isinstance(results[0], ValueError)
+    assert results[1]["highest_prize_group"] == 1
+
+
+def test_prepared_draw_context(draw_payload):
+    """A prepared DrawContext gives the same result and holds parsed prize amounts"""
+    from app.services.toto_checker import prepare_toto_draw
+
+    ctx = prepare_toto_draw(draw_payload)
+    ticket = {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [3, 11, 19, 27, 35, 49]}]}
+
+    assert ctx.prize_amounts[2] == 100_000
+    assert evaluate_toto_ticket(ticket, draw_payload, ctx=ctx) == evaluate_toto_ticket(ticket, draw_payload)
+
+
+def test_ticket_over_draws_matches_each_draw(draw_payload):
+    """Multi-draw evaluation gives the single-draw result for every draw"""
+    from app.services.toto_batch import evaluate_toto_ticket_over_draws
+
+    other_draw = dict(draw_payload, winning_numbers=[1, 2, 4, 5, 6, 7], additional_number=3)
+    draws = [draw_payload, other_draw, draw_payload]
+    ticket = {"toto_entries": [
+        {"label": "A", "bet_type": "System", "numbers": [3, 11, 19, 27, 1, 2, 4, 5]},
+        dict(_system_roll_entry([3, 11, 1, 2, 4]), label="B"),
+    ]}
+
+    assert evaluate_toto_ticket_over_draws(ticket, draws) == [evaluate_toto_ticket(ticket, d) for d in draws]
+
+
+# ==================== Compiled Ticket Tests ====================
+
+def test_compiled_ticket_cache(draw_payload):
+    """Tickets are compiled once per ticket id + content and recompiled when edited"""
+    from app.services.ticket_compiler import TicketCompileCache
+    from app.services.toto_checker import evaluate_compiled_toto_ticket, prepare_toto_draw
+
+    cache = TicketCompileCache()
+    details = {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [3, 11, 19, 27, 35, 49]}]}
+
+    first = cache.get("TOTO", "t1", details)
+    again = cache.get("toto", "t1", {"toto_entries": [dict(details["toto_entries"][0])]})
+    assert again is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    edited = cache.get("toto", "t1", {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [1, 2, 4, 5, 6, 7]}]})
+    assert edited is not first
+
+    ctx = prepare_toto_draw(draw_payload)
+    assert evaluate_compiled_toto_ticket(first.parts, ctx) == evaluate_toto_ticket(details, draw_payload)
+
+
+def test_compiled_ticket_cache_shared_across_threads():
+    """The process-wide cache stays consistent when the pipeline's evaluator threads share it"""
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.ticket_compiler import TicketCompileCache
+
+    cache = TicketCompileCache(max_size=50)
+
+    def compile_range(offset):
+        for i in range(200):
+            n = (offset + i) % 80
+            cache.get("toto", f"t{n}", {"toto_entries": [{"label": "A", "bet_type": "Ordinary", "numbers": [1, 2, 3, 4, 5, 6 + n % 40]}]})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(compile_range, range(0, 80, 10)))
+
+    assert len(cache) == 50
+    assert cache.hits + cache.misses == 8 * 200
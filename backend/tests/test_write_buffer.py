@@ -0,0 +1,103 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from postgrest.exceptions import APIError
+
+from app.services.write_buffer import UpsertBuffer
+
+
+# ==================== Fixtures ====================
+
+@pytest.fixture
+def mock_client():
+    """Supabase client whose upsert rejects (not-null violation) any chunk containing ticket 'bad'"""
+    client = MagicMock()
+    calls = []
+
+    def upsert(rows, on_conflict=None):
+        calls.append([r["ticket_id"] for r in rows])
+        query = MagicMock()
+        if any(r["ticket_id"] == "bad" for r in rows):
+            query.execute.side_effect = APIError({"code": "23502", "message": "invalid row"})
+        return query
+
+    client.table.return_value.upsert.side_effect = upsert
+    client.calls = calls
+    return client
+
+
+def _rows(*ids):
+    return [{"ticket_id": i, "draw_id": "d1", "is_win": False} for i in ids]
+
+
+# ==================== UpsertBuffer Tests ====================
+
+def test_flushes_in_chunks(mock_client):
+    """Rows are written as multi-row upserts of chunk_size"""
+    buffer = UpsertBuffer(mock_client, "ticket_checks", on_conflict="ticket_id,draw_id", chunk_size=2)
+    for row in _rows("a", "b", "c"):
+        buffer.add(row)
+    buffer.flush()
+
+    assert mock_client.calls == [["a", "b"], ["c"]]
+    assert buffer.written == 3
+    assert buffer.errors == []
+
+
+def test_failed_chunk_is_split(mock_client):
+    """A bad row is isolated by splitting; the rest of its chunk is still written"""
+    written = []
+    buffer = UpsertBuffer(mock_client, "ticket_checks", on_conflict="ticket_id,draw_id", chunk_size=4, on_written=written.extend)
+    for row in _rows("a", "bad", "c", "d"):
+        buffer.add(row)
+    buffer.flush()
+
+    assert buffer.written == 3
+    assert [r["ticket_id"] for r in written] == ["a", "c", "d"]
+    assert [(e["ticket_id"], e["error_type"]) for e in buffer.errors] == [("bad", "APIError")]
+
+
+def test_invalid_chunk_size(mock_client):
+    with pytest.raises(ValueError):
+        UpsertBuffer(mock_client, "ticket_checks", on_conflict="ticket_id,draw_id", chunk_size=0)
+
+
+def test_transient_failure_retried_before_split():
+    """A chunk that fails once is retried whole; latency is recorded for every attempt"""
+    attempts = []
+
+    def write(rows):
+        attempts.append(len(rows))
+        if len(attempts) == 1:
+            raise TimeoutError("timed out")
+
+    buffer = UpsertBuffer(None, "notifications", on_conflict=None, chunk_size=4, write=write, retries=2, retry_delay=0)
+    for row in _rows("a", "b", "c"):
+        buffer.add(row)
+    buffer.flush()
+
+    assert attempts == [3, 3]
+    assert buffer.written == 3
+    assert [(s["rows"], s["attempts"], s["ok"]) for s in buffer.chunk_stats] == [(3, 1, False), (3, 2, True)]
+    stats = buffer.latency_stats()
+    assert (stats["chunks"], stats["rows"], stats["failed_writes"]) == (1, 3, 1)
+    assert stats["max_ms"] >= stats["p50_ms"] >= 0
+
+
+def test_outage_raises_without_splitting():
+    """A transport/5xx failure is retried with backoff, then raised; rows are never split or failed one by one"""
+    attempts = []
+
+    def write(rows):
+        attempts.append(len(rows))
+        raise APIError({"code": "PGRST000", "message": "connection refused"})
+
+    buffer = UpsertBuffer(None, "ticket_checks", on_conflict="ticket_id,draw_id", chunk_size=4, write=write, retries=2)
+    for row in _rows("a", "b", "c"):
+        buffer.add(row)
+    with patch("app.services.write_buffer.time.sleep") as sleep, pytest.raises(APIError):
+        buffer.flush()
+
+    assert attempts == [3, 3, 3]
+    assert [c.args[0] for c in sleep.call_args_list] == [0.5, 1.0]
+    assert buffer.errors == []
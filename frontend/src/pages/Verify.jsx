@@ -2,6 +2,7 @@ import React from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import TicketDetails from '../components/TicketDetails';
 import supabase from '../services/supabaseClient';
+import { checkTicket } from '../services/api';
 
 export default function Verify() {
   const location = useLocation();
@@ -53,6 +54,11 @@ export default function Verify() {
       }
       
       console.log('Ticket saved successfully:', savedTicket);
+      
+      // Check it now if the draw already happened; otherwise the scheduled run picks it up
+      if (savedTicket?.[0]?.id) {
+        checkTicket(savedTicket[0].id).catch(() => {});
+      }
       alert('Ticket saved successfully!');
       navigate('/tickets');
     } catch (error) {
@@ -161,6 +161,23 @@ export async function deleteTicket(ticketId) {
     }
 }
 
+/**
+ * Check a saved ticket right away (if its draw result is already available)
+ */
+export async function checkTicket(ticketId) {
+    try {
+        const authHeaders = await getAuthHeaders();
+
+        const response = await axios.post(`${API_URL}/tickets/${ticketId}/check`, {}, {
+            headers: authHeaders
+        });
+        return response.data;
+    } catch (error) {
+        console.error("Error checking ticket:", error);
+        throw error;
+    }
+}
+
 /**
  * Get AI predictions for a specific game type
  */